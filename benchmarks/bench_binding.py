@@ -0,0 +1,28 @@
+# coding= utf-8
+"""
+Times a countdown loop whose decrement is a colon word, called through an
+early-bound CALL and through a late-bound call site, on both interpreters.
+
+    $ python benchmarks/bench_binding.py
+"""
+from __future__ import unicode_literals, print_function
+
+import timeit
+
+import forth
+
+COUNT = 20000
+
+
+def bench(name, binding, run, repeat=5):
+    m = forth.Machine()
+    m.eval(binding + ' : DEC 1 - ; : COUNTDOWN BEGIN DEC DUP 0 <= UNTIL DROP ;')
+    best = min(timeit.repeat(lambda: run(m), number=1, repeat=repeat))
+    print('%-12s %8.2f ms  %6.0f ns/iteration' % (name, best * 1e3, best * 1e9 / COUNT))
+
+
+if __name__ == '__main__':
+    for binding in ('EARLY-BINDING', 'LATE-BINDING'):
+        kind = binding.split('-')[0].lower()
+        bench(kind + ' eval', binding, lambda m: m.eval('%d COUNTDOWN' % COUNT))
+        bench(kind + ' run', binding, lambda m: m.run('%d COUNTDOWN' % COUNT))
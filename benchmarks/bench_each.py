@@ -0,0 +1,44 @@
+# coding= utf-8
+"""
+Times summing the field counts of many lines: with one Machine.eval string
+per line, and by reading them as records into the data space (as
+`python -m forth --each` does).
+
+    $ python benchmarks/bench_each.py
+"""
+from __future__ import unicode_literals, print_function
+
+import io
+import timeit
+
+import forth
+from forth.__main__ import Runner
+from forth.stream import Records
+
+LINES = 20000
+DATA = b''.join(('%d alpha beta gamma\n' % i).encode('ascii') for i in range(LINES))
+
+
+def per_line_eval():
+    m = forth.Machine()
+    m.eval('0 : ADD-FIELDS + ;')
+    for line in io.BytesIO(DATA):
+        fields = len(line.split())
+        m.eval('%d ADD-FIELDS' % fields)
+    return m.data_stack
+
+
+def each():
+    m = forth.Machine()
+    records = Records(m)
+    m.add_vocabulary(records)
+    m.eval('0 : ADD-FIELDS DROP DROP #FIELDS + ;')
+    Runner(m, io.BytesIO()).each('ADD-FIELDS', records.read(io.BytesIO(DATA)))
+    return m.data_stack
+
+
+if __name__ == '__main__':
+    assert per_line_eval() == each() == [4 * LINES]
+    for name, func in (('eval', per_line_eval), ('each', each)):
+        best = min(timeit.repeat(func, number=1, repeat=3))
+        print('%-6s %8.2f ms  %6.0f ns/record' % (name, best * 1e3, best * 1e9 / LINES))
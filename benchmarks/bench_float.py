@@ -0,0 +1,29 @@
+# coding= utf-8
+"""
+Times summing and taking the dot product of a float array in data space: in
+a Forth loop, one F@ at a time, and with the bulk words FSUM and FDOT.
+
+    $ python benchmarks/bench_float.py
+"""
+from __future__ import unicode_literals, print_function
+
+import timeit
+
+import forth
+
+COUNT = 10000
+
+
+def bench(name, source, repeat=5):
+    m = forth.Machine()
+    m.eval('CREATE V %s' % ' '.join('%d.5E0 F,' % (i % 100) for i in range(COUNT)))
+    m.eval(source)
+    best = min(timeit.repeat(lambda: m.run('RUN'), number=1, repeat=repeat))
+    print('%-10s %8.2f ms  %6.0f ns/element' % (name, best * 1e3, best * 1e9 / COUNT))
+
+
+if __name__ == '__main__':
+    bench('loop sum', ': RUN 0E0 %d 0 DO V I FLOATS + F@ F+ LOOP FDROP ;' % COUNT)
+    bench('FSUM', ': RUN V %d FSUM FDROP ;' % COUNT)
+    bench('loop dot', ': RUN 0E0 %d 0 DO V I FLOATS + F@ FDUP F* F+ LOOP FDROP ;' % COUNT)
+    bench('FDOT', ': RUN V V %d FDOT FDROP ;' % COUNT)
@@ -0,0 +1,31 @@
+# coding= utf-8
+"""
+Times printing a table of cells: one . at a time in a loop, in one .CELLS,
+and through pictured numeric output, in decimal and in hex.
+
+    $ python benchmarks/bench_format.py
+"""
+from __future__ import unicode_literals, print_function
+
+import timeit
+
+import forth
+
+COUNT = 2000
+
+
+def bench(name, source, repeat=5):
+    m = forth.Machine()
+    m.eval('CREATE TABLE %s' % ' '.join('%d ,' % (i * 7919) for i in range(COUNT)))
+    m.eval(source)
+    for base in ('DECIMAL', 'HEX'):
+        m.eval(base)
+        best = min(timeit.repeat(lambda: m.run('SHOW'), number=1, repeat=repeat))
+        print('%-8s %-8s %8.2f ms  %6.0f ns/cell'
+              % (name, base, best * 1e3, best * 1e9 / COUNT))
+
+
+if __name__ == '__main__':
+    bench('.', ': SHOW %d 0 DO TABLE I CELLS + @ . LOOP ;' % COUNT)
+    bench('<# #S #>', ': SHOW %d 0 DO TABLE I CELLS + @ 0 <# #S #> TYPE LOOP ;' % COUNT)
+    bench('.CELLS', ': SHOW TABLE %d .CELLS ;' % COUNT)
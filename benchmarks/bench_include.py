@@ -0,0 +1,46 @@
+# coding= utf-8
+"""
+Times including a generated source file of many definitions, compiling it
+from source and loading it from the __forthcache__ directory.
+
+    $ python benchmarks/bench_include.py
+"""
+from __future__ import unicode_literals, print_function
+
+import io
+import os
+import shutil
+import tempfile
+import timeit
+
+import forth
+
+WORDS = 500
+
+
+def source():
+    lines = [': W0 ( n -- n ) 1 + ;']
+    for i in range(1, WORDS):
+        lines.append(': W%d ( n -- n ) DUP 0 > IF W%d ELSE 0 DO I + LOOP THEN 2 * ;'
+                     % (i, i - 1))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'prelude.fs')
+        with io.open(path, 'w') as f:
+            f.write(source())
+
+        def include(cache_dir):
+            m = forth.Machine()
+            m.cache_dir = cache_dir
+            m.include(path)
+
+        for name, cache_dir in (('compile', False), ('cached', None)):
+            include(cache_dir)
+            best = min(timeit.repeat(lambda: include(cache_dir), number=1, repeat=5))
+            print('%-8s %8.2f ms  %6.0f us/word' % (name, best * 1e3, best * 1e6 / WORDS))
+    finally:
+        shutil.rmtree(directory)
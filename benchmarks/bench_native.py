@@ -0,0 +1,29 @@
+# coding= utf-8
+"""
+Times calls into Python from Forth: a countdown loop made of core natives, and
+the same loop through words added with add_stackmethod and add_native.
+
+    $ python benchmarks/bench_native.py
+"""
+from __future__ import unicode_literals, print_function
+
+import timeit
+
+import forth
+
+COUNT = 20000
+
+
+def bench(name, setup, repeat=5):
+    m = forth.Machine()
+    setup(m)
+    m.eval(': COUNTDOWN BEGIN DEC DUP 0 <= UNTIL DROP ;')
+    best = min(timeit.repeat(lambda: m.run('%d COUNTDOWN' % COUNT),
+                             number=1, repeat=repeat))
+    print('%-12s %8.2f ms  %6.0f ns/iteration' % (name, best * 1e3, best * 1e9 / COUNT))
+
+
+if __name__ == '__main__':
+    bench('colon', lambda m: m.eval(': DEC 1 - ;'))
+    bench('stackmethod', lambda m: m.add_stackmethod('DEC', lambda a: a - 1))
+    bench('native', lambda m: m.add_native('DEC', lambda a: a - 1, '( n -- n-1 )'))
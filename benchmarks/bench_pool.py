@@ -0,0 +1,50 @@
+# coding= utf-8
+"""
+Times a batch of CPU-bound jobs on pools of 1 to 8 threads sharing a
+dictionary, for how well they scale -- on a free-threaded build of CPython,
+with the cores -- and how much they contend on what's shared: with plain
+calls, and with late-bound call sites, which jobs that redefine the word
+they call keep invalidating for one another.
+
+    $ python benchmarks/bench_pool.py
+"""
+from __future__ import unicode_literals, print_function
+
+import sys
+import time
+
+import forth
+from forth.pool import Dictionary, Pool
+
+JOBS = 32
+WORKERS = (1, 2, 4, 8)
+
+SOURCE = ': STEP 1 + ; : WORK 0 SWAP 0 DO STEP LOOP ;'
+
+
+def bench(name, dictionary, job):
+    base = None
+    for workers in WORKERS:
+        with Pool(dictionary, max_workers=workers) as pool:
+            list(pool.map([job] * workers))  # warm up every worker
+            started = time.time()
+            list(pool.map([job] * JOBS))
+            seconds = time.time() - started
+        base = base or seconds
+        print('%-22s %d workers %8.1f ms  %5.2fx'
+              % (name, workers, seconds * 1e3, base / seconds))
+
+
+def template(source):
+    m = forth.Machine()
+    m.eval(source)
+    return Dictionary(m)
+
+
+if __name__ == '__main__':
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print('GIL %s' % ('enabled' if gil else 'disabled'))
+    bench('plain calls', template(SOURCE), '10000 WORK')
+    bench('late-bound calls', template('LATE-BINDING ' + SOURCE), '10000 WORK')
+    bench('redefining late-bound', template('LATE-BINDING ' + SOURCE),
+          ': STEP 2 + ; 10000 WORK')
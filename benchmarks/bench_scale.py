@@ -0,0 +1,27 @@
+# coding= utf-8
+"""
+Times fixed-point scaling, n * num / den, in a loop: as a sequence of
+single-cell words, and with the native */.
+
+    $ python benchmarks/bench_scale.py
+"""
+from __future__ import unicode_literals, print_function
+
+import timeit
+
+import forth
+
+COUNT = 20000
+
+
+def bench(name, scale, repeat=5):
+    m = forth.Machine()
+    m.eval(': SCALE %s ;' % scale)
+    m.eval(': RUN 0 DO I 3 4 SCALE DROP LOOP ;')
+    best = min(timeit.repeat(lambda: m.run('%d RUN' % COUNT), number=1, repeat=repeat))
+    print('%-12s %8.2f ms  %6.0f ns/iteration' % (name, best * 1e3, best * 1e9 / COUNT))
+
+
+if __name__ == '__main__':
+    bench('>R * R> /', '>R * R> /')
+    bench('*/', '*/')
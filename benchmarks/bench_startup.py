@@ -0,0 +1,43 @@
+# coding= utf-8
+"""
+Times `import forth` (in a fresh interpreter each time, net of starting the
+interpreter) and making a new Machine, and checks both against a budget:
+exits with status 1 if either is over, so that a slow startup creeping back
+in gets noticed.
+
+    $ python benchmarks/bench_startup.py
+"""
+from __future__ import unicode_literals, print_function
+
+import os
+import subprocess
+import sys
+import timeit
+
+import forth
+
+# Generous, so as to hold on slow or busy machines: well above what it takes.
+IMPORT_BUDGET = 0.100
+MACHINE_BUDGET = 0.000100
+
+
+def run_python(code, repeat):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    def run():
+        subprocess.check_call([sys.executable, '-c', code], env=env)
+    return min(timeit.repeat(run, number=1, repeat=repeat))
+
+
+def report(name, seconds, budget):
+    over = seconds > budget
+    print('%-12s %8.2f ms  (budget %.2f ms)%s'
+          % (name, seconds * 1e3, budget * 1e3, '  OVER' if over else ''))
+    return over
+
+
+if __name__ == '__main__':
+    imported = run_python('import forth', 10) - run_python('pass', 10)
+    machine = min(timeit.repeat(forth.Machine, number=1000, repeat=5)) / 1000
+    over = report('import', imported, IMPORT_BUDGET)
+    over |= report('Machine()', machine, MACHINE_BUDGET)
+    sys.exit(1 if over else 0)
@@ -0,0 +1,29 @@
+# coding= utf-8
+"""
+Times printing a line of text many times: a character at a time with EMIT,
+and as a string literal with ." (one TYPE).
+
+    $ python benchmarks/bench_type.py
+"""
+from __future__ import unicode_literals, print_function
+
+import timeit
+
+import forth
+
+COUNT = 2000
+TEXT = 'Total records processed:'
+
+
+def bench(name, source, repeat=5):
+    m = forth.Machine()
+    m.eval(source)
+    assert m.run('1 REPORT').output == TEXT + ' ok'
+    best = min(timeit.repeat(lambda: m.run('%d REPORT' % COUNT), number=1, repeat=repeat))
+    print('%-6s %8.2f ms  %6.0f ns/line' % (name, best * 1e3, best * 1e9 / COUNT))
+
+
+if __name__ == '__main__':
+    emits = ' '.join('%d EMIT' % ord(c) for c in TEXT)
+    bench('EMIT', ': REPORT 0 DO %s LOOP ;' % emits)
+    bench('."', ': REPORT 0 DO ." %s" LOOP ;' % TEXT)
@@ -0,0 +1,27 @@
+# coding= utf-8
+"""
+Times a tight BEGIN ... UNTIL countdown on both the tree-walking interpreter
+(Machine.eval) and the flat engine (Machine.run).
+
+    $ python benchmarks/bench_until.py
+"""
+from __future__ import unicode_literals, print_function
+
+import timeit
+
+import forth
+
+COUNT = 20000
+SOURCE = ': COUNTDOWN BEGIN 1 - DUP 0 <= UNTIL DROP ;'
+
+
+def bench(name, run, repeat=5):
+    m = forth.Machine()
+    m.eval(SOURCE)
+    best = min(timeit.repeat(lambda: run(m), number=1, repeat=repeat))
+    print('%-8s %8.2f ms  %6.0f ns/iteration' % (name, best * 1e3, best * 1e9 / COUNT))
+
+
+if __name__ == '__main__':
+    bench('eval', lambda m: m.eval('%d COUNTDOWN' % COUNT))
+    bench('run', lambda m: m.run('%d COUNTDOWN' % COUNT))
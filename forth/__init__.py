@@ -23,3 +23,4 @@ curses-like treatment of the terminal as a grid of cells, therefore some words
 regardless of the terminal's actual size).
 """
 from forth.machine import *
+from forth.native import native_word
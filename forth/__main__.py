@@ -0,0 +1,238 @@
+# coding= utf-8
+"""
+Runs Forth source files (or standard input) non-interactively, e.g.:
+
+    $ python -m forth prelude.fs main.fs
+    $ echo '6 7 * .' | python -m forth
+    42
+
+Input is fed to the flat engine (see :meth:`forth.Machine.run`) a line at a
+time, and output is written out as soon as it's produced, without the REPL's
+' ok' prompts. On an error, the message goes to standard error and the exit
+status is 1; running out of the --budget of instructions exits with 3.
+
+With --each WORD, the files (or standard input) are data instead: WORD is run
+once per line, with the line's address and length in the data space on the
+stack, as in
+
+    $ python -m forth -e ': FIRST 1 FIELD DROP C@ EMIT ;' --each FIRST < data
+
+See :mod:`forth.stream` for the words it adds.
+"""
+from __future__ import unicode_literals, print_function
+
+import argparse
+import io
+import sys
+import time
+
+import forth
+from forth.engine import Continuation
+from forth.stream import Records
+
+# Instructions to run between checks of the output and the budget.
+SLICE = 10000
+# Output held back, in --each mode, before it's written out.
+BUFFER_SIZE = 64 * 1024
+
+EXIT_ERROR = 1
+EXIT_BUDGET = 3
+
+
+class OutOfSteps(Exception): pass
+
+
+def _write(stream, text):
+    stream = getattr(stream, 'buffer', stream)
+    stream.write(text.encode('utf-8'))
+    stream.flush()
+
+
+def _open(path):
+    """ Opens a file, or standard input for '-', for reading bytes. """
+    if path == '-':
+        return io.open(sys.stdin.fileno(), 'rb', closefd=False)
+    try:
+        return io.open(path, 'rb')
+    except (IOError, OSError):
+        raise forth.ForthError('cannot open file: %s' % path)
+
+
+class Runner(object):
+    """
+    Runs text on a machine to the end, writing its output to `out` as it
+    goes. With a `budget`, at most that many instructions are run in all
+    before :exc:`OutOfSteps` is raised.
+    """
+    def __init__(self, machine, out, budget=None):
+        self.machine = machine
+        self.out = out
+        self.budget = budget
+        self.pending = []
+        self.pending_size = 0
+
+    def write(self, text):
+        self.pending.append(text)
+        self.pending_size += len(text)
+
+    def flush(self):
+        if self.pending:
+            _write(self.out, ''.join(self.pending))
+            self.pending = []
+            self.pending_size = 0
+
+    def _finish(self, cont, batch=False):
+        """
+        Runs a continuation to the end, in slices, writing out the output of
+        each as it's done (or, to `batch` it, leaving it to the caller).
+        """
+        machine = self.machine
+        while not cont.done:
+            slice_ = SLICE if self.budget is None else min(SLICE, self.budget)
+            if not slice_:
+                machine.cancel(cont)
+                self.flush()
+                raise OutOfSteps()
+            steps = cont.steps
+            cont.resume(slice_)
+            if self.budget is not None:
+                self.budget -= cont.steps - steps
+            if cont.output:
+                self.write(cont.output)
+                if not batch:
+                    self.flush()
+            time.sleep(cont.sleep_time())
+        if cont.error is not None:
+            self.flush()
+            raise cont.error
+
+    def feed(self, text):
+        """ Runs `text`, raising the :exc:`ForthError` it stops on, if any. """
+        self._finish(self.machine.run(text, budget=0, interactive=False))
+        self.flush()
+
+    def each(self, name, records):
+        """
+        Runs the word `name` for each (address, length) pair from `records`,
+        on top of whatever is on the stack already.
+        """
+        machine = self.machine
+        word = machine.find(name)
+        if word is None:
+            raise forth.ForthError('undefined word: %s' % name)
+
+        cont = Continuation(machine, None, interactive=False)
+        for number, record in enumerate(records, 1):
+            machine.data_stack.extend(record)
+            cont.start(word, keep_stacks=True)
+            try:
+                self._finish(cont, batch=True)
+            except forth.ForthError as e:
+                e.line = number
+                raise
+            if self.pending_size > BUFFER_SIZE:
+                self.flush()
+        self.flush()
+
+    def feed_lines(self, lines):
+        for number, line in enumerate(lines, 1):
+            try:
+                self.feed(line)
+            except forth.ForthError as e:
+                e.line = number
+                raise
+
+
+def _lines(path):
+    with _open(path) as stream:
+        for line in iter(stream.readline, b''):
+            yield line.decode('utf-8')
+
+
+def run(args):
+    machine = forth.Machine()
+    runner = Runner(machine, sys.stdout, args.budget)
+    if args.each is not None:
+        records = Records(machine, args.delimiter.encode('utf-8'),
+                          args.field_separator.encode('utf-8'))
+        machine.add_vocabulary(records)
+
+    sources = [('preload', path) for path in args.preload]
+    sources += [('-e', text) for text in args.evaluate]
+    if args.each is not None:
+        sources += [('each', path) for path in args.files or ['-']]
+        sources += [('--end', text) for text in args.end]
+    elif args.files or not args.evaluate:
+        sources += [(path, None) for path in args.files or ['-']]
+
+    for name, text in sources:
+        try:
+            if name == 'preload':
+                name = text
+                _write(sys.stdout, machine.include(text))
+            elif name in ('-e', '--end'):
+                runner.feed(text)
+            elif name == 'each':
+                name = text
+                with _open(text) as stream:
+                    runner.each(args.each, records.read(stream))
+            else:
+                runner.feed_lines(_lines(name))
+                if machine.mode is forth.COMPILE_MODE:
+                    raise forth.ForthError('unfinished definition: %s'
+                                           % machine.now_compiling)
+        except forth.ForthError as e:
+            if getattr(e, 'line', None) is not None:
+                name = '%s:%d' % (name, e.line)
+            _write(sys.stderr, '%s: %s\n' % (name, e))
+            return EXIT_ERROR
+        except OutOfSteps:
+            _write(sys.stderr, '%s: instruction budget exhausted\n' % name)
+            return EXIT_BUDGET
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m forth',
+                                     description=__doc__.split('\n\n')[0])
+    parser.add_argument('files', nargs='*', metavar='FILE',
+                        help="source files to run, in order ('-' for standard "
+                             "input, the default)")
+    parser.add_argument('-e', '--evaluate', action='append', default=[],
+                        metavar='TEXT', help='run TEXT (before any files)')
+    parser.add_argument('-p', '--preload', action='append', default=[],
+                        metavar='FILE',
+                        help='INCLUDE a file first, from its compiled cache '
+                             'if possible')
+    parser.add_argument('--each', metavar='WORD',
+                        help='run WORD on each record of the files (or '
+                             'standard input), given its ( addr len )')
+    parser.add_argument('--end', action='append', default=[], metavar='TEXT',
+                        help='with --each, run TEXT after the last record')
+    parser.add_argument('-d', '--delimiter', default='\n',
+                        help='with --each, what separates records (default: '
+                             'newlines)')
+    parser.add_argument('-F', '--field-separator', default='',
+                        help='what separates the fields of a record (default: '
+                             'runs of whitespace)')
+    parser.add_argument('--budget', type=int, metavar='N',
+                        help='stop after N instructions in all')
+    parser.add_argument('--profile', action='store_true',
+                        help='profile the run, writing the statistics to '
+                             'standard error')
+    args = parser.parse_args(argv)
+
+    if not args.profile:
+        return run(args)
+
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(run, args)
+    finally:
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(25)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
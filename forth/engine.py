@@ -0,0 +1,489 @@
+# coding= utf-8
+"""
+A flat, resumable execution engine for :class:`forth.Machine`.
+
+:meth:`Machine.eval` walks the tree of tokens a colon definition compiles to,
+recursing into loops and branches, so it can only ever run to completion. The
+engine here lowers each definition (once) into flat code -- a list of
+(op, argument) pairs with explicit jumps -- and runs it in a single dispatch
+loop whose whole state lives in a :class:`Continuation`: the instruction
+pointer, the call frames, the loop bounds, the stacks and whatever input is
+still left to parse. That makes it cheap to stop after a given number of
+instructions and to pick up again later.
+
+The flat ops are:
+
+    NUMBER n           push n
+    FLOAT r            push r onto the float stack
+    CALL func          run a primitive, as func(machine)
+    ENTER word         run a colon definition
+    MEMO func          run a PURE colon definition: from its cache, or by
+                       entering the original, storing what it leaves on return
+    SITE site          run whatever word a late-bound CallSite resolves to
+    JUMP i             carry on from i
+    JUMP_IF_ZERO i     pop, and carry on from i if the value was zero
+    JUMP_IF_NONZERO i  pop, and carry on from i unless the value was zero
+    DO i               start a DO loop whose code ends at i (skipping it if empty)
+    LOOP i             step the innermost DO loop, going back to i if not done
+    LEAVE              leave the innermost running DO loop
+    EXECUTE            pop a word and run it
+
+A continuation is also what the machine's tasks (see `TASK` and `ACTIVATE`)
+run on; a task that PAUSEs simply stops where it is until its next turn.
+Other input that PAUSEs gives the tasks their turns out of its own budget,
+and carries on from the PAUSE once they've all had one.
+"""
+from __future__ import unicode_literals
+
+from array import array
+import time
+
+from forth.machine import (Machine, ForthError, ImmediateQuit, LeaveLoop, Pause,
+                           IMMEDIATE_MODE, COMPILE_MODE, _is_colon)
+from forth.metrics import clock
+from forth.parser import Parser
+from forth.quotas import SAFEPOINT
+
+
+def flatten(tokens):
+    """ Lowers a tree of tokens, as compiled by `;`, into flat code. """
+    code = []
+    _lower(tokens, code)
+    return code
+
+
+def _lower(tokens, code):
+    for kind, token in tokens:
+        if kind == 'CALL':
+            if token.__func__ is _execute:
+                code.append(('EXECUTE', None))
+            elif hasattr(token, 'tokens'):
+                code.append(('ENTER', token))
+            elif _is_colon(token):
+                code.append(('MEMO', token.__func__))
+            else:
+                code.append(('CALL', token.__func__))
+        elif kind == 'LOOP':
+            do = len(code)
+            code.append(None)
+            _lower(token, code)
+            code.append(('LOOP', do + 1))
+            code[do] = ('DO', len(code))
+        elif kind == 'BRANCH':
+            true_tokens, false_tokens = token
+            test = len(code)
+            code.append(None)
+            _lower(true_tokens, code)
+            if false_tokens:
+                skip = len(code)
+                code.append(None)
+                code[test] = ('JUMP_IF_ZERO', len(code))
+                _lower(false_tokens, code)
+                code[skip] = ('JUMP', len(code))
+            else:
+                code[test] = ('JUMP_IF_ZERO', len(code))
+        elif kind == 'WHILE':
+            # The test goes at the bottom, so that each time around the loop
+            # costs a single test-and-jump.
+            begin_tokens, while_tokens = token
+            enter = len(code)
+            code.append(None)
+            body = len(code)
+            _lower(while_tokens, code)
+            code[enter] = ('JUMP', len(code))
+            _lower(begin_tokens, code)
+            code.append(('JUMP_IF_NONZERO', body))
+        elif kind == 'UNTIL':
+            begin = len(code)
+            _lower(token, code)
+            code.append(('JUMP_IF_ZERO', begin))
+        elif kind == 'LEAVE':
+            code.append(('LEAVE', None))
+        else:
+            code.append((kind, token))
+
+
+def code_for(word):
+    """
+    Returns the flat code for a colon definition, lowering it if need be,
+    or for a PURE one.
+    """
+    return _code(word.__func__)
+
+
+def _code(func):
+    try:
+        return func.code
+    except AttributeError:
+        if hasattr(func, 'tokens'):
+            func.code = flatten(func.tokens)
+        else:
+            func.code = [('MEMO', func)]
+        return func.code
+
+
+# EXECUTE is run by the engine itself, so that the word it runs can be
+# suspended like any other, whether it was compiled or typed in.
+_execute = Machine.__dict__['_execute']
+_EXECUTE = [('EXECUTE', None)]
+
+
+class Continuation(object):
+    """
+    The state of a piece of Forth input being run on the flat engine: see
+    :meth:`Machine.run`. After each call to :meth:`resume`, `output` holds the
+    text produced during that call, and `done` whether the input has been
+    run to the end (or failed, in which case `error` holds the
+    :exc:`ForthError`).
+
+    A continuation with no `text` at all has nothing to parse, and is done
+    as soon as the word it was started on (see :meth:`start`) returns. One
+    that isn't `interactive` leaves the ' ok' (or ' compiled') off the end of
+    its output, and any error message too, which is then only in `error`.
+    `steps` counts the instructions run so far.
+
+    Each call to :meth:`resume` adds what it ran to `machine.metrics` (see
+    :mod:`forth.metrics`) when it returns, including how long the input took
+    to run, counting from when it was made (or started), once it's done.
+
+    While the machine has `quotas` (see :mod:`forth.quotas`), it runs in
+    slices of at most SAFEPOINT instructions, checking them before each one;
+    `output_size` counts the characters of output so far, for them.
+    """
+    def __init__(self, machine, text='', data_stack=None, return_stack=None,
+                 float_stack=None, interactive=True):
+        self.machine = machine
+        self.parser = None if text is None else Parser(text)
+        self.interactive = interactive
+        self.data_stack = machine.data_stack if data_stack is None else data_stack
+        self.return_stack = machine.return_stack if return_stack is None else return_stack
+        self.float_stack = machine.float_stack if float_stack is None else float_stack
+
+        self.code = ()
+        self.ip = 0
+        self.loops = []
+        self.frames = []
+
+        self.output = ''
+        self.done = False
+        self.cancelled = False
+        self.error = None
+        self.wake_at = 0
+        self.turns = 0
+        self.paused = False
+        self.steps = 0
+        self.started = clock()
+        self.output_size = 0
+        self.started_at_step = self.steps
+
+    def start(self, word, keep_stacks=False):
+        """
+        Sets this continuation off afresh, running `word` on empty stacks (or
+        on the ones it has, with `keep_stacks`).
+        """
+        if _is_colon(word):
+            self.code = code_for(word)
+        else:
+            self.code = [('CALL', word.__func__)]
+        self.ip = 0
+        self.loops = []
+        self.frames = []
+        if not keep_stacks:
+            self.data_stack = []
+            self.return_stack = []
+            self.float_stack = array('d')
+
+        self.done = False
+        self.cancelled = False
+        self.error = None
+        self.wake_at = 0
+        self.turns = 0
+        self.paused = False
+        self.started = clock()
+        self.output_size = 0
+        self.started_at_step = self.steps
+
+    def resume(self, budget=None):
+        """
+        Runs at most `budget` more instructions (or until done, if `budget`
+        is None) and returns self.
+        """
+        if self.done:
+            return self._resume(budget)
+
+        check = self.machine.quotas is not None
+        is_task = self.machine.current_task is self
+        out = []
+        while True:
+            size = budget
+            if check:
+                size = SAFEPOINT if budget is None else min(budget, SAFEPOINT)
+            steps = self.steps
+            self._resume(size, check)
+            out.append(self.output)
+            self.output_size += len(self.output)
+            if budget is not None:
+                budget -= self.steps - steps
+            # A task's turn ends when it PAUSEs; anything else carries on,
+            # giving the tasks their turns first.
+            if self.done or budget == 0 or (self.paused and is_task):
+                break
+            if self.wake_at:
+                # Waiting in MS: with a budget, the caller does the waiting.
+                if budget is not None:
+                    break
+                time.sleep(self.sleep_time())
+        self.output = ''.join(out)
+        return self
+
+    def sleep_time(self):
+        """
+        How long the caller might as well wait before resuming, in seconds:
+        while the input waits in MS, until then, the next task is due or the
+        time quota runs out, and otherwise 0.
+        """
+        if self.done or not self.wake_at:
+            return 0
+        machine = self.machine
+        wake_at = min([self.wake_at] + [task.wake_at for task in machine.ready])
+        delay = wake_at - time.time()
+        quotas = machine.quotas
+        if quotas is not None and quotas.seconds is not None:
+            delay = min(delay, quotas.seconds - (clock() - self.started))
+        return max(delay, 0)
+
+    def _resume(self, budget, check=False):
+        if self.done:
+            self.output = ''
+            return self
+
+        machine = self.machine
+        machine.data_stack = self.data_stack
+        machine.return_stack = self.return_stack
+        machine.float_stack = self.float_stack
+        if self.parser is not None:
+            machine.parser = self.parser
+        continuation, machine.continuation = machine.continuation, self
+        self.paused = False
+
+        out = []
+        code, ip, loops, frames = self.code, self.ip, self.loops, self.frames
+        remaining = -1 if budget is None else budget
+        calls = 0
+        # The deepest the stacks have been, as seen at loop back-edges.
+        data_max = return_max = 0
+        # Instructions run by tasks, on this continuation's budget.
+        task_steps = 0
+        try:
+            if check:
+                machine.input_started = self.started
+                machine.quotas.check(machine, clock() - self.started,
+                                     calls=len(frames), output=self.output_size,
+                                     instructions=self.steps - self.started_at_step)
+            if self.wake_at > time.time() and not self.turns:
+                # Still waiting in MS: the tasks get the time instead.
+                self.turns = len(machine.ready)
+            if self.turns:
+                output, task_steps, self.turns = machine._run_tasks(
+                    self.turns, None if budget is None else remaining)
+                if output:
+                    out.append(output)
+                remaining -= task_steps
+            if self.wake_at:
+                if self.wake_at > time.time():
+                    raise Pause()
+                self.wake_at = 0
+            while remaining:
+                remaining -= 1
+
+                if ip < len(code):
+                    op, arg = code[ip]
+                    ip += 1
+                    if op == 'CALL':
+                        calls += 1
+                        output = arg(machine)
+                        if output:
+                            out.append(output)
+                    elif op == 'SITE':
+                        calls += 1
+                        # The call site's inline cache is good until the next
+                        # definition changes the machine's generation.
+                        generation, target, func, is_colon = arg.cache
+                        if generation != machine.generation:
+                            generation, target, func, is_colon = arg.resolve(machine)
+                        if is_colon:
+                            frames.append((code, ip, loops))
+                            code, ip, loops = code_for(target), 0, []
+                        else:
+                            output = func(machine)
+                            if output:
+                                out.append(output)
+                    elif op == 'NUMBER':
+                        machine.data_stack.append(arg)
+                    elif op == 'ENTER':
+                        calls += 1
+                        frames.append((code, ip, loops))
+                        code, ip, loops = code_for(arg), 0, []
+                    elif op == 'MEMO':
+                        calls += 1
+                        key, depth = machine._memo_lookup(arg)
+                        if key is not None:
+                            # Stored by the frame underneath, on return.
+                            frames.append((code, ip, loops))
+                            frames.append(([('MEMO_STORE', (arg, key, depth))], 0, []))
+                            code, ip, loops = _code(arg.original), 0, []
+                    elif op == 'MEMO_STORE':
+                        machine._memo_store(*arg)
+                    elif op == 'JUMP_IF_ZERO':
+                        if not machine._pop():
+                            if arg < ip:
+                                depth = len(machine.data_stack)
+                                if depth > data_max:
+                                    data_max = depth
+                                depth = len(machine.return_stack)
+                                if depth > return_max:
+                                    return_max = depth
+                            ip = arg
+                    elif op == 'JUMP_IF_NONZERO':
+                        if machine._pop():
+                            depth = len(machine.data_stack)
+                            if depth > data_max:
+                                data_max = depth
+                            depth = len(machine.return_stack)
+                            if depth > return_max:
+                                return_max = depth
+                            ip = arg
+                    elif op == 'JUMP':
+                        ip = arg
+                    elif op == 'DO':
+                        index = machine._pop()
+                        loop_end = machine._pop()
+                        if index < loop_end:
+                            machine._return_push(index)
+                            loops.append((loop_end, arg))
+                        else:
+                            ip = arg
+                    elif op == 'LOOP':
+                        index = machine._return_pop()
+                        index += machine._pop()
+                        if index < loops[-1][0]:
+                            machine._return_push(index)
+                            depth = len(machine.data_stack)
+                            if depth > data_max:
+                                data_max = depth
+                            depth = len(machine.return_stack)
+                            if depth > return_max:
+                                return_max = depth
+                            ip = arg
+                        else:
+                            loops.pop()
+                    elif op == 'LEAVE':
+                        # Like LeaveLoop, this leaves whichever loop is running,
+                        # even if that is in a word further up the call chain.
+                        while not loops:
+                            if not frames:
+                                raise LeaveLoop('not looping')
+                            code, ip, loops = frames.pop()
+                        ip = loops.pop()[1]
+                    elif op == 'EXECUTE':
+                        calls += 1
+                        word = machine._pop_word()
+                        if _is_colon(word):
+                            frames.append((code, ip, loops))
+                            code, ip, loops = code_for(word), 0, []
+                        else:
+                            output = word.__func__(machine)
+                            if output:
+                                out.append(output)
+                    elif op == 'FLOAT':
+                        machine.float_stack.append(arg)
+                    else:
+                        machine.interpret_one_immediate(op, arg)
+
+                elif frames:
+                    code, ip, loops = frames.pop()
+
+                else:
+                    # Back at the top level: on to the next word of input.
+                    if self.parser is None:
+                        self.done = True
+                        break
+                    try:
+                        word = self.parser.next_word()
+                    except StopIteration:
+                        self.done = True
+                        if self.interactive:
+                            if machine.mode is IMMEDIATE_MODE:
+                                out.append(' ok')
+                            elif machine.mode is COMPILE_MODE:
+                                out.append(' compiled')
+                        break
+
+                    kind, token = machine.tokenize_one(word)
+                    if machine.mode is COMPILE_MODE:
+                        output = machine.interpret_one_compile(kind, token)
+                    elif kind == 'CALL' and _is_colon(token):
+                        code, ip, loops = code_for(token), 0, []
+                        continue
+                    elif kind == 'CALL' and token.__func__ is _execute:
+                        code, ip, loops = _EXECUTE, 0, []
+                        continue
+                    else:
+                        output = machine.interpret_one_immediate(kind, token)
+                    if output:
+                        out.append(output)
+
+        except Pause:
+            self.paused = True
+        except ImmediateQuit:
+            self.done = True
+        except ForthError as e:
+            machine._abort()
+            if self.interactive:
+                out.append(' ? %s' % e)
+            self.done = True
+            self.error = e
+        finally:
+            steps = budget - remaining if budget is not None else -1 - remaining
+            self.steps += steps
+            metrics = machine.metrics
+            metrics.instructions += steps - task_steps
+            metrics.calls += calls
+            metrics.sample(data_max, return_max)
+            if self.done:
+                metrics.finished(clock() - self.started)
+            else:
+                metrics.sample(len(machine.data_stack), len(machine.return_stack))
+            if self.done:
+                code, ip, loops, frames = (), 0, [], []
+            self.code, self.ip, self.loops, self.frames = code, ip, loops, frames
+            self.data_stack = machine.data_stack
+            self.return_stack = machine.return_stack
+            self.float_stack = machine.float_stack
+            machine.continuation = continuation
+            self.output = ''.join(out)
+
+        return self
+
+    def cancel(self):
+        """
+        Stops this continuation for good. As after an error, its stacks are
+        emptied and any half-compiled definition is dropped.
+        """
+        if self.done:
+            return
+        self.done = True
+        self.cancelled = True
+        self.code, self.ip, self.loops, self.frames = (), 0, [], []
+        self.output = ''
+
+        machine = self.machine
+        if self.data_stack is machine.data_stack:
+            machine._abort()
+            self.data_stack = machine.data_stack
+            self.return_stack = machine.return_stack
+            self.float_stack = machine.float_stack
+        else:
+            self.data_stack = []
+            self.return_stack = []
+            self.float_stack = array('d')
@@ -0,0 +1,23 @@
+# coding= utf-8
+"""
+The exceptions a :class:`forth.Machine` raises, kept apart from the machine
+itself so that the modules it is built from can share them.
+"""
+from __future__ import unicode_literals
+
+
+class ForthError(Exception):
+    # The output made before the error was raised, which would otherwise be
+    # lost with the return values it was to be part of.
+    output = ''
+
+class ImmediateQuit(ForthError): pass
+class LeaveLoop(ForthError): pass
+class Pause(Exception): pass
+
+
+class QuotaExceeded(ForthError):
+    """ Going over one of a machine's quotas: see :mod:`forth.quotas`. """
+    def __init__(self, quota):
+        ForthError.__init__(self, 'quota exceeded: %s' % quota.replace('_', ' '))
+        self.quota = quota
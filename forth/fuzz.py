@@ -0,0 +1,324 @@
+# coding= utf-8
+"""
+Differential fuzzing of the ways a :class:`forth.Machine` can run a program.
+
+Random, well-formed programs -- a few colon definitions built from the words
+in `Machine.words` and nested IF/ELSE/THEN, DO/LOOP/+LOOP (with LEAVE, I and
+J), BEGIN/UNTIL and BEGIN/WHILE/REPEAT, then some code that calls them -- are
+run on the tree-walking interpreter (:meth:`Machine.eval`), which is the
+reference, and on each of the :data:`ENGINES`. Anything that comes out
+differently (the output, the stacks left behind, or the error raised) is a
+failure, which is then shrunk to a small program that still shows it:
+
+    $ python -m forth.fuzz --count 1000 --seed 1
+
+Programs that run for too long on the reference (an endless BEGIN loop, say)
+are simply skipped.
+"""
+from __future__ import unicode_literals, print_function
+
+import argparse
+import random
+import sys
+
+from forth.machine import Machine
+from forth.wordsets import WORDSETS
+
+# Instructions the reference may run before a program is given up on; the
+# engines get many more, as their instructions are finer grained.
+STEP_LIMIT = 5000
+ENGINE_BUDGET = 20 * STEP_LIMIT
+
+# Words that parse the input, define words, wait, or otherwise don't belong
+# in a generated program; the control structure words are generated apart.
+EXCLUDED = frozenset("""
+    : ; ( ' ." S" C" CREATE VARIABLE FVARIABLE TASK ACTIVATE PAUSE MS
+    INCLUDE REQUIRE RECURSE PURE EARLY-BINDING LATE-BINDING QUIT EXECUTE
+    ALLOT .R U.R WORDS COMPILE_WORD_WITH_OUTPUT_FOR_TESTING >R R> R@ I J
+    IF ELSE THEN DO LOOP +LOOP LEAVE BEGIN UNTIL WHILE REPEAT
+    VOCABULARY FORTH ALSO PREVIOUS ONLY DEFINITIONS SET-CURRENT SET-ORDER
+    FIND SEARCH-WORDLIST
+""".split())
+
+NUMBERS = (-3, -1, 0, 1, 2, 3, 5, 7, 10, 42, 65)
+FLOATS = ('0E0', '1E0', '1.5E0', '-2.5E1')
+
+
+class _TooLong(Exception): pass
+
+
+class _Reference(Machine):
+    """ The tree-walking interpreter, with a limit on how long it may run. """
+    steps = 0
+
+    def interpret_one_immediate(self, kind, token):
+        self.steps += 1
+        if self.steps > STEP_LIMIT:
+            raise _TooLong()
+        return Machine.interpret_one_immediate(self, kind, token)
+
+
+def vocabulary(machine=None):
+    """
+    The words from `machine` (or a new one), with all its optional wordsets
+    loaded, that a program may be made of.
+    """
+    machine = machine or Machine()
+    for wordset in WORDSETS:
+        machine.load_wordset(wordset)
+    return sorted(word for word in machine.words if word not in EXCLUDED)
+
+
+class Generator(object):
+    """
+    Makes random programs, as text, from `words`, using `rng`. So that not
+    every program stops at its first word with a stack underflow, words are
+    mostly preceded by as many literals as they take (as far as their stack
+    effect tells: otherwise, a guess).
+    """
+    def __init__(self, rng, words=None, max_depth=3, max_length=6):
+        self.rng = rng
+        machine = Machine()
+        available = vocabulary(machine)
+        self.words = list(words or available)
+        self.inputs = dict((word, len(machine.words[word].stack_effect[0]))
+                           for word in self.words
+                           if getattr(machine.words.get(word), 'stack_effect', None))
+        self.max_depth = max_depth
+        self.max_length = max_length
+
+    def program(self, definitions=3):
+        defined = []
+        parts = []
+        for x in range(self.rng.randint(1, definitions)):
+            name = 'W%d' % len(defined)
+            parts.append(': %s %s ;' % (name, self.body(0, 0, defined)))
+            defined.append(name)
+        # Straight-line code to finish with: no control structures outside
+        # a definition.
+        calls = [self.rng.choice(defined) if self.rng.random() < 0.6 else self.atom(defined)
+                 for x in range(self.rng.randint(1, 4))]
+        parts.append(' '.join(calls))
+        return ' '.join(parts)
+
+    def body(self, depth, loops, defined):
+        return ' '.join(self.item(depth, loops, defined)
+                        for x in range(self.rng.randint(0, self.max_length)))
+
+    def atom(self, defined):
+        roll = self.rng.random()
+        if roll < 0.3:
+            return str(self.rng.choice(NUMBERS))
+        if roll < 0.35:
+            return self.rng.choice(FLOATS)
+        if roll < 0.5 and defined:
+            return self.rng.choice(defined)
+
+        word = self.rng.choice(self.words)
+        if self.rng.random() < 0.2:
+            return word
+        inputs = self.inputs.get(word, self.rng.randint(0, 2))
+        literals = [str(self.rng.choice(NUMBERS)) for x in range(inputs)]
+        if word.startswith('F') and len(word) > 1:
+            literals += [self.rng.choice(FLOATS) for x in range(self.rng.randint(1, 2))]
+        return ' '.join(literals + [word])
+
+    def item(self, depth, loops, defined):
+        rng = self.rng
+        if depth >= self.max_depth or rng.random() < 0.7:
+            if loops and rng.random() < 0.15:
+                return rng.choice(['I', 'LEAVE'] + ['J'] * (loops > 1))
+            return self.atom(defined)
+
+        def body():
+            return self.body(depth + 1, loops, defined)
+
+        def loop_body():
+            return self.body(depth + 1, loops + 1, defined)
+
+        kind = rng.choice(['IF', 'IF-ELSE', 'DO', '+LOOP', 'UNTIL', 'WHILE'])
+        if kind == 'IF':
+            return 'IF %s THEN' % body()
+        if kind == 'IF-ELSE':
+            return 'IF %s ELSE %s THEN' % (body(), body())
+        if kind == 'DO':
+            return '%d 0 DO %s LOOP' % (rng.randint(0, 4), loop_body())
+        if kind == '+LOOP':
+            return '%d 0 DO %s %d +LOOP' % (rng.randint(0, 6), loop_body(), rng.randint(1, 3))
+        if kind == 'UNTIL':
+            return 'BEGIN %s UNTIL' % body()
+        return 'BEGIN %s WHILE %s REPEAT' % (body(), body())
+
+
+def _outcome(machine, output, error=None):
+    """
+    What running a program came to, for comparison: its output and the
+    stacks it left, or the kind of exception it ended with, if that wasn't a
+    :exc:`ForthError` (those are part of the output).
+    """
+    if error is not None:
+        return (type(error).__name__,)
+    return (output, tuple(machine.data_stack), tuple(machine.return_stack),
+            tuple(repr(value) for value in machine.float_stack))
+
+
+def reference(program, options=None):
+    """
+    Runs `program` on the tree-walker, on a machine with the given
+    attributes set; returns None if it runs for too long.
+    """
+    m = _Reference()
+    m.__dict__.update(options or {})
+    try:
+        output = m.eval(program)
+    except _TooLong:
+        return None
+    except Exception as e:
+        return _outcome(m, None, e)
+    return _outcome(m, output)
+
+
+def _run_engine(machine, program, slice_=ENGINE_BUDGET):
+    out = []
+    try:
+        cont = machine.run(program, budget=slice_)
+        out.append(cont.output)
+        spent = slice_
+        while not cont.done:
+            if spent >= ENGINE_BUDGET:
+                return ('did not finish',)
+            out.append(cont.resume(slice_).output)
+            spent += slice_
+    except Exception as e:
+        return _outcome(machine, None, e)
+    return _outcome(machine, ''.join(out))
+
+
+def flat(machine, program):
+    """ The flat engine, run to the end in one go. """
+    return _run_engine(machine, program)
+
+
+def sliced(machine, program):
+    """ The flat engine, suspended and resumed after every instruction. """
+    return _run_engine(machine, program, slice_=1)
+
+
+# The engines to check, as (name, engine, options): each engine runs a
+# program on a machine with the `options` attributes set, and is checked
+# against the reference on a machine set up the same way.
+ENGINES = [
+    ('flat', flat, {}),
+    ('sliced', sliced, {}),
+    ('late-bound', flat, {'late_binding': True}),
+]
+
+
+def compare(program, engines=None):
+    """
+    Runs `program` on the reference and on `engines` (by default,
+    :data:`ENGINES`), returning a list of (name, expected, got) for each
+    engine that disagrees. If the reference gives up on the program, it's
+    skipped, and None is returned.
+    """
+    failures = []
+    for name, engine, options in engines or ENGINES:
+        expected = reference(program, options)
+        if expected is None:
+            return None
+        machine = Machine()
+        machine.__dict__.update(options)
+        got = engine(machine, program)
+        if got != expected:
+            failures.append((name, expected, got))
+    return failures
+
+
+OPENERS = frozenset(['IF', 'DO', 'BEGIN', ':'])
+CLOSERS = frozenset(['THEN', 'LOOP', '+LOOP', 'UNTIL', 'REPEAT', ';'])
+
+
+def _structures(words):
+    """ The (start, end) spans of the control structures in `words`. """
+    spans, opened = [], []
+    for index, word in enumerate(words):
+        if word in OPENERS:
+            opened.append(index)
+        elif word in CLOSERS and opened:
+            spans.append((opened.pop(), index + 1))
+    return spans
+
+
+def minimize(program, fails):
+    """
+    Shrinks `program` to a smaller one for which `fails(text)` is still
+    true: by taking out whole control structures, then ever smaller runs of
+    words (delta debugging), for as long as that helps.
+    """
+    words = program.split()
+    while True:
+        size = len(words)
+
+        for start, end in sorted(_structures(words), reverse=True):
+            candidate = words[:start] + words[end:]
+            if candidate and fails(' '.join(candidate)):
+                words = candidate
+
+        chunk = len(words) // 2
+        while chunk >= 1:
+            start = 0
+            while start < len(words):
+                candidate = words[:start] + words[start + chunk:]
+                if candidate and fails(' '.join(candidate)):
+                    words = candidate
+                else:
+                    start += chunk
+            chunk //= 2
+
+        if len(words) == size:
+            return ' '.join(words)
+
+
+def fuzz(count, seed=None, engines=None, generator=None):
+    """
+    Tries `count` random programs, yielding (program, minimized program,
+    failures) for each one that some engine runs differently.
+    """
+    generator = generator or Generator(random.Random(seed))
+    engines = engines or ENGINES
+    for x in range(count):
+        program = generator.program()
+        failures = compare(program, engines)
+        if not failures:
+            continue
+
+        names = set(name for name, expected, got in failures)
+        def fails(text):
+            found = compare(text, [engine for engine in engines
+                                   if engine[0] in names])
+            return bool(found)
+        small = minimize(program, fails)
+        yield program, small, compare(small, engines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m forth.fuzz',
+                                     description=__doc__.split('\n\n')[0])
+    parser.add_argument('--count', type=int, default=1000,
+                        help='how many programs to try')
+    parser.add_argument('--seed', type=int, help='random seed')
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for program, small, failures in fuzz(args.count, args.seed):
+        failed += 1
+        print('program:   %s' % program)
+        print('minimized: %s' % small)
+        for name, expected, got in failures:
+            print('  %s: expected %r, got %r' % (name, expected, got))
+    print('%d of %d programs failed' % (failed, args.count))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,343 @@
+# coding= utf-8
+"""
+Loading Forth source files, as done by :meth:`forth.Machine.include` and the
+INCLUDE and REQUIRE words, with a disk cache of what each file compiles to.
+
+A file that does nothing but define words -- colon definitions, PURE marks,
+EARLY-/LATE-BINDING and nested includes -- is recorded as it's compiled, and
+the definitions it made are written (as JSON) to a `__forthcache__` directory
+next to it, much like Python's `__pycache__`. The next time the same file is
+included, the definitions are rebuilt straight from the cache, without
+parsing or compiling anything, as long as
+
+  * the file's contents and path are the same,
+  * the cache was written by this version of the cache format and a machine
+    with the same built-in words, and
+  * every word the file's definitions call but don't define (built-ins,
+    natives and words from other included files) is still the same one it
+    was compiled against.
+
+Files that do anything else (leave things on the stack, write to the data
+space, print, define variables or tasks, change the search order, call words
+defined interactively) are simply run each time.
+"""
+from __future__ import unicode_literals
+
+import hashlib
+import io
+import json
+import os
+
+from forth.errors import ForthError
+from forth.machine import CallSite, _generations
+from forth.wordsets import LAZY_WORDS
+from forth.parser import Parser
+
+CACHE_VERSION = 1
+CACHE_DIR = '__forthcache__'
+
+
+class Uncacheable(Exception): pass
+
+class Stale(Exception): pass
+
+
+def include(machine, path, require=False):
+    """ Runs the file at `path`, from its cache if possible. """
+    path = _resolve(machine, path)
+    if machine.including:
+        machine.including[-1].events.append(['include', path, require])
+    if require and path in machine.included:
+        return ''
+
+    try:
+        with io.open(path, 'rb') as f:
+            source = f.read()
+    except (IOError, OSError):
+        raise ForthError('cannot open file: %s' % path)
+
+    # Marked up front, so that files that REQUIRE each other don't recurse,
+    # but only kept if the file loads.
+    machine.included.add(path)
+    try:
+        return _load(machine, path, source)
+    except Exception:
+        machine.included.discard(path)
+        raise
+
+
+def _load(machine, path, source):
+    key = _cache_key(machine, path, source)
+    cache_path = _cache_path(machine, path)
+    if cache_path is not None:
+        entry = _read_cache(cache_path, key)
+        if entry is not None:
+            try:
+                _replay(machine, path, key, entry)
+                machine.metrics.include_hits += 1
+                return ''
+            except Stale:
+                pass
+
+    machine.metrics.include_misses += 1
+    return _compile(machine, path, key, source.decode('utf-8'), cache_path)
+
+
+def _resolve(machine, path):
+    # Relative paths in an included file are relative to that file.
+    if machine.including and not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(machine.including[-1].path), path)
+    return os.path.realpath(path)
+
+
+def _cache_key(machine, path, source):
+    digest = hashlib.sha256()
+    builtins = set(machine._core_words()) | set(LAZY_WORDS)
+    for part in (str(CACHE_VERSION), ' '.join(sorted(builtins)),
+                 path, str(machine.late_binding)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    digest.update(source)
+    return digest.hexdigest()
+
+
+def _cache_path(machine, path):
+    if machine.cache_dir is False:
+        return None
+    directory = machine.cache_dir
+    if directory is None:
+        directory = os.path.join(os.path.dirname(path), CACHE_DIR)
+    name = hashlib.sha256(path.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(directory, '%s.%s.json' % (os.path.basename(path), name))
+
+
+def _read_cache(cache_path, key):
+    try:
+        with io.open(cache_path, 'rb') as f:
+            entry = json.loads(f.read().decode('utf-8'))
+    except (IOError, OSError, ValueError):
+        return None
+    if entry.get('key') != key:
+        return None
+    return entry
+
+
+def _write_cache(cache_path, entry):
+    # Written aside and renamed into place, so that a reader never sees half
+    # a file; failing to write the cache is no reason to fail the include.
+    temp_path = '%s.%d.tmp' % (cache_path, os.getpid())
+    try:
+        directory = os.path.dirname(cache_path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with io.open(temp_path, 'wb') as f:
+            f.write(json.dumps(entry).encode('utf-8'))
+        os.rename(temp_path, cache_path)
+    except (IOError, OSError):
+        pass
+
+
+def fingerprint(machine, name, func):
+    """
+    Identifies the word `name` across runs, or returns None if it can't be:
+    it must be a built-in, a (named) native function or a word from an
+    included file.
+    """
+    if machine._builtin(name) is func:
+        return 'core'
+    native_func = getattr(func, 'native_func', None)
+    if native_func is not None and native_func.__name__ != '<lambda>':
+        return 'native:%s.%s%r' % (native_func.__module__, native_func.__name__,
+                                   func.stack_effect)
+    return getattr(func, 'fingerprint', None)
+
+
+class Recorder(object):
+    """
+    Keeps track of the definitions made while a file is included (see
+    :meth:`Machine._define`), as the events to rebuild them from the cache,
+    and of the words from elsewhere that those depend on.
+    """
+    def __init__(self, machine, path, key):
+        self.machine = machine
+        self.path = path
+        self.key = key
+        self.events = []
+        self.depends = {}
+        self.cacheable = True
+        self.local = set()
+        self.names = {}
+
+    def defined(self, name, func):
+        if hasattr(func, 'tokens'):
+            func.fingerprint = '%s:%s' % (self.key, name)
+        elif hasattr(func, 'original'):
+            original = fingerprint(self.machine, name, func.original)
+            if original is not None:
+                func.fingerprint = original + ':pure'
+
+        if getattr(self.machine.words.get(name), '__func__', None) is not func:
+            # Defined into a wordlist it can't be found in: its callers
+            # found something else, which may change without the cache
+            # knowing.
+            self.cacheable = False
+        if self.cacheable:
+            try:
+                self.events.append(self._event(name, func))
+            except Uncacheable:
+                self.cacheable = False
+        self.names[func] = name
+        self.local.add(name)
+
+    def _event(self, name, func):
+        if hasattr(func, 'tokens'):
+            return ['define', name, self._tokens(func.tokens),
+                    getattr(func, 'stack_effect', None)]
+        if hasattr(func, 'original'):
+            # A PURE mark: memoize whatever the name meant just before.
+            self._depend(name, func.original)
+            return ['pure', name, func.maxsize]
+        raise Uncacheable(name)
+
+    def _name_of(self, func):
+        if func not in self.names:
+            for name, method in self.machine.words.items():
+                if method.__func__ is func:
+                    self.names[func] = name
+                    break
+            else:
+                raise Uncacheable(func)
+        return self.names[func]
+
+    def _depend(self, name, func):
+        if name in self.local:
+            return
+        found = fingerprint(self.machine, name, func)
+        if found is None:
+            raise Uncacheable(name)
+        self.depends[name] = found
+
+    def _tokens(self, tokens):
+        ret = []
+        for kind, token in tokens:
+            if kind == 'CALL':
+                name = self._name_of(token.__func__)
+                self._depend(name, token.__func__)
+                ret.append([kind, name])
+            elif kind == 'SITE':
+                ret.append([kind, token.name])
+            elif kind in ('LOOP', 'UNTIL'):
+                ret.append([kind, self._tokens(token)])
+            elif kind in ('BRANCH', 'WHILE'):
+                ret.append([kind, [self._tokens(part) for part in token]])
+            elif kind in ('NUMBER', 'FLOAT', 'LEAVE'):
+                ret.append([kind, token])
+            else:
+                raise Uncacheable(kind)
+        return ret
+
+
+def _snapshot(machine):
+    """ What the cacheable side effects of running a file must leave alone. """
+    return (len(machine.data_stack), len(machine.float_stack), machine.here,
+            bytes(machine.memory), len(machine.tasks), machine.mode)
+
+
+def _compile(machine, path, key, text, cache_path):
+    recorder = Recorder(machine, path, key)
+    before = _snapshot(machine)
+
+    machine.including.append(recorder)
+    try:
+        output = _run(machine, text)
+    finally:
+        machine.including.pop()
+
+    if (cache_path is not None and recorder.cacheable and not output
+            and _snapshot(machine) == before):
+        _write_cache(cache_path, {'key': key,
+                                  'depends': recorder.depends,
+                                  'events': recorder.events,
+                                  'late_binding': machine.late_binding})
+    return output
+
+
+def _run(machine, text):
+    saved_parser = machine.parser
+    machine.parser = parser = Parser(text)
+    out = []
+    try:
+        while True:
+            try:
+                word = parser.next_word()
+            except StopIteration:
+                break
+            out.append(machine.interpret_one(*machine.tokenize_one(word)))
+    except ForthError as e:
+        e.output = ''.join(out) + e.output
+        raise
+    finally:
+        machine.parser = saved_parser
+    return ''.join(out)
+
+
+def _replay(machine, path, key, entry):
+    """
+    Rebuilds the definitions of a cached file. If any word they call has
+    changed since, raises :exc:`Stale`, leaving the dictionary as it was.
+    """
+    saved = ([dict(words) for words in machine.wordlists], machine.latest,
+             list(machine.memos), machine.late_binding, set(machine.included))
+
+    recorder = Recorder(machine, path, key)
+    recorder.cacheable = False
+    machine.including.append(recorder)
+    try:
+        for event in entry['events']:
+            if event[0] == 'include':
+                include(machine, event[1], event[2])
+            elif event[0] == 'define':
+                name, tokens, effect = event[1:]
+                if effect is not None:
+                    effect = tuple(tuple(cells) for cells in effect)
+                machine._define_colon(name, _tokens(machine, recorder, entry, tokens),
+                                      effect)
+            elif event[0] == 'pure':
+                _lookup(machine, recorder, entry, event[1])
+                machine.memoize(event[1], event[2])
+    except (Stale, ForthError):
+        wordlists, machine.latest, machine.memos, machine.late_binding, machine.included = saved
+        machine._restore_wordlists(wordlists, machine.search_order)
+        machine.generation = next(_generations)
+        raise Stale(path)
+    finally:
+        machine.including.pop()
+
+    machine.late_binding = entry['late_binding']
+
+
+def _lookup(machine, recorder, entry, name):
+    word = machine.find(name)
+    if word is None:
+        raise Stale(name)
+    if (name not in recorder.local and
+            fingerprint(machine, name, word.__func__) != entry['depends'].get(name)):
+        raise Stale(name)
+    return word
+
+
+def _tokens(machine, recorder, entry, tokens):
+    ret = []
+    for kind, token in tokens:
+        if kind == 'CALL':
+            ret.append((kind, _lookup(machine, recorder, entry, token)))
+        elif kind == 'SITE':
+            ret.append((kind, CallSite(token)))
+        elif kind in ('LOOP', 'UNTIL'):
+            ret.append((kind, _tokens(machine, recorder, entry, token)))
+        elif kind in ('BRANCH', 'WHILE'):
+            ret.append((kind, tuple(_tokens(machine, recorder, entry, part)
+                                    for part in token)))
+        else:
+            ret.append((kind, token))
+    return ret
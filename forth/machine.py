@@ -1,18 +1,76 @@
 # coding= utf-8
 from __future__ import unicode_literals
 
+from forth.errors import ForthError, ImmediateQuit, LeaveLoop, Pause, QuotaExceeded
+from forth.metrics import Metrics, clock
+from forth.quotas import Quotas
 from forth.parser import Parser
-
-import inspect
+from forth import native
+from forth.wordsets import LAZY_WORDS, words_of
+
+from array import array
+import codecs
+import collections
+import itertools
+import re
+import struct
+import time
 import types
 
-class ForthError(Exception): pass
-class ImmediateQuit(ForthError): pass
-class LeaveLoop(ForthError): pass
+try:
+    unichr
+except NameError:  # Python 3
+    unichr = chr
+
+try:
+    RecursionError
+except NameError:  # Python 2
+    RecursionError = RuntimeError
 
 IMMEDIATE_MODE = 9900
 COMPILE_MODE = 9901
 
+# Data space cells are 64-bit, signed, little-endian.
+CELL = struct.Struct('<q')
+CELL_SIZE = CELL.size
+CELL_MODULUS = 1 << (8 * CELL_SIZE)
+
+# Float cells are IEEE doubles, little-endian, the same size as a cell.
+FLOAT = struct.Struct('<d')
+FLOAT_SIZE = FLOAT.size
+
+# A float literal needs its exponent, as in 1.5E0 or 2E: plain 1.5 isn't one.
+_FLOAT_LITERAL = re.compile(r'[+-]?[0-9]+(\.[0-9]*)?[Ee][+-]?[0-9]*$')
+
+# The data space starts with the system's own variables: BASE, then the
+# buffer pictured numeric output is built up in (from the end, backwards),
+# then the buffers interpreted S" strings take turns in. Everything from
+# DATA_START on is free for ALLOT and friends.
+BASE_ADDRESS = 0
+HOLD_SIZE = 256
+HOLD_END = CELL_SIZE + HOLD_SIZE
+STRING_SIZE = 256
+STRING_BUFFERS = 2
+DATA_START = HOLD_END + STRING_BUFFERS * STRING_SIZE
+
+_DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+_FAST_FORMATS = {8: '%o', 10: '%d', 16: '%X'}
+
+# How many results each PURE word keeps by default.
+MEMO_SIZE = 1024
+
+# The id of the wordlist the built-in words are in, and where definitions go
+# by default.
+FORTH_WORDLIST = 0
+
+# How many search orders' flattened views (see Machine.set_order) a machine
+# keeps, besides the one in use.
+FLATTENED_ORDERS = 16
+
+# Generations are numbered across all machines, so that no two dictionaries
+# (see Machine.generation) ever share one unless they're the same words.
+_generations = itertools.count(1)
+
 
 def _word(*names):
     """
@@ -40,51 +98,270 @@ def _compile_word(meth):
     decorated.is_compile_word = True
     return decorated
 
+def format_number(number, base):
+    """
+    Formats a number in the given base, with digits past 9 as upper case
+    letters. The common bases are formatted natively.
+    """
+    if base in _FAST_FORMATS:
+        return _FAST_FORMATS[base] % number
+    if base == 2:
+        return format(number, 'b')
+    if not 2 <= base <= len(_DIGITS):
+        raise ForthError('invalid base: %d' % base)
+
+    sign = '-' if number < 0 else ''
+    number = abs(number)
+    digits = []
+    while True:
+        number, digit = divmod(number, base)
+        digits.append(_DIGITS[digit])
+        if not number:
+            break
+    return sign + ''.join(reversed(digits))
+
+def _cell(value):
+    """ Wraps an integer around to a (signed) cell, as storing it would. """
+    return (value + CELL_MODULUS // 2) % CELL_MODULUS - CELL_MODULUS // 2
+
+def _double(low, high):
+    """ The number held in a double cell: low cell deeper, high cell on top. """
+    return (high << (8 * CELL_SIZE)) + low % CELL_MODULUS
+
+def _split_double(value):
+    """ The (low, high) cells of a number, wrapped around to a double cell. """
+    return _cell(value), _cell(value >> (8 * CELL_SIZE))
+
+def _check_single(quotient):
+    if not -CELL_MODULUS // 2 <= quotient < CELL_MODULUS // 2:
+        raise ForthError('division overflow')
+    return quotient
+
+def _nonzero(divisor):
+    if not divisor:
+        raise ForthError('division by zero')
+    return divisor
+
+def _divides(vector):
+    """
+    Marks the vector form of a word that divides by its last argument, for
+    :mod:`forth.vector` to check it for zeros.
+    """
+    vector.divides = True
+    return vector
+
+def _floored_divmod(dividend, divisor):
+    """ Divides, rounding down, and returns (remainder, quotient) as cells. """
+    if not divisor:
+        raise ForthError('division by zero')
+    quotient, remainder = divmod(dividend, divisor)
+    return remainder, _check_single(quotient)
+
+def _symmetric_divmod(dividend, divisor):
+    """ Divides, rounding towards zero, and returns (remainder, quotient). """
+    if not divisor:
+        raise ForthError('division by zero')
+    quotient = abs(dividend) // abs(divisor)
+    if (dividend < 0) != (divisor < 0):
+        quotient = -quotient
+    return dividend - quotient * divisor, _check_single(quotient)
+
+def _unsigned_divmod(dividend, divisor):
+    if not divisor:
+        raise ForthError('division by zero')
+    quotient, remainder = divmod(dividend, divisor)
+    if quotient >= CELL_MODULUS:
+        raise ForthError('division overflow')
+    return _cell(remainder), _cell(quotient)
+
+
+def _immediate_word(meth):
+    """
+    Marks a :func:`@_word` as immediate: run straight away even while
+    compiling, rather than being compiled itself.
+    """
+    meth.is_compile_word = True
+    return meth
+
+def _is_colon(func):
+    """
+    Whether the flat engine runs `func` (or a word) as flat code of its own:
+    a colon definition, or a PURE one (see forth.engine.code_for).
+    """
+    while hasattr(func, 'original'):
+        func = func.original
+    return hasattr(func, 'tokens')
+
+class CallSite(object):
+    """
+    A call compiled under late binding (see :attr:`Machine.late_binding`):
+    it names the word to call, and caches what that name last resolved to
+    along with the machine's :attr:`~Machine.generation` at the time, so it
+    only looks the word up again once something has been (re)defined.
+
+    The cache is a single (generation, target, func, is_colon) tuple, so that
+    it's always seen whole, even by machines running in other threads (see
+    :mod:`forth.pool`): only `func`, or the code of `target`, which don't
+    depend on the machine, may be run.
+    """
+    __slots__ = ('name', 'cache')
+
+    def __init__(self, name):
+        self.name = name
+        self.cache = (None, None, None, False)
+
+    def resolve(self, machine):
+        """ Returns the cache, brought up to date for `machine`. """
+        cache = self.cache
+        if cache[0] != machine.generation:
+            target = machine.find(self.name)
+            if target is None:
+                raise ForthError('undefined word: %s' % self.name)
+            func = target.__func__
+            cache = self.cache = (machine.generation, target, func,
+                                  _is_colon(func))
+        return cache
+
+    generation = property(lambda self: self.cache[0])
+    target = property(lambda self: self.cache[1])
+
+    def __repr__(self):
+        return '<CallSite %s>' % self.name
+
+def _stack_helper(func, vector=None):
+    """
+    Builds the word behind :meth:`Machine.add_stackmethod`, as a function of
+    the machine it runs on.
+    """
+    if vector is True:
+        vector = func
+    num_args = func.__code__.co_argcount
+    def stack_helper(self):
+        stack = self.data_stack
+        if len(stack) < num_args:
+            raise ForthError('stack underflow')
+        ret = func(*[stack.pop() for x in range(num_args)])
+        if ret is None:
+            return
+        if hasattr(ret, '__iter__'):
+            stack.extend(ret)
+        else:
+            stack.append(ret)
+    stack_helper.vector = vector
+    return stack_helper
+
 
 class Machine(object):
     """ A Forth machine. It has stacks and registers and things. """
     def __init__(self):
         self.data_stack = []
+        self.float_stack = array('d')
         self.parser = None
-        self.words = {}
         self.mode = IMMEDIATE_MODE
         self.now_compiling = None
+        self.control_stack = []
         self.return_stack = []
+        self.memory = bytearray(DATA_START)
+        self.here = DATA_START
+        self.hold = HOLD_END
+        self.next_string = 0
+        CELL.pack_into(self.memory, BASE_ADDRESS, 10)
+        self.tasks = []
+        self.ready = collections.deque()
+        self.current_task = None
+        self.continuation = None
+        self.latest = None
+        self.memos = []
+        self.memo_caches = {}
+        self.generation = 0
+        self.late_binding = False
+        self.included = set()
+        self.including = []
+        self.cache_dir = None
+        self.wordsets = set()
+        self.metrics = Metrics(self)
+        self.quotas = None
+        self.recorder = None
+        self.input_started = clock()
+        self.output_used = 0
+        self.call_depth = 0
+
+        # Words live in wordlists, by id, and are looked up in `words`: the
+        # flattened view of the wordlists in the search order (see _add and
+        # set_order), which, as long as there's only one, is that wordlist.
+        forth = dict((word, types.MethodType(func, self))
+                     for word, func in self._core_words().items())
+        self.wordlists = [forth]
+        self.search_order = [FORTH_WORDLIST]
+        self.current = FORTH_WORDLIST
+        self.flattened = {}
+        self.words = forth
+
+    @classmethod
+    def _core_words(cls):
+        """
+        Returns the built-in words as a {word: function} dict, where each
+        function takes the machine as its only argument. This is worked out
+        once per class and shared by all its instances, which only need to
+        bind it, so that making a new machine stays cheap.
+        """
+        if '_core' in cls.__dict__:
+            return cls._core
+        core = {}
 
         # Add decorated member words
-        for name, method in inspect.getmembers(self, inspect.ismethod):
-            if hasattr(method, 'words'):
-                for word in method.words:
-                    self.words[word] = method
+        for klass in reversed(cls.__mro__):
+            for member in vars(klass).values():
+                for word in getattr(member, 'words', ()):
+                    core[word] = member
+
+        def add_native(word, effect, func, vector=None):
+            core[word] = native.make_word(func, effect, vector=vector, name=word)
 
         # Add basic math and stack handling
-        self.add_stackmethod('+', lambda b, a: a + b)
-        self.add_stackmethod('-', lambda b, a: a - b)
-        self.add_stackmethod('*', lambda b, a: a * b)
-        self.add_stackmethod('/', lambda b, a: a / b)
-        self.add_stackmethod('MOD', lambda b, a: a % b)
-        self.add_stackmethod('/MOD', lambda b, a: reversed(divmod(a, b)))
-
-        self.add_stackmethod('>', lambda b, a: -1 if a > b else 0)
-        self.add_stackmethod('>=', lambda b, a: -1 if a >= b else 0)
-        self.add_stackmethod('<', lambda b, a: -1 if a < b else 0)
-        self.add_stackmethod('<=', lambda b, a: -1 if a <= b else 0)
-        self.add_stackmethod('==', lambda b, a: -1 if a == b else 0)
-        self.add_stackmethod('!=', lambda b, a: -1 if a != b else 0)
-
-        self.add_stackmethod('INVERT', lambda a: ~a)
-
-        self.add_stackmethod('SWAP', lambda b, a: (b, a))
-        self.add_stackmethod('DUP', lambda a: (a, a))
-        self.add_stackmethod('OVER', lambda b, a: (a, b, a))
-
-        self.add_stackmethod('2DUP', lambda b, a: (a, b, a, b))
-        self.add_stackmethod('2SWAP', lambda d, c, b, a: (c, d, a, b))
-        self.add_stackmethod('2OVER', lambda d, c, b, a: (a, b, c, d, a, b))
-
-        self.add_stackmethod('ROT', lambda c, b, a: (b, c, a))
-        self.add_stackmethod('DROP', lambda a: None)
-        self.add_stackmethod('TUCK', lambda b, a: (b, a, b))
+        add_native('+', '( n1 n2 -- n3 )', lambda a, b: a + b, vector=True)
+        add_native('-', '( n1 n2 -- n3 )', lambda a, b: a - b, vector=True)
+        add_native('*', '( n1 n2 -- n3 )', lambda a, b: a * b, vector=True)
+        add_native('/', '( n1 n2 -- n3 )', lambda a, b: a // _nonzero(b),
+                   vector=_divides(lambda a, b: a // b))
+        add_native('MOD', '( n1 n2 -- n3 )', lambda a, b: a % _nonzero(b),
+                   vector=_divides(lambda a, b: a % b))
+        add_native('/MOD', '( n1 n2 -- rem quot )',
+                   lambda a, b: divmod(a, _nonzero(b))[::-1],
+                   vector=_divides(lambda a, b: (a % b, a // b)))
+
+        add_native('>', '( n1 n2 -- flag )', lambda a, b: -1 if a > b else 0,
+                   vector=lambda a, b: (a > b) * -1)
+        add_native('>=', '( n1 n2 -- flag )', lambda a, b: -1 if a >= b else 0,
+                   vector=lambda a, b: (a >= b) * -1)
+        add_native('<', '( n1 n2 -- flag )', lambda a, b: -1 if a < b else 0,
+                   vector=lambda a, b: (a < b) * -1)
+        add_native('<=', '( n1 n2 -- flag )', lambda a, b: -1 if a <= b else 0,
+                   vector=lambda a, b: (a <= b) * -1)
+        add_native('==', '( n1 n2 -- flag )', lambda a, b: -1 if a == b else 0,
+                   vector=lambda a, b: (a == b) * -1)
+        add_native('!=', '( n1 n2 -- flag )', lambda a, b: -1 if a != b else 0,
+                   vector=lambda a, b: (a != b) * -1)
+
+        add_native('INVERT', '( x1 -- x2 )', lambda a: ~a, vector=True)
+
+        add_native('SWAP', '( a b -- b a )', lambda a, b: (b, a), vector=True)
+        add_native('DUP', '( a -- a a )', lambda a: (a, a), vector=True)
+        add_native('OVER', '( a b -- a b a )', lambda a, b: (a, b, a), vector=True)
+
+        add_native('2DUP', '( a b -- a b a b )',
+                   lambda a, b: (a, b, a, b), vector=True)
+        add_native('2SWAP', '( a b c d -- c d a b )',
+                   lambda a, b, c, d: (c, d, a, b), vector=True)
+        add_native('2OVER', '( a b c d -- a b c d a b )',
+                   lambda a, b, c, d: (a, b, c, d, a, b), vector=True)
+
+        add_native('ROT', '( a b c -- b c a )', lambda a, b, c: (b, c, a), vector=True)
+        add_native('DROP', '( a -- )', lambda a: None, vector=True)
+        add_native('TUCK', '( a b -- b a b )', lambda a, b: (b, a, b), vector=True)
+
+        cls._core = core
+        return core
 
     def _push(self, val):
         self.data_stack.append(val)
@@ -98,14 +375,6 @@ class Machine(object):
         else:
             raise ForthError('stack underflow')
 
-    def _pop_until(self, predicate):
-        ret = []
-        while True:
-            val = self._pop()
-            ret.append(val)
-            if predicate(val):
-                return ret
-
     def _return_push(self, val):
         self.return_stack.append(val)
 
@@ -115,9 +384,133 @@ class Machine(object):
         else:
             raise ForthError('return stack underflow')
 
+    def _parse_name(self):
+        try:
+            return self.parser.next_word()
+        except StopIteration:
+            raise ForthError('no name given')
+
+    def _check_memory(self, address, length):
+        """
+        Makes sure the `length` bytes starting at `address` are all within the
+        data space. Bulk memory words check their whole range once, up front,
+        and then work on slices of :attr:`memory` directly.
+        """
+        if address < 0 or length < 0 or address + length > len(self.memory):
+            raise ForthError('invalid memory address')
+
     @_word('.')
     def _print_pop(self):
-        return str(self._pop()) + ' '
+        return format_number(self._pop(), self._base()) + ' '
+
+    @_word('U.')
+    def _print_unsigned(self):
+        return format_number(self._pop() % CELL_MODULUS, self._base()) + ' '
+
+    @_word('.R')
+    def _print_right(self):
+        """ ( n width -- ) Prints n right-aligned in a field `width` wide. """
+        width = self._pop()
+        return format_number(self._pop(), self._base()).rjust(width)
+
+    @_word('U.R')
+    def _print_unsigned_right(self):
+        width = self._pop()
+        return format_number(self._pop() % CELL_MODULUS, self._base()).rjust(width)
+
+    @_word('.CELLS')
+    def _print_cells(self):
+        """
+        ( addr n -- ) Prints the n cells from addr, like . would, but all in
+        one go: they're unpacked and formatted together, natively.
+        """
+        count = self._pop()
+        address = self._pop()
+        if count <= 0:
+            return ''
+        self._check_memory(address, count * CELL_SIZE)
+        cells = struct.unpack_from('<%dq' % count, self.memory, address)
+        base = self._base()
+        if base == 10:
+            return ' '.join(map(str, cells)) + ' '
+        return ' '.join(format_number(cell, base) for cell in cells) + ' '
+
+    def _base(self):
+        return CELL.unpack_from(self.memory, BASE_ADDRESS)[0]
+
+    @_word('BASE')
+    def _base_address(self):
+        """ ( -- addr ) The variable holding the radix numbers are read and written in. """
+        self._push(BASE_ADDRESS)
+
+    @_word('DECIMAL')
+    def _decimal(self):
+        self._store_cell(BASE_ADDRESS, 10)
+
+    @_word('HEX')
+    def _hex(self):
+        self._store_cell(BASE_ADDRESS, 16)
+
+    def _pop_double(self):
+        high = self._pop()
+        return _double(self._pop(), high)
+
+    def _push_double(self, value):
+        self._push_all(_split_double(value))
+
+    def _hold_bytes(self, data):
+        start = self.hold - len(data)
+        if start < HOLD_END - HOLD_SIZE:
+            raise ForthError('pictured numeric output overflow')
+        self.memory[start:self.hold] = data
+        self.hold = start
+
+    @_word('<#')
+    def _begin_pictured(self):
+        """ Starts pictured numeric output, in the hold buffer. """
+        self.hold = HOLD_END
+
+    @_word('HOLD')
+    def _hold(self):
+        """ ( char -- ) Adds a character to the start of the pictured output. """
+        self._hold_bytes(unichr(self._pop()).encode('utf-8'))
+
+    @_word('HOLDS')
+    def _holds(self):
+        """ ( addr len -- ) Adds a string to the start of the pictured output. """
+        length = self._pop()
+        address = self._pop()
+        self._check_memory(address, length)
+        self._hold_bytes(self.memory[address:address + length])
+
+    @_word('SIGN')
+    def _sign(self):
+        """ ( n -- ) Adds a minus sign to the pictured output if n is negative. """
+        if self._pop() < 0:
+            self._hold_bytes(b'-')
+
+    @_word('#')
+    def _hold_digit(self):
+        """ ( ud1 -- ud2 ) Adds the lowest digit of ud1 to the pictured output. """
+        base = self._base()
+        if not 2 <= base <= len(_DIGITS):
+            raise ForthError('invalid base: %d' % base)
+        value, digit = divmod(self._pop_double(), base)
+        self._hold_bytes(_DIGITS[digit].encode('ascii'))
+        self._push_double(value)
+
+    @_word('#S')
+    def _hold_digits(self):
+        """ ( ud -- 0 0 ) Adds all the digits of ud (at least one). """
+        value = self._pop_double()
+        self._hold_bytes(format_number(value, self._base()).encode('ascii'))
+        self._push_double(0)
+
+    @_word('#>')
+    def _end_pictured(self):
+        """ ( xd -- addr len ) Ends pictured output, giving the string built. """
+        self._pop_double()
+        self._push_all((self.hold, HOLD_END - self.hold))
 
     @_word('.S')
     def _print_stack(self):
@@ -125,35 +518,58 @@ class Machine(object):
 
     @_word('WORDS')
     def _print_words(self):
-        return ' '.join(sorted(self.words.keys()))
+        return ' '.join(sorted(set(self.words) | set(LAZY_WORDS)))
 
     @_word('EMIT')
     def _emit(self):
         value = self._pop()
         return unichr(value)
 
+    def _compile(self, token):
+        """ Appends a token to the code being compiled. """
+        self.control_stack[-1][1].append(token)
+
+    def _control_pop(self):
+        """
+        Pops the innermost open control structure off the compiler's control
+        stack. Each entry is a (marker, code, ...) tuple, where marker is the
+        word that opened it and code is the list the tokens inside it get
+        compiled into; anything after that is specific to the marker.
+        """
+        if self.control_stack:
+            return self.control_stack.pop()
+        else:
+            raise ForthError('control stack underflow')
+
     @_word(':')
     def _begin_compile(self):
-        try:
-            new_word = self.parser.next_word()
-        except StopIteration:
-            raise ForthError('no name given')
+        new_word = self._parse_name()
 
         self.mode = COMPILE_MODE
         self.now_compiling = new_word
-        self._return_push(':')
-        self._push(':')
+        self.control_stack.append((':', []))
+
+    @_word('(')
+    @_immediate_word
+    def _comment(self):
+        """
+        ( ccc<paren> -- ) A comment. One that opens a colon definition and
+        has a '--' in it gives the word's stack effect, as needed by PURE.
+        """
+        text = self.parser.parse_until(')')
+        if (self.mode is COMPILE_MODE and '--' in text.split()
+                and self.control_stack[-1][0] == ':'
+                and self.control_stack[-1][1:] == ([],)):
+            self.control_stack[-1] += (native.parse_effect(text),)
 
     @_word(';')
     @_compile_word
     def _end_compile(self):
-        opened = self._return_pop()
-        if opened != ':':
-            raise ForthError('unclosed %s' % opened)
+        opened = self._control_pop()
+        if opened[0] != ':':
+            raise ForthError('unclosed %s' % opened[0])
 
-        tokens = self._pop_until(lambda tok: tok == ':')[-2::-1]
-        new_word = lambda self: self.interpret(tokens)
-        self.words[self.now_compiling] = types.MethodType(new_word, self)
+        self._define_colon(self.now_compiling, opened[1], *opened[2:])
 
         self.mode = IMMEDIATE_MODE
         self.now_compiling = None
@@ -161,17 +577,16 @@ class Machine(object):
     @_word('DO')
     @_compile_word
     def _begin_do_loop(self):
-        self._return_push('DO')
-        self._push('DO')
+        self.control_stack.append(('DO', []))
 
     def _acquire_do_loop_contents(self):
-        opened = self._return_pop()
-        if opened == ':':
+        opened = self._control_pop()
+        if opened[0] == ':':
             raise ForthError('missing DO')
-        if opened != 'DO':
-            raise ForthError('unclosed %s' % opened)
+        if opened[0] != 'DO':
+            raise ForthError('unclosed %s' % opened[0])
 
-        return self._pop_until(lambda tok: tok == 'DO')[-2::-1]
+        return opened[1]
 
     @_word('LOOP')
     @_compile_word
@@ -180,102 +595,263 @@ class Machine(object):
         # HAX? Loops end with a number defining the step size --
         # DO..LOOP implies a step size of 1.
         loop_tokens.append(('NUMBER', 1))
-        self._push(('LOOP', loop_tokens))
+        self._compile(('LOOP', loop_tokens))
 
     @_word('+LOOP')
     @_compile_word
     def _end_plus_loop(self):
         loop_tokens = self._acquire_do_loop_contents()
-        self._push(('LOOP', loop_tokens))
+        self._compile(('LOOP', loop_tokens))
 
     @_word('BEGIN')
     @_compile_word
     def _begin_while_loop(self):
-        self._return_push('BEGIN')
-        self._push('BEGIN')
+        self.control_stack.append(('BEGIN', []))
 
-    @_word('UNTIL')
-    @_compile_word
-    def _end_until_loop(self):
-        opened = self._return_pop()
-        if opened == ':':
+    def _acquire_begin_contents(self):
+        opened = self._control_pop()
+        if opened[0] == ':':
             raise ForthError('missing BEGIN')
-        if opened != 'BEGIN':
-            raise ForthError('unclosed %s' % opened)
-
-        # Use the Forth machine itself to invert the UNTIL into a WHILE:
-        self.interpret(self.tokenize('IF 0 ELSE -1 THEN'))
+        if opened[0] != 'BEGIN':
+            raise ForthError('unclosed %s' % opened[0])
 
-        begin_tokens = self._pop_until(lambda tok: tok == 'BEGIN')[-2::-1]
+        return opened[1]
 
-        self._push(('WHILE', (begin_tokens,())))
+    @_word('UNTIL')
+    @_compile_word
+    def _end_until_loop(self):
+        begin_tokens = self._acquire_begin_contents()
+        self._compile(('UNTIL', begin_tokens))
 
     @_word('WHILE')
     @_compile_word
     def _mid_while_loop(self):
-        opened = self._return_pop()
-        if opened == ':':
-            raise ForthError('missing BEGIN')
-        if opened != 'BEGIN':
-            raise ForthError('unclosed %s' % opened)
-        self._return_push(opened)
-        self._return_push('WHILE')
-        self._push('WHILE')
+        begin_tokens = self._acquire_begin_contents()
+        self.control_stack.append(('WHILE', [], begin_tokens))
 
     @_word('REPEAT')
     @_compile_word
     def _end_while_loop(self):
-        opened = self._return_pop()
-        if opened == ':':
+        opened = self._control_pop()
+        if opened[0] == ':':
             raise ForthError('missing WHILE')
-        if opened != 'WHILE':
-            raise ForthError('unclosed %s' % opened)
+        if opened[0] != 'WHILE':
+            raise ForthError('unclosed %s' % opened[0])
 
-        assert self._return_pop() == 'BEGIN'
-
-        while_tokens = self._pop_until(lambda tok: tok == 'WHILE')[-2::-1]
-        begin_tokens = self._pop_until(lambda tok: tok == 'BEGIN')[-2::-1]
-
-        self._push(('WHILE', (begin_tokens, while_tokens)))
+        marker, while_tokens, begin_tokens = opened
+        self._compile(('WHILE', (begin_tokens, while_tokens)))
 
     @_word('IF')
     @_compile_word
     def _if(self):
-        self._return_push('IF')
-        self._push('IF')
+        self.control_stack.append(('IF', []))
 
     @_word('ELSE')
     @_compile_word
     def _else(self):
-        opened = self._return_pop()
-        if opened != 'IF':
+        opened = self._control_pop()
+        if opened[0] != 'IF':
             raise ForthError('missing IF')
-        self._return_push(opened)
-        self._return_push('ELSE')
-        self._push('ELSE')
+        self.control_stack.append(('ELSE', [], opened[1]))
 
     @_word('THEN')
     @_compile_word
     def _then(self):
-        opened = self._return_pop()
-        if opened != 'IF' and opened != 'ELSE':
+        opened = self._control_pop()
+        if opened[0] == 'IF':
+            self._compile(('BRANCH', (opened[1], ())))
+        elif opened[0] == 'ELSE':
+            marker, false_tokens, true_tokens = opened
+            self._compile(('BRANCH', (true_tokens, false_tokens)))
+        else:
             raise ForthError('missing IF')
 
-        false_tokens = ()
-        if opened == 'ELSE':
-            false_tokens = self._pop_until(lambda tok: tok == 'ELSE')[-2::-1]
-            opened = self._return_pop()
-
-        assert opened == 'IF' # I can't imagine how it would fail to be.
-        true_tokens = self._pop_until(lambda tok: tok == 'IF')[-2::-1]
-
-        self._push(('BRANCH', (true_tokens, false_tokens)))
-
     @_word('COMPILE_WORD_WITH_OUTPUT_FOR_TESTING')
     @_compile_word
     def test_compiler_output(self):
         return 'SOME OUTPUT!!!'
 
+    @_word("'")
+    def _tick(self):
+        name = self._parse_name()
+        word = self.find(name)
+        if word is None:
+            raise ForthError('undefined word: %s' % name)
+        self._push(word)
+
+    @_word('EXECUTE')
+    def _execute(self):
+        return self._pop_word().__func__(self)
+
+    def _pop_word(self):
+        word = self._pop()
+        if not isinstance(word, types.MethodType):
+            raise ForthError('not a word')
+        return word
+
+    @_word('TASK')
+    def _task(self):
+        from forth.engine import Continuation
+        name = self._parse_name()
+        task = Continuation(self, None, data_stack=[], return_stack=[],
+                            float_stack=array('d'))
+        task.done = True
+        number = len(self.tasks)
+        self.tasks.append(task)
+        self._define(name, lambda self: self._push(number))
+
+    @_word('ACTIVATE')
+    def _activate(self):
+        """
+        ( xt task -- ) Sets a task off running a word, with empty stacks of its
+        own, at the next round of the scheduler (see :meth:`_run_tasks`).
+        """
+        number = self._pop()
+        if not 0 <= number < len(self.tasks):
+            raise ForthError('no such task')
+        task = self.tasks[number]
+
+        was_done = task.done
+        task.start(self._pop_word())
+        if was_done:
+            self.ready.append(task)
+
+    @_word('PAUSE')
+    def _pause(self):
+        if self.current_task is not None:
+            raise Pause()
+        if self.continuation is not None and not self.including:
+            # The engine gives the tasks their turns, out of its own budget.
+            self.continuation.turns = len(self.ready)
+            raise Pause()
+        return self._run_tasks()[0]
+
+    @_word('MS')
+    def _ms(self):
+        """
+        ( u -- ) Waits u milliseconds, giving the tasks the time. On the flat
+        engine, the input is suspended until then instead, so that whoever
+        runs it can get on with something else (see
+        :meth:`Continuation.sleep_time`).
+        """
+        wake_at = time.time() + self._pop() / 1000.0
+        if self.current_task is not None:
+            self.current_task.wake_at = wake_at
+            raise Pause()
+        if self.continuation is not None and not self.including:
+            self.continuation.wake_at = wake_at
+            raise Pause()
+
+        # Waiting is what gives the tasks their time to run.
+        ret = ''
+        try:
+            while True:
+                if self.quotas is not None:
+                    self._safepoint()
+                ret += self._run_tasks()[0]
+                now = time.time()
+                if now >= wake_at:
+                    return ret
+                next_wake = min([wake_at] + [task.wake_at for task in self.ready])
+                seconds = None if self.quotas is None else self.quotas.seconds
+                if seconds is not None:
+                    next_wake = min(next_wake,
+                                    now + seconds - (clock() - self.input_started))
+                if next_wake > now:
+                    time.sleep(next_wake - now)
+        except ForthError as e:
+            e.output = ret + e.output
+            raise
+
+    def _run_tasks(self, turns=None, budget=None):
+        """
+        Gives the next `turns` ready tasks (all of them, by default) a turn,
+        in order: each runs until it PAUSEs (or waits with MS), finishes, or
+        fails. Tasks are flat-engine continuations with stacks of their own;
+        switching to one just swaps the machine's stacks over.
+
+        With a `budget`, the turns share that many instructions between them;
+        a task that runs out stays first in line, to finish its turn next
+        time. Returns the tasks' output, the instructions they ran and the
+        number of turns still to give.
+        """
+        data_stack, return_stack, parser = self.data_stack, self.return_stack, self.parser
+        float_stack = self.float_stack
+        if turns is None:
+            turns = len(self.ready)
+
+        out = []
+        steps = 0
+        now = time.time()
+        while turns:
+            task = self.ready.popleft()
+            if task.wake_at <= now:
+                self.current_task = task
+                before = task.steps
+                try:
+                    out.append(task.resume(None if budget is None
+                                           else budget - steps).output)
+                finally:
+                    self.current_task = None
+                    self.data_stack, self.return_stack = data_stack, return_stack
+                    self.float_stack = float_stack
+                    self.parser = parser
+                steps += task.steps - before
+                if not task.done and not task.paused:
+                    self.ready.appendleft(task)
+                    break
+            turns -= 1
+            if not task.done:
+                self.ready.append(task)
+
+        return ''.join(out), steps, turns
+
+    @_word('RECURSE')
+    @_compile_word
+    def _recurse(self):
+        """
+        Compiles a call to the word being defined. This is always late-bound,
+        so that it calls the word once it exists (and, for a PURE word,
+        through its cache).
+        """
+        self._compile(('SITE', CallSite(self.now_compiling)))
+
+    @_word('EARLY-BINDING')
+    def _early_binding(self):
+        """
+        Has the words compiled from here on call what their callees are
+        defined as now, for good: the fastest way to call a word.
+        """
+        self.late_binding = False
+
+    @_word('LATE-BINDING')
+    def _late_binding(self):
+        """
+        Has the words compiled from here on call their callees by name, so
+        that they pick up redefinitions (and may call words that aren't
+        defined yet). Each call site caches its target until the next
+        definition.
+        """
+        self.late_binding = True
+
+    @_word('PURE')
+    def _pure(self):
+        """
+        Marks the latest word defined as pure, so that its results are
+        memoized by its inputs: see :meth:`memoize`.
+        """
+        if self.latest is None:
+            raise ForthError('no word to mark')
+        self.memoize(self.latest)
+
+    @_word('INCLUDE')
+    def _include(self):
+        return self.include(self._parse_name())
+
+    @_word('REQUIRE')
+    def _require(self):
+        return self.include(self._parse_name(), require=True)
+
     @_word('QUIT')
     def interpreter_quit(self):
         raise ImmediateQuit()
@@ -283,7 +859,7 @@ class Machine(object):
     @_word('LEAVE')
     @_compile_word
     def compile_leave_loop(self):
-        self._push(('LEAVE', None))
+        self._compile(('LEAVE', None))
 
     @_word('>R')
     def move_data_to_return(self):
@@ -309,7 +885,181 @@ class Machine(object):
 
         self._push(j)
 
-    def add_stackmethod(self, word, func):
+    @_word('HERE')
+    def _here(self):
+        self._push(self.here)
+
+    @_word('ALLOT')
+    def _allot(self):
+        here = self.here + self._pop()
+        if here < 0:
+            raise ForthError('invalid memory address')
+        if here > len(self.memory):
+            if self.quotas is not None:
+                self.quotas.check_memory(here)
+            self.memory.extend(bytearray(here - len(self.memory)))
+        self.here = here
+
+    @_word('CELLS')
+    def _cells(self):
+        self._push(self._pop() * CELL_SIZE)
+
+    @_word('CELL+')
+    def _cell_plus(self):
+        self._push(self._pop() + CELL_SIZE)
+
+    @_word('@')
+    def _fetch(self):
+        address = self._pop()
+        self._check_memory(address, CELL_SIZE)
+        self._push(CELL.unpack_from(self.memory, address)[0])
+
+    def _store_cell(self, address, value):
+        self._check_memory(address, CELL_SIZE)
+        # Wrap around like a real machine word would, rather than overflow.
+        CELL.pack_into(self.memory, address, _cell(value))
+
+    @_word('!')
+    def _store(self):
+        address = self._pop()
+        self._store_cell(address, self._pop())
+
+    @_word('+!')
+    def _plus_store(self):
+        address = self._pop()
+        value = self._pop()
+        self._check_memory(address, CELL_SIZE)
+        self._store_cell(address, CELL.unpack_from(self.memory, address)[0] + value)
+
+    @_word('C@')
+    def _char_fetch(self):
+        address = self._pop()
+        self._check_memory(address, 1)
+        self._push(self.memory[address])
+
+    @_word('C!')
+    def _char_store(self):
+        address = self._pop()
+        value = self._pop()
+        self._check_memory(address, 1)
+        self.memory[address] = value & 0xFF
+
+    @_word(',')
+    def _comma(self):
+        self._push(self.here)
+        self._push(CELL_SIZE)
+        self._allot()
+        self._store()
+
+    @_word('C,')
+    def _char_comma(self):
+        self._push(self.here)
+        self._push(1)
+        self._allot()
+        self._char_store()
+
+    @_word('CREATE')
+    def _create(self):
+        name = self._parse_name()
+        address = self.here
+        self._define(name, lambda self: self._push(address))
+
+    @_word('VARIABLE')
+    def _variable(self):
+        self._create()
+        self._push(CELL_SIZE)
+        self._allot()
+
+    def _parse_string(self):
+        """ Parses a string literal's text, up to its closing quote, as bytes. """
+        text = self.parser.parse_until('"')
+        if text[:1].isspace():
+            # The space that ended the word opening the string isn't in it.
+            text = text[1:]
+        return text.encode('utf-8')
+
+    def _store_string(self, data):
+        """ Puts `data` in the data space, at HERE, and returns its address. """
+        address = self.here
+        self._push(len(data))
+        self._allot()
+        self.memory[address:address + len(data)] = data
+        return address
+
+    def _transient_string(self, data):
+        """
+        Puts `data` in the next of the buffers interpreted S" strings take
+        turns in, and returns its address. It lasts until that buffer's turn
+        comes round again.
+        """
+        if len(data) > STRING_SIZE:
+            raise ForthError('string too long')
+        address = HOLD_END + self.next_string * STRING_SIZE
+        self.next_string = (self.next_string + 1) % STRING_BUFFERS
+        self.memory[address:address + len(data)] = data
+        return address
+
+    def _literal(self, *values):
+        """ Pushes `values`, or compiles them, if compiling. """
+        if self.mode is COMPILE_MODE:
+            for value in values:
+                self._compile(('NUMBER', value))
+        else:
+            self._push_all(values)
+
+    @_word('S"')
+    @_immediate_word
+    def _s_quote(self):
+        """
+        ( "ccc<quote>" -- addr len ) A string literal. Compiled, its text is
+        put in the data space once, when it's parsed, and the word compiles
+        to no more than its address and length. Interpreted, it goes in one
+        of the STRING_BUFFERS transient buffers instead, so as not to use up
+        the data space: it's only good until as many more have been.
+        """
+        data = self._parse_string()
+        if self.mode is COMPILE_MODE:
+            self._literal(self._store_string(data), len(data))
+        else:
+            self._push_all((self._transient_string(data), len(data)))
+
+    @_word('C"')
+    @_immediate_word
+    def _c_quote(self):
+        """ ( "ccc<quote>" -- c-addr ) A counted string literal: see COUNT. """
+        data = self._parse_string()
+        if len(data) > 255:
+            raise ForthError('string too long')
+        self._literal(self._store_string(bytearray([len(data)]) + data))
+
+    @_word('."')
+    @_immediate_word
+    def _dot_quote(self):
+        """ ( "ccc<quote>" -- ) Prints a string literal; compiles to TYPE. """
+        data = self._parse_string()
+        if self.mode is not COMPILE_MODE:
+            return data.decode('utf-8')
+        self._literal(self._store_string(data), len(data))
+        self._compile(('CALL', self.words['TYPE']))
+
+    @_word('COUNT')
+    def _count(self):
+        """ ( c-addr -- addr len ) The text of a counted string. """
+        address = self._pop()
+        self._check_memory(address, 1)
+        self._push_all((address + 1, self.memory[address]))
+
+    @_word('TYPE')
+    def _type(self):
+        """ ( addr len -- ) Prints `len` bytes of UTF-8 text from `addr`. """
+        length = self._pop()
+        address = self._pop()
+        self._check_memory(address, length)
+        # Decoded straight out of the data space, without copying it first.
+        return codecs.utf_8_decode(
+            memoryview(self.memory)[address:address + length], 'replace')[0]
+
+    def add_stackmethod(self, word, func, vector=None):
         """
         Turns a given function `func` into a stack-consumer.
 
@@ -321,20 +1071,358 @@ class Machine(object):
         There is no provision for a stack-consumer to yield any output text,
         nor for it to touch any other parts of the :class:`Machine` instance
         it's a part of.
+
+        If given, `vector` is an elementwise version of `func` that works on
+        NumPy arrays as well as plain numbers, for use by :meth:`map_word`;
+        `vector=True` means `func` itself already works that way.
+        """
+        self._define(word, _stack_helper(func, vector))
+
+    def add_native(self, word, func, effect=None, machine=None, output=None,
+                   vector=None):
+        """
+        Adds the Python function `func` as the word `word`, with the given
+        stack `effect`, e.g. '( a b -- c )'. Unlike a stack-method, the
+        function gets its inputs in the order the effect lists them (so from
+        the stack [1, 2] the call is func(1, 2)), and returns nothing, a single
+        value or a sequence of values, according to the number of outputs.
+
+        With `machine` set, the function also gets the :class:`Machine` it
+        runs on as its first argument, to get at the data space and so on;
+        with `output` set, it then gets a function to write text out with.
+        These, and the effect, default to whatever :func:`native_word` marked
+        `func` with. `vector` is as for :meth:`add_stackmethod`.
+        """
+        if effect is None:
+            effect = func.stack_effect
+        if machine is None:
+            machine = getattr(func, 'wants_machine', False)
+        if output is None:
+            output = getattr(func, 'wants_output', False)
+        self._define(word, native.make_word(func, effect, machine, output, vector, word))
+
+    def add_vocabulary(self, vocabulary, effects=None, prefix=''):
+        """
+        Adds a whole module, class or dict of native functions as words: those
+        marked with :func:`native_word`, and those named in `effects`, a dict
+        of stack effects by attribute name, for functions that weren't written
+        with Forth in mind. For instance:
+
+            >>> m.add_vocabulary(math, {'sqrt': '( x -- root )'}, prefix='M-')
+
+        adds math.sqrt as M-SQRT.
+        """
+        for word, func, effect, machine, output in native.vocabulary(vocabulary, effects):
+            self.add_native(prefix + word, func, effect, machine, output)
+
+    def find(self, name):
+        """
+        Returns the word `name`, or None if there's no such word. Looking up
+        a word of an optional wordset (see :mod:`forth.wordsets`) that isn't
+        loaded yet loads it, along with the rest of its words.
+        """
+        try:
+            return self.words[name]
+        except KeyError:
+            if name not in LAZY_WORDS or LAZY_WORDS[name] in self.wordsets:
+                return None
+        self.load_wordset(LAZY_WORDS[name])
+        return self.words.get(name)
+
+    def load_wordset(self, wordset):
+        """
+        Adds the words of an optional wordset, apart from any already defined
+        under the same names.
+        """
+        if wordset in self.wordsets:
+            return
+        forth = self.wordlists[FORTH_WORDLIST]
+        for name, func in words_of(wordset).items():
+            if name not in forth:
+                self._add(FORTH_WORDLIST, name, types.MethodType(func, self))
+        self.wordsets.add(wordset)
+
+    def wordlist(self):
+        """ Makes a new, empty wordlist, and returns its id. """
+        self.wordlists.append({})
+        self.generation = next(_generations)
+        return len(self.wordlists) - 1
+
+    def _check_wordlist(self, wordlist):
+        if not (isinstance(wordlist, int) and 0 <= wordlist < len(self.wordlists)):
+            raise ForthError('no such wordlist')
+        return wordlist
+
+    def search_wordlist(self, name, wordlist):
+        """ Returns the word `name` from the given wordlist only, or None. """
+        words = self.wordlists[self._check_wordlist(wordlist)]
+        if (name not in words and wordlist == FORTH_WORDLIST and
+                name in LAZY_WORDS and LAZY_WORDS[name] not in self.wordsets):
+            self.load_wordset(LAZY_WORDS[name])
+        return words.get(name)
+
+    def set_current(self, wordlist):
+        """ Makes new definitions go into the given wordlist. """
+        self.current = self._check_wordlist(wordlist)
+        self._search_changed()
+
+    def set_order(self, order):
+        """
+        Sets the search order to the wordlist ids in `order`, the first
+        searched first. Words are then looked up in its flattened view: a
+        single {name: word} dict, made the first time the order is used, and
+        kept up to date from then on as words are added to its wordlists, so
+        that looking a word up never takes more than one dict lookup however
+        many wordlists there are.
+        """
+        order = tuple(self._check_wordlist(wordlist) for wordlist in order)
+        self.search_order = list(order)
+        self.words = self._flatten(order)
+        self.generation = next(_generations)
+        # Late-bound calls in PURE words may now go elsewhere.
+        self.memo_caches = {}
+        for memo in self.memos:
+            self._track_callees(memo)
+        self._search_changed()
+
+    def _search_changed(self):
+        # A cached file only replays definitions, so one that changes where
+        # they go, or where words are looked up, can't be cached.
+        if self.including:
+            self.including[-1].cacheable = False
+
+    def _flatten(self, order):
+        if len(order) == 1:
+            return self.wordlists[order[0]]
+        words = self.flattened.get(order)
+        if words is None:
+            if len(self.flattened) >= FLATTENED_ORDERS:
+                self.flattened.clear()
+            words = {}
+            for wordlist in reversed(order):
+                words.update(self.wordlists[wordlist])
+            self.flattened[order] = words
+        return words
+
+    def _add(self, wordlist, name, word):
+        """
+        Adds `word` to a wordlist, and to the flattened view of each search
+        order it shows through in: those where no wordlist ahead of it has a
+        word of the same name.
+        """
+        self.wordlists[wordlist][name] = word
+        for order, words in self.flattened.items():
+            for other in order:
+                if other == wordlist:
+                    words[name] = word
+                    break
+                if name in self.wordlists[other]:
+                    break
+
+    def _restore_wordlists(self, wordlists, order):
+        """ Puts back wordlists, and a search order, saved from earlier. """
+        self.wordlists = wordlists
+        self.search_order = list(order)
+        self.flattened = {}
+        self.words = self._flatten(tuple(order))
+
+    @classmethod
+    def _builtin(cls, name):
+        """ The function behind the built-in word `name`, or None. """
+        func = cls._core_words().get(name)
+        if func is None and name in LAZY_WORDS:
+            func = words_of(LAZY_WORDS[name]).get(name)
+        return func
+
+    def _define(self, name, func):
+        """
+        Adds (or replaces) the word `name`, as a function of the machine, in
+        the current wordlist. Every new definition goes through here, so that
+        the caches of PURE words that depend on a redefined word get cleared.
+        """
+        self._add(self.current, name, types.MethodType(func, self))
+        self.latest = name
+        self.generation = next(_generations)
+        if self.including:
+            self.including[-1].defined(name, func)
+
+        self.memos = [memo for memo in self.memos if memo.name != name]
+        for memo in self.memos:
+            if name in memo.depends:
+                # Dropped rather than cleared: it may be shared (see
+                # forth.pool), and the next call makes a new one.
+                self.memo_caches.pop(memo, None)
+                self._track_callees(memo)
+
+    def _define_colon(self, name, tokens, effect=None):
+        """ Defines `name` as a colon definition of the given tokens. """
+        self.metrics.compiles += 1
+        new_word = lambda self: (self.interpret(tokens) if self.quotas is None
+                                 else self._interpret_call(tokens))
+        new_word.tokens = tokens
+        if effect is not None:
+            new_word.stack_effect = effect
+        self._define(name, new_word)
+
+    def _callees(self, word):
+        """
+        Returns the names of the words `word` calls, directly or not, as far
+        as they can be told from its compiled tokens.
         """
-        num_args = func.func_code.co_argcount
-        def stack_helper(self):
-            args = [self._pop() for x in xrange(num_args)]
-            ret = func(*args)
-            if ret is None:
+        funcs, names = set(), set()
+        pending = [getattr(word, 'tokens', ())]
+        while pending:
+            for kind, token in pending.pop():
+                if kind == 'CALL':
+                    func = token.__func__
+                    if func not in funcs:
+                        funcs.add(func)
+                        pending.append(getattr(func, 'tokens', ()))
+                elif kind == 'SITE' and token.name not in names:
+                    names.add(token.name)
+                    word = self.find(token.name)
+                    if word is not None:
+                        pending.append(getattr(word, 'tokens', ()))
+                elif kind in ('LOOP', 'UNTIL'):
+                    pending.append(token)
+                elif kind in ('BRANCH', 'WHILE'):
+                    pending.extend(token)
+        names.update(name for name, method in self.words.items()
+                     if method.__func__ in funcs)
+        return names
+
+    def _track_callees(self, memo):
+        """
+        Adds whatever the PURE word `memo` has come to call since, through
+        late-bound calls, to the words its cache depends on. The set only
+        ever grows, as the memo may be shared with other machines.
+        """
+        memo.depends = memo.depends | self._callees(memo.original)
+
+    def memoize(self, name, maxsize=MEMO_SIZE):
+        """
+        Makes the word `name` remember its results: each call with the same
+        input cells (as many as its stack effect takes) gets the outputs of
+        the first, from a cache of the `maxsize` most recently used inputs.
+        The word's text output, if any, isn't replayed.
+
+        The word needs a stack effect: natives have one, and a colon
+        definition gets one from a comment just after its name, as in
+        `: SQUARE ( n -- n*n ) DUP * ;`. The cache, kept in
+        :attr:`memo_caches` under the replaced word's function, is emptied
+        whenever a word it calls is redefined, or the search order changes.
+        Its hits and misses are counted in :attr:`metrics`.
+        """
+        word = self.find(name)
+        if word is None:
+            raise ForthError('undefined word: %s' % name)
+        effect = getattr(word, 'stack_effect', None)
+        if effect is None:
+            raise ForthError('no stack effect: %s' % name)
+        original = word.__func__
+
+        def memo(self):
+            key, depth = self._memo_lookup(memo)
+            if key is None:
                 return
-            try:
-                self._push_all(ret)
-            except TypeError:
-                self._push(ret)
-        self.words[word] = types.MethodType(stack_helper, self)
+            output = original(self)
+            self._memo_store(memo, key, depth)
+            return output
+
+        memo.name = name
+        memo.original = original
+        memo.maxsize = maxsize
+        memo.stack_effect = effect
+        memo.depends = self._callees(word)
+        self._define(name, memo)
+        self.memos.append(memo)
+
+    def _memo_lookup(self, memo):
+        """
+        Looks the inputs of a call of the PURE word `memo` up in its cache.
+        On a hit, replaces them with the outputs and returns (None, None);
+        otherwise returns the (key, depth) to store the outputs under with
+        :meth:`_memo_store`, once the original word has run.
+        """
+        stack = self.data_stack
+        depth = len(stack) - len(memo.stack_effect[0])
+        if depth < 0:
+            raise ForthError('stack underflow')
+        key = tuple(stack[depth:])
+        cache = self.memo_caches.get(memo)
+        results = None if cache is None else cache.pop(key, None)
+        if results is None:
+            self.metrics.memo_misses += 1
+            return key, depth
+        self.metrics.memo_hits += 1
+        cache[key] = results
+        stack[depth:] = results
+        return None, None
+
+    def _memo_store(self, memo, key, depth):
+        stack = self.data_stack
+        if len(stack) != depth + len(memo.stack_effect[1]):
+            raise ForthError('stack effect broken: %s' % memo.name)
+        cache = self.memo_caches.get(memo)
+        if cache is None:
+            cache = self.memo_caches[memo] = collections.OrderedDict()
+        cache[key] = tuple(stack[depth:])
+        if len(cache) > memo.maxsize:
+            cache.popitem(last=False)
+
+    def include(self, path, require=False):
+        """
+        Runs the Forth source file at `path` (relative to the file being
+        included, if any), returning its output. With `require`, a file that
+        has already been included is skipped.
+
+        The definitions a file compiles to are cached in a `__forthcache__`
+        directory next to it (or in :attr:`cache_dir`, if set; False turns
+        the cache off), and taken from there while the file and the words it
+        depends on stay the same: see :mod:`forth.include`.
+        """
+        from forth import include
+        return include.include(self, path, require)
+
+    def map_word(self, name, columns):
+        """
+        Runs the word `name` once for each row of `columns`, a sequence of
+        equal-length sequences that are pushed onto an empty stack (first
+        column deepest) for each run. Returns the resulting stack as a list
+        of NumPy arrays, one per stack cell.
+
+        Words built only from numbers, IF/ELSE/THEN and stack-methods with a
+        vector form are run over whole arrays at once; anything else falls
+        back to running the word row by row. Text output is discarded.
+
+        Requires NumPy.
+        """
+        from forth import vector
+        return vector.map_word(self, name, columns)
 
     def eval(self, text=''):
+        """
+        Evaluates `text` on the tree-walker, returning its output. If the
+        machine has a `recorder` (see :mod:`forth.recording`), the input is
+        logged to it.
+        """
+        started = self.input_started = clock()
+        self.output_used = self.call_depth = 0
+        status = 'error'
+        try:
+            output, status = self._eval(text)
+            return output
+        finally:
+            seconds = clock() - started
+            self.metrics.finished(seconds)
+            if self.recorder is not None:
+                self.recorder.record(text, started, seconds, status)
+
+    def _eval(self, text):
+        """
+        Evaluates `text`, returning its output and how it ended: 'ok',
+        'compiled', 'error' or 'quit'.
+        """
         self.parser = Parser(text)
 
         ret = ''
@@ -342,18 +1430,50 @@ class Machine(object):
             for word in self.parser.generate():
                 token = self.tokenize_one(word)
                 ret += self.interpret_one(*token)
-        except ImmediateQuit:
-            return ret
+        except ImmediateQuit as e:
+            return ret + e.output, 'quit'
         except ForthError as e:
-            self.data_stack = []
-            self.return_stack = []
-            self.mode = IMMEDIATE_MODE
-            return ret + ' ? ' + e.message
+            self._abort()
+            return ret + e.output + ' ? %s' % e, 'error'
+        except RecursionError:
+            self._abort()
+            return ret + ' ? %s' % ForthError('return stack overflow'), 'error'
 
         if self.mode is IMMEDIATE_MODE:
-            return ret + ' ok'
+            return ret + ' ok', 'ok'
         elif self.mode is COMPILE_MODE:
-            return ret + ' compiled'
+            return ret + ' compiled', 'compiled'
+
+    def run(self, source='', budget=None, interactive=True):
+        """
+        Evaluates `source` like :meth:`eval` does, but on the flat engine in
+        :mod:`forth.engine`, stopping after at most `budget` instructions
+        (each word or compiled token run counts as one; None means no limit).
+
+        Returns a :class:`forth.engine.Continuation`, whose `output` is the
+        text produced by this call and whose `done` tells whether `source`
+        has been run to the end. Pass the continuation back in as `source` to
+        carry on from where it stopped, or to :meth:`cancel` to abandon it.
+        Unless `interactive`, the output leaves out the REPL's ' ok' and
+        error messages.
+        """
+        from forth.engine import Continuation
+        if not isinstance(source, Continuation):
+            source = Continuation(self, source, interactive=interactive)
+        return source.resume(budget)
+
+    def cancel(self, continuation):
+        """ Abandons a continuation returned by :meth:`run`. """
+        continuation.cancel()
+
+    def _abort(self):
+        """ Puts the machine back into a usable state after an error. """
+        self.data_stack = []
+        self.float_stack = array('d')
+        self.return_stack = []
+        self.control_stack = []
+        self.mode = IMMEDIATE_MODE
+        self.now_compiling = None
 
     def tokenize(self, text):
         self.parser = Parser(text)
@@ -363,21 +1483,44 @@ class Machine(object):
         return ret
 
     def tokenize_one(self, word):
+        # Words come first, as in plain Forth: in HEX, FACE and ADD are also
+        # numbers.
+        late = self.late_binding and self.mode is COMPILE_MODE
+        if word in self.words or word in LAZY_WORDS and self.find(word):
+            method = self.words[word]
+            if late and not getattr(method, 'is_compile_word', False):
+                return 'SITE', CallSite(word)
+            return 'CALL', method
+
+        base = self._base()
         try:
-            number = int(word)
+            if base == 10:
+                number = int(word)
+            elif 2 <= base <= len(_DIGITS):
+                number = int(word, base)
+            else:
+                raise ValueError(base)
             return 'NUMBER', number
         except ValueError:
             pass  # ignore the failed conversion.
 
-        if word in self.words:
-            return 'CALL', self.words[word]
+        if base == 10 and _FLOAT_LITERAL.match(word):
+            significand, exponent = re.split('[Ee]', word)
+            return 'FLOAT', float('%se%s' % (significand, exponent.rstrip('+-') or '0'))
+
+        if late:
+            return 'SITE', CallSite(word)
         else:
             return 'WORD', word
 
     def interpret(self, tokens=()):
         ret = ''
-        for t in tokens:
-            ret += self.interpret_one(*t)
+        try:
+            for t in tokens:
+                ret += self.interpret_one(*t)
+        except ForthError as e:
+            e.output = ret + e.output
+            raise
         return ret
 
     def interpret_one(self, kind, token):
@@ -391,14 +1534,22 @@ class Machine(object):
         loop_end = self._pop()
 
         ret = ''
-        while index < loop_end:
-            self._return_push(index)
-            try:
-                ret += self.interpret(tokens)
-            except LeaveLoop:
-                break
-            index = self._return_pop()
-            index += self._pop()
+        try:
+            while index < loop_end:
+                self._return_push(index)
+                try:
+                    ret += self.interpret(tokens)
+                except LeaveLoop as e:
+                    ret += e.output
+                    break
+                self.metrics.sample(len(self.data_stack), len(self.return_stack))
+                index = self._return_pop()
+                index += self._pop()
+                if self.quotas is not None:
+                    self._safepoint()
+        except ForthError as e:
+            e.output = ret + e.output
+            raise
 
         return ret
 
@@ -415,23 +1566,80 @@ class Machine(object):
 
     def interpret_while(self, begin_tokens, while_tokens):
         ret = ''
-        while True:
-            ret += self.interpret(begin_tokens)
-            testvar = self._pop()
-            if not testvar:
-                break
-            ret += self.interpret(while_tokens)
+        try:
+            while True:
+                ret += self.interpret(begin_tokens)
+                self.metrics.sample(len(self.data_stack), len(self.return_stack))
+                testvar = self._pop()
+                if not testvar:
+                    break
+                ret += self.interpret(while_tokens)
+                if self.quotas is not None:
+                    self._safepoint()
+        except ForthError as e:
+            e.output = ret + e.output
+            raise
 
         return ret
 
+    def interpret_until(self, tokens):
+        ret = ''
+        try:
+            while True:
+                ret += self.interpret(tokens)
+                self.metrics.sample(len(self.data_stack), len(self.return_stack))
+                if self._pop():
+                    break
+                if self.quotas is not None:
+                    self._safepoint()
+        except ForthError as e:
+            e.output = ret + e.output
+            raise
+
+        return ret
+
+    def _safepoint(self):
+        """
+        Checks the quotas, each time around a loop the tree-walker runs and
+        on each call of a colon definition.
+        """
+        self.quotas.check(self, clock() - self.input_started,
+                          calls=self.call_depth, output=self.output_used)
+
+    def _interpret_call(self, tokens):
+        """ Runs a colon definition on the tree-walker, under quotas. """
+        self.call_depth += 1
+        try:
+            self._safepoint()
+            output = self.interpret(tokens)
+        finally:
+            self.call_depth -= 1
+        # Counted already, as it was made; the caller counts it again.
+        self.output_used -= len(output)
+        return output
+
     def interpret_one_immediate(self, kind, token):
         if kind == 'NUMBER':
             self._push(token)
             return ''
+        elif kind == 'FLOAT':
+            self.float_stack.append(token)
+            return ''
         elif kind == 'CALL':
-            output = token()
+            # Through the function, not the bound method: compiled code may
+            # be shared with other machines (see forth.pool).
+            output = token.__func__(self)
+            if output is None:
+                return ''
+            if self.quotas is not None:
+                self.output_used += len(output)
+            return output
+        elif kind == 'SITE':
+            output = token.resolve(self)[2](self)
             if output is None:
                 return ''
+            if self.quotas is not None:
+                self.output_used += len(output)
             return output
         elif kind == 'LOOP':
             return self.interpret_loop(token)
@@ -439,6 +1647,8 @@ class Machine(object):
             return self.interpret_branch(*token)
         elif kind == 'WHILE':
             return self.interpret_while(*token)
+        elif kind == 'UNTIL':
+            return self.interpret_until(token)
         elif kind == 'WORD':
             raise ForthError('undefined word: %s' % token)
         elif kind == 'LEAVE':
@@ -455,5 +1665,5 @@ class Machine(object):
         elif kind == 'WORD':
             raise ForthError('undefined word: %s' % token)
         else:
-            self._push((kind, token))
+            self._compile((kind, token))
             return ''
@@ -0,0 +1,181 @@
+# coding= utf-8
+"""
+Operational metrics for a :class:`forth.Machine`, kept in `machine.metrics`:
+
+    >>> m = forth.Machine()
+    >>> m.run(': SQUARE DUP * ; 7 SQUARE .').output
+    '49  ok'
+    >>> m.metrics.snapshot().as_dict()['instructions']
+    10
+
+Nothing is counted per instruction: the flat engine counts in locals while it
+runs and adds them up once per slice (see `Continuation.resume`), and
+:meth:`Machine.eval` once per call, so that the metrics can stay on in
+production. The stacks' high-water marks are sampled each time around a
+loop, as well as at the end of each slice and input. Instruction and call
+counts come from the flat engine only; the tree-walker adds evals and their
+latency.
+
+The metrics of many machines (a pool's, or a server's sessions) add up with
+:meth:`Metrics.total`, and come out in the Prometheus text format with
+:meth:`Metrics.prometheus`.
+"""
+from __future__ import unicode_literals
+
+import bisect
+import time
+
+clock = getattr(time, 'perf_counter', time.time)
+
+# Upper bounds, in seconds, of the buckets of the latency histogram.
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+COUNTERS = ('evals', 'instructions', 'calls', 'compiles', 'memo_hits',
+            'memo_misses', 'include_hits', 'include_misses')
+HIGH_WATER_MARKS = ('data_stack_max', 'return_stack_max')
+
+_HELP = {
+    'evals': 'Inputs (and tasks) run to the end.',
+    'instructions': 'Instructions run by the flat engine.',
+    'calls': 'Words called by the flat engine.',
+    'compiles': 'Colon definitions compiled or loaded from a cache.',
+    'memo_hits': 'Calls of PURE words answered from their caches.',
+    'memo_misses': 'Calls of PURE words that had to run.',
+    'include_hits': 'Files included from their compiled caches.',
+    'include_misses': 'Files included by compiling them.',
+    'data_stack_max': 'The deepest the data stack has been seen.',
+    'return_stack_max': 'The deepest the return stack has been seen.',
+    'data_space_bytes': 'The size of the data space.',
+    'eval_seconds': 'How long inputs took to run to the end.',
+}
+
+
+class Histogram(object):
+    """ A histogram of observations in fixed `buckets`, Prometheus-style. """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def add(self, other):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.sum += other.sum
+        self.count += other.count
+
+    def cumulative(self):
+        """ The (upper bound, count) of each bucket, counting the ones below. """
+        total, ret = 0, []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            ret.append((bound, total))
+        return ret
+
+
+class Metrics(object):
+    """
+    The counters, high-water marks and latency histogram of a machine (or,
+    without one, a total of several: see :meth:`total`).
+    """
+    def __init__(self, machine=None):
+        self.machine = machine
+        for name in COUNTERS + HIGH_WATER_MARKS:
+            setattr(self, name, 0)
+        self.data_space_bytes = 0
+        self.latency = Histogram()
+
+    def sample(self, data_depth, return_depth):
+        """ Raises the high-water marks to the given stack depths. """
+        if data_depth > self.data_stack_max:
+            self.data_stack_max = data_depth
+        if return_depth > self.return_stack_max:
+            self.return_stack_max = return_depth
+
+    def finished(self, seconds):
+        """ Records an input that took `seconds` to run to the end. """
+        self.evals += 1
+        self.latency.observe(seconds)
+        machine = self.machine
+        self.sample(len(machine.data_stack), len(machine.return_stack))
+
+    def snapshot(self):
+        """
+        A copy of the metrics as they stand, detached from the machine, with
+        what's read off the machine itself (the size of the data space, the
+        current stack depths) filled in.
+        """
+        ret = Metrics()
+        ret.add(self)
+        machine = self.machine
+        if machine is not None:
+            ret.data_space_bytes = len(machine.memory)
+            ret.sample(len(machine.data_stack), len(machine.return_stack))
+        return ret
+
+    def add(self, other):
+        """ Adds another's (detached) metrics to these. """
+        for name in COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for name in HIGH_WATER_MARKS:
+            setattr(self, name, max(getattr(self, name), getattr(other, name)))
+        self.data_space_bytes += other.data_space_bytes
+        self.latency.add(other.latency)
+
+    @classmethod
+    def total(cls, metrics):
+        """ Adds up the snapshots of several machines' metrics. """
+        ret = cls()
+        for each in metrics:
+            ret.add(each.snapshot())
+        return ret
+
+    def as_dict(self):
+        ret = dict((name, getattr(self, name)) for name in COUNTERS + HIGH_WATER_MARKS)
+        ret['data_space_bytes'] = self.data_space_bytes
+        ret['eval_seconds'] = {'buckets': self.latency.cumulative(),
+                               'sum': self.latency.sum,
+                               'count': self.latency.count}
+        return ret
+
+    def prometheus(self, prefix='forth', gauges=None):
+        """
+        The metrics in the Prometheus text exposition format, with their
+        names prefixed. `gauges` is a dict of other {name: value} to add.
+        """
+        lines = []
+
+        def metric(name, kind, value, help_text=None):
+            lines.append('# HELP %s_%s %s' % (prefix, name, help_text or _HELP[name]))
+            lines.append('# TYPE %s_%s %s' % (prefix, name, kind))
+            lines.append('%s_%s %s' % (prefix, name, _number(value)))
+
+        for name in COUNTERS:
+            metric(name + '_total', 'counter', getattr(self, name), _HELP[name])
+        for name in HIGH_WATER_MARKS + ('data_space_bytes',):
+            metric(name, 'gauge', getattr(self, name))
+        for name, value in sorted((gauges or {}).items()):
+            metric(name, 'gauge', value, name.replace('_', ' ').capitalize() + '.')
+
+        name = '%s_eval_seconds' % prefix
+        lines.append('# HELP %s %s' % (name, _HELP['eval_seconds']))
+        lines.append('# TYPE %s histogram' % name)
+        for bound, count in self.latency.cumulative():
+            lines.append('%s_bucket{le="%s"} %d' % (name, _number(bound), count))
+        lines.append('%s_sum %s' % (name, _number(self.latency.sum)))
+        lines.append('%s_count %d' % (name, self.latency.count))
+        return '\n'.join(lines) + '\n'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float):
+        return repr(value)
+    return '%d' % value
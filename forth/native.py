@@ -0,0 +1,151 @@
+# coding= utf-8
+"""
+Native words: plain Python functions exposed to Forth with a declared stack
+effect, e.g.:
+
+    >>> import math, forth
+    >>> @forth.native_word('( a b -- hypotenuse )')
+    ... def hypot(a, b):
+    ...     return int(round(math.hypot(a, b)))
+    >>> m = forth.Machine()
+    >>> m.add_vocabulary({'hypot': hypot})
+    >>> m.eval('3 4 HYPOT .')
+    '5  ok'
+
+The function is called with its inputs in the order the stack effect lists
+them (so with a deeper than b), and must return None for no outputs, a single
+value for one, or a sequence of values for more than one.
+
+The stack effect only describes the data stack, whose cells are integers:
+results are pushed as they are, so a float that gets there is printed by `.`
+truncated (5.7 as 5). Round it to an integer, as above, or -- for a word
+with a floating-point result -- take the machine and push it onto
+`machine.float_stack` instead, for F. and the other F-words:
+
+    >>> @forth.native_word('( a b -- )', machine=True)
+    ... def fhypot(machine, a, b):
+    ...     machine.float_stack.append(math.hypot(a, b))
+    >>> m.add_vocabulary({'fhypot': fhypot})
+    >>> m.eval('2 3 FHYPOT F.')
+    '3.605551275463989  ok'
+
+Because the stack effect says exactly how many cells go in and come out, the
+word wrapped around each function is generated to measure: it checks the
+stack depth once, pops its arguments straight into locals and pushes its
+result(s) back, without building argument lists or inspecting the result.
+"""
+from __future__ import unicode_literals
+
+from forth.errors import ForthError
+
+
+def parse_effect(effect):
+    """
+    Parses a stack effect comment, such as '( n1 n2 -- n3 )', into the tuples
+    of cell names before and after the '--'.
+    """
+    names = effect.split()
+    if names[:1] == ['(']:
+        names = names[1:]
+    if names[-1:] == [')']:
+        names = names[:-1]
+    if names.count('--') != 1:
+        raise ForthError('bad stack effect: %s' % effect)
+
+    split = names.index('--')
+    return tuple(names[:split]), tuple(names[split + 1:])
+
+
+def native_word(effect, name=None, machine=False, output=False):
+    """
+    Marks a function as a native word with the given stack `effect`, to be
+    picked up by :meth:`Machine.add_vocabulary` under `name` (by default, the
+    function's name in upper case, with dashes for underscores).
+
+    With `machine=True`, the function gets the :class:`Machine` it runs on as
+    its first argument, for access to the data space and the like; with
+    `output=True`, it then gets a `write` function to send text to the
+    machine's output.
+    """
+    def decorator(func):
+        func.stack_effect = effect
+        func.forth_name = name
+        func.wants_machine = machine
+        func.wants_output = output
+        return func
+    return decorator
+
+
+def make_word(func, effect, machine=False, output=False, vector=None, name=None):
+    """
+    Builds the word behind a native function: a function of the machine it
+    runs on, specialized for the number of inputs and outputs in `effect`.
+
+    If given, `vector` is an elementwise version of `func` (taking its
+    arguments in the same order) that works on NumPy arrays, for use by
+    :meth:`Machine.map_word`; `vector=True` means `func` already does.
+    """
+    inputs, outputs = parse_effect(effect)
+    args = ['x%d' % i for i in range(len(inputs))]
+
+    lines = ['def word(self):',
+             '    stack = self.data_stack']
+    if args:
+        lines += ['    if len(stack) < %d:' % len(args),
+                  "        raise ForthError('stack underflow')"]
+        lines += ['    %s = stack.pop()' % arg for arg in reversed(args)]
+
+    call_args = list(args)
+    if output:
+        lines.append('    out = []')
+        call_args.insert(0, 'out.append')
+    if machine:
+        call_args.insert(0, 'self')
+    call = 'func(%s)' % ', '.join(call_args)
+
+    if not outputs:
+        lines.append('    %s' % call)
+    elif len(outputs) == 1:
+        lines.append('    stack.append(%s)' % call)
+    else:
+        lines.append('    stack.extend(%s)' % call)
+    if output:
+        lines.append("    return ''.join(out)")
+
+    namespace = {'func': func, 'ForthError': ForthError}
+    exec(compile('\n'.join(lines), '<native %s>' % (name or func.__name__), 'exec'),
+         namespace)
+    word = namespace['word']
+
+    if vector is True:
+        vector = func
+    word.stack_effect = (inputs, outputs)
+    word.native_func = func
+    word.vector = vector
+    return word
+
+
+def vocabulary(source, effects=None):
+    """
+    Lists the native words in `source` -- a module, class or dict -- as
+    (word, function, effect, wants_machine, wants_output) tuples. Functions
+    are included if they were marked with :func:`native_word`, or if their
+    attribute name is a key of `effects`, a dict of stack effects for
+    functions that weren't written with Forth in mind (math.sqrt, say).
+    """
+    if isinstance(source, dict):
+        members = source
+    else:
+        members = dict((attr, getattr(source, attr)) for attr in dir(source))
+    effects = effects or {}
+
+    ret = []
+    for attr, func in sorted(members.items()):
+        if attr in effects:
+            ret.append((attr.upper().replace('_', '-'), func, effects[attr],
+                        False, False))
+        elif callable(func) and hasattr(func, 'stack_effect'):
+            name = func.forth_name or attr.upper().replace('_', '-')
+            ret.append((name, func, func.stack_effect,
+                        func.wants_machine, func.wants_output))
+    return ret
@@ -70,11 +70,27 @@ class Parser(object):
     def parse_rest_of_line(self):
         return self._consume(r'[^\n]*')
 
+    def parse_until(self, delimiter):
+        """
+        Consumes text up to and including the next `delimiter` (or to the end
+        of the string, if there isn't one), returning the text before it.
+        """
+        end = self.text.find(delimiter, self.pos)
+        if end < 0:
+            end = len(self.text)
+        text = self.text[self.pos:end]
+        self.pos = end + len(delimiter)
+        return text
+
     def next_word(self):
         self.parse_whitespace()
         return self.parse_word()
 
     def generate(self):
         while True:
-            yield self.next_word()
+            try:
+                word = self.next_word()
+            except StopIteration:
+                return
+            yield word
 
@@ -0,0 +1,180 @@
+# coding= utf-8
+"""
+Running Forth jobs on a pool of threads, all sharing one dictionary.
+
+The words a machine compiles are machine-independent: flat code and call
+sites only ever run the functions behind words on the machine at hand (see
+:class:`forth.machine.CallSite`). So a :class:`Dictionary` -- the words and
+data space of a machine, taken once it's set up -- can be shared by any
+number of machines, one per thread, each with its own stacks, parser, mode
+and loops, without copying any compiled code. Each job starts from the
+dictionary afresh, and whatever it defines or stores is gone after it:
+
+    >>> m = forth.Machine()
+    >>> m.eval(': SQUARE DUP * ;')
+    ' ok'
+    >>> with Pool(Dictionary(m), max_workers=4) as pool:
+    ...     futures = [pool.submit('SQUARE', n) for n in range(100)]
+    ...     [future.result().stack for future in futures][:3]
+    [[0], [1], [4]]
+
+Jobs run on the flat engine. On a free-threaded build of CPython they run on
+as many cores as there are workers; otherwise the GIL keeps them to one, but
+saves the cost of starting processes and pickling their inputs and results.
+The caches of PURE words and of late-bound call sites are shared, and safe
+to share: a job that redefines a word a PURE word depends on gets an empty
+cache of its own for it instead. TASKs don't carry over.
+
+Requires Python 3 (or the futures backport).
+"""
+from __future__ import unicode_literals
+
+import collections
+import concurrent.futures
+import threading
+import types
+
+from forth.engine import code_for
+from forth.machine import Machine
+from forth.metrics import Metrics
+
+# What a job came to: its output, without the REPL's ' ok', and the stack it
+# left behind.
+Result = collections.namedtuple('Result', 'output stack')
+
+
+class Dictionary(object):
+    """
+    An immutable snapshot of `machine`'s words, data space and settings, to
+    make new machines from (:meth:`machine`) and to put them back to
+    (:meth:`reset`).
+    """
+    def __init__(self, machine):
+        self.wordlists = tuple(
+            dict((name, word.__func__) for name, word in words.items())
+            for words in machine.wordlists)
+        self.search_order = tuple(machine.search_order)
+        self.current = machine.current
+        self.memory = bytes(machine.memory)
+        self.here = machine.here
+        self.hold = machine.hold
+        self.generation = machine.generation
+        self.latest = machine.latest
+        self.memos = tuple(machine.memos)
+        for memo in machine.memos:
+            machine.memo_caches.setdefault(memo, collections.OrderedDict())
+        self.memo_caches = dict(machine.memo_caches)
+        self.late_binding = machine.late_binding
+        self.included = frozenset(machine.included)
+        self.wordsets = frozenset(machine.wordsets)
+        self.quotas = machine.quotas
+
+        # Lower every definition now, rather than racing to later.
+        for functions in self.wordlists:
+            for func in functions.values():
+                if hasattr(func, 'tokens'):
+                    code_for(types.MethodType(func, machine))
+
+    def machine(self, factory=Machine):
+        """ A new machine, with these words. """
+        machine = factory()
+        machine.generation = None  # so that reset puts the words in
+        self.reset(machine, self.bind(machine))
+        return machine
+
+    def bind(self, machine):
+        """ The wordlists, bound to `machine`, as a list of {name: word} dicts. """
+        return [dict((name, types.MethodType(func, machine))
+                     for name, func in functions.items())
+                for functions in self.wordlists]
+
+    def reset(self, machine, wordlists):
+        """
+        Puts `machine` back the way the dictionary has it, with copies of
+        `wordlists` (as from :meth:`bind`) if it has defined any words of its
+        own, or changed the search order.
+        """
+        machine._abort()
+        if machine.generation != self.generation:
+            machine._restore_wordlists([dict(words) for words in wordlists],
+                                       self.search_order)
+            machine.generation = self.generation
+        machine.current = self.current
+        machine.memory = bytearray(self.memory)
+        machine.here = self.here
+        machine.hold = self.hold
+        machine.latest = self.latest
+        machine.memos = list(self.memos)
+        machine.memo_caches = dict(self.memo_caches)
+        machine.late_binding = self.late_binding
+        machine.included = set(self.included)
+        machine.wordsets = set(self.wordsets)
+        machine.quotas = self.quotas
+        machine.tasks = []
+        machine.ready.clear()
+
+
+class Pool(object):
+    """
+    Runs jobs -- Forth source, given some stack to start on -- on a pool of
+    `max_workers` threads, each with a machine of its own over the shared
+    `dictionary` (a :class:`Dictionary`, or a machine to take one of).
+    """
+    def __init__(self, dictionary, max_workers=None, machine_factory=Machine):
+        if isinstance(dictionary, Machine):
+            dictionary = Dictionary(dictionary)
+        self.dictionary = dictionary
+        self.machine_factory = machine_factory
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers)
+        self.local = threading.local()
+        self.machines = []
+        self.lock = threading.Lock()
+
+    def _machine(self):
+        local = self.local
+        try:
+            return local.machine, local.words
+        except AttributeError:
+            pass
+        local.machine = self.dictionary.machine(self.machine_factory)
+        local.words = self.dictionary.bind(local.machine)
+        with self.lock:
+            self.machines.append(local.machine)
+        return local.machine, local.words
+
+    def _run(self, text, stack):
+        machine, words = self._machine()
+        self.dictionary.reset(machine, words)
+        machine.data_stack.extend(stack)
+        cont = machine.run(text, interactive=False)
+        if cont.error is not None:
+            raise cont.error
+        return Result(cont.output, list(machine.data_stack))
+
+    def submit(self, text, *stack):
+        """
+        Runs `text` on a stack of the given cells, returning a
+        :class:`concurrent.futures.Future` of its :class:`Result`, or of the
+        :exc:`ForthError` it stopped on.
+        """
+        return self.executor.submit(self._run, text, stack)
+
+    def map(self, texts):
+        """ Runs each of `texts`, yielding their results in order. """
+        for future in [self.submit(text) for text in texts]:
+            yield future.result()
+
+    def metrics(self):
+        """ The metrics of all the workers' machines, added up. """
+        with self.lock:
+            machines = list(self.machines)
+        return Metrics.total(machine.metrics for machine in machines)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
@@ -0,0 +1,70 @@
+# coding= utf-8
+"""
+Limits on what a :class:`forth.Machine` may use, kept in `machine.quotas`
+(None, the default, for no limits at all):
+
+    >>> m = forth.Machine()
+    >>> m.quotas = Quotas(data_stack=1000)
+    >>> m.run(': FLOOD BEGIN 1 0 UNTIL ; FLOOD').output
+    ' ? quota exceeded: data stack'
+
+Going over a quota raises :exc:`QuotaExceeded`, a :exc:`ForthError` like any
+other, so the input is abandoned and the machine is left ready for the next.
+
+Nothing is checked per instruction. While there are quotas, the flat engine
+runs in slices of at most :data:`SAFEPOINT` instructions and checks them
+before each, and the tree-walker checks the stacks and the time each time
+around a loop; a quota can be overshot by that much before it's noticed. The
+data space is the exception: ALLOT checks it before growing it.
+"""
+from __future__ import unicode_literals
+
+from forth.errors import QuotaExceeded
+
+SAFEPOINT = 1024
+
+NAMES = ('data_stack', 'return_stack', 'memory', 'output', 'instructions',
+         'seconds')
+
+
+class Quotas(object):
+    """
+    The quotas of a machine, each None for no limit:
+
+        data_stack    cells on the data stack
+        return_stack  cells on the return stack, plus nested calls on the
+                      flat engine
+        memory        bytes of data space
+        output        characters of output from a single input
+        instructions  instructions run for a single input (flat engine only)
+        seconds       wall-clock time a single input may take to run
+
+    They can be shared by any number of machines.
+    """
+    def __init__(self, data_stack=None, return_stack=None, memory=None,
+                 output=None, instructions=None, seconds=None):
+        self.data_stack = data_stack
+        self.return_stack = return_stack
+        self.memory = memory
+        self.output = output
+        self.instructions = instructions
+        self.seconds = seconds
+
+    def check_memory(self, size):
+        """ Raises QuotaExceeded if the data space may not grow to `size`. """
+        if self.memory is not None and size > self.memory:
+            raise QuotaExceeded('memory')
+
+    def check(self, machine, seconds, calls=0, output=0, instructions=0):
+        """
+        Raises QuotaExceeded if `machine` is over any of its quotas, given
+        what the input being run has used so far.
+        """
+        for name, used in (('data_stack', len(machine.data_stack)),
+                           ('return_stack', len(machine.return_stack) + calls),
+                           ('output', output),
+                           ('instructions', instructions),
+                           ('seconds', seconds)):
+            limit = getattr(self, name)
+            if limit is not None and used > limit:
+                raise QuotaExceeded(name)
@@ -0,0 +1,194 @@
+# coding= utf-8
+"""
+Recording the inputs a :class:`forth.Machine` evaluates, and replaying them,
+to benchmark the interpreter on real sessions rather than only on synthetic
+programs.
+
+A machine with a `recorder` logs each input to :meth:`Machine.eval` as it's
+run, with when it started (in seconds since the recording did), how long it
+took, and how it ended (ok, compiled, error or quit):
+
+    >>> m = forth.Machine()
+    >>> with Recorder('session.rec.gz') as m.recorder:
+    ...     m.eval(': SQUARE DUP * ; 7 SQUARE .')
+    '49  ok'
+
+The REPL records with `python forth_repl.py --record FILE`. A recording is a
+line of JSON per input, after a header line, and is gzipped if its name ends
+with .gz.
+
+Replaying feeds the inputs to a new machine, as fast as it will take them or
+at the pace they were recorded at, and reports the throughput, the latency
+percentiles and how many inputs ended differently than when recorded:
+
+    $ python -m forth.recording session.rec.gz --repeat 5
+"""
+from __future__ import unicode_literals, print_function
+
+import argparse
+import gzip
+import io
+import json
+import sys
+import time
+
+from forth.errors import ForthError
+from forth.machine import Machine
+from forth.metrics import clock
+
+FORMAT = 'forth-recording'
+VERSION = 1
+
+PERCENTILES = (50, 90, 99)
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode)
+    return io.open(path, mode)
+
+
+class Recorder(object):
+    """
+    Writes a recording to the file at `path`: see :meth:`Machine.eval`. Also
+    a context manager, which closes it at the end.
+    """
+    def __init__(self, path):
+        self.stream = _open(path, 'wb')
+        self.started = clock()
+        self._write([FORMAT, VERSION, time.time()])
+
+    def _write(self, entry):
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        self.stream.write(line.encode('utf-8'))
+
+    def record(self, text, started, seconds, status):
+        """ Logs an input that was started at clock() time `started`. """
+        self._write([round(started - self.started, 6), round(seconds, 6),
+                     status, text])
+
+    def close(self):
+        self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read(path):
+    """
+    Reads a recording, returning its inputs as a list of (offset, seconds,
+    status, text), where `offset` is when each was started.
+    """
+    with _open(path, 'rb') as stream:
+        lines = iter(stream)
+        try:
+            header = json.loads(next(lines, b'null').decode('utf-8'))
+        except ValueError:
+            header = None
+        if not isinstance(header, list) or header[:2] != [FORMAT, VERSION]:
+            raise ForthError('not a recording: %s' % path)
+        return [tuple(json.loads(line.decode('utf-8'))) for line in lines]
+
+
+def _run(machine, text):
+    """ Runs an input on the flat engine, returning how it ended. """
+    cont = machine.run(text)
+    if cont.error is not None:
+        return 'error'
+    if cont.output.endswith(' ok'):
+        return 'ok'
+    if cont.output.endswith(' compiled'):
+        return 'compiled'
+    return 'quit'
+
+
+class Report(object):
+    """ The timings of a replay: `latencies`, in seconds, and more. """
+    def __init__(self, latencies, seconds, mismatches):
+        self.latencies = latencies
+        self.seconds = seconds
+        self.mismatches = mismatches
+
+    def throughput(self):
+        """ Inputs per second. """
+        return len(self.latencies) / self.seconds if self.seconds else 0.0
+
+    def percentile(self, p):
+        """ The p-th percentile latency (by nearest rank), in seconds. """
+        ranked = sorted(self.latencies)
+        if not ranked:
+            return 0.0
+        index = max(0, min(len(ranked) - 1, -(-p * len(ranked) // 100) - 1))
+        return ranked[index]
+
+    def __str__(self):
+        lines = ['%d inputs in %.3f s: %.0f inputs/s'
+                 % (len(self.latencies), self.seconds, self.throughput())]
+        lines.append('latency ' + '  '.join(
+            ['p%d %.3f ms' % (p, self.percentile(p) * 1e3) for p in PERCENTILES] +
+            ['max %.3f ms' % (max(self.latencies or [0]) * 1e3)]))
+        if self.mismatches:
+            lines.append('%d inputs ended differently than when recorded'
+                         % self.mismatches)
+        return '\n'.join(lines)
+
+
+def replay(entries, engine='eval', pace=None, machine_factory=Machine,
+           sleep=time.sleep):
+    """
+    Feeds the recorded `entries` (see :func:`read`) to a new machine, on the
+    tree-walker (`engine='eval'`) or the flat engine ('run'), and returns a
+    :class:`Report`. With a `pace`, inputs are started no sooner than they
+    were when recorded, sped up by that factor (so 1 is the original pace);
+    otherwise, each follows straight on from the last.
+    """
+    if engine == 'run':
+        import forth.engine  # up front, so that it isn't timed with the first input
+    machine = machine_factory()
+    latencies = []
+    mismatches = 0
+    started = clock()
+    for offset, recorded_seconds, status, text in entries:
+        if pace:
+            wait = offset / pace - (clock() - started)
+            if wait > 0:
+                sleep(wait)
+
+        before = clock()
+        if engine == 'eval':
+            output, got = machine._eval(text)
+        else:
+            got = _run(machine, text)
+        latencies.append(clock() - before)
+        if got != status:
+            mismatches += 1
+    return Report(latencies, clock() - started, mismatches)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m forth.recording',
+                                     description='Replays a recorded session, '
+                                                 'reporting how fast it ran.')
+    parser.add_argument('recording')
+    parser.add_argument('--engine', choices=['eval', 'run'], default='eval',
+                        help='the tree-walker (eval, the default) or the '
+                             'flat engine (run)')
+    parser.add_argument('--pace', type=float, metavar='FACTOR',
+                        help='keep to the recorded timing, sped up by FACTOR '
+                             '(1 for the original pace); by default, replay '
+                             'at full speed')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='replay this many times, each on a new machine')
+    args = parser.parse_args(argv)
+
+    entries = read(args.recording)
+    for x in range(args.repeat):
+        print(replay(entries, args.engine, args.pace))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
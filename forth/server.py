@@ -0,0 +1,234 @@
+# coding= utf-8
+"""
+An asyncio server that gives each TCP or Unix socket connection a Forth
+session of its own, e.g.:
+
+    $ python3 -m forth.server --port 4242
+    $ telnet localhost 4242
+    1 2 + .
+    3  ok
+
+Each session gets a fresh :class:`forth.Machine`, which only has to bind the
+built-in dictionary every machine shares (see :meth:`Machine._core_words`),
+so sessions are cheap. Input is run a line at a time on the flat engine (see
+:meth:`Machine.run`) in slices of a fixed instruction budget, and the output of
+each slice is written out as soon as it's ready; between slices the session
+gives way to the others, so one busy loop can't starve the rest.
+
+With --metrics-port, the sessions' metrics (see :mod:`forth.metrics`), added
+up, are served in the Prometheus text format at /metrics on that port:
+
+    $ curl http://localhost:9464/metrics
+
+Requires Python 3.5 or later.
+"""
+import argparse
+import asyncio
+import logging
+
+import forth
+from forth.metrics import Metrics
+from forth.quotas import NAMES as QUOTAS, Quotas
+
+log = logging.getLogger(__name__)
+
+
+class Server(object):
+    """
+    Serves Forth sessions. `max_connections` caps the number of sessions at
+    once; a session is closed after `idle_timeout` seconds without input, or
+    if its client hasn't read back its output within that time. Each slice of
+    execution runs at most `budget` instructions, and a session stops
+    producing output while more than `write_buffer_limit` bytes of it are
+    waiting to be sent. Each session's machine is given the `quotas`, if any
+    (see :mod:`forth.quotas`).
+    """
+    def __init__(self, max_connections=1000, idle_timeout=300.0, budget=1000,
+                 write_buffer_limit=64 * 1024, machine_factory=forth.Machine,
+                 quotas=None):
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.budget = budget
+        self.write_buffer_limit = write_buffer_limit
+        self.machine_factory = machine_factory
+        self.quotas = quotas
+        self.sessions = set()
+        self.closed = Metrics()
+
+    async def start_tcp(self, host='127.0.0.1', port=0):
+        """ Starts listening on a TCP port; returns the asyncio server. """
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def start_unix(self, path):
+        """ Starts listening on a Unix socket; returns the asyncio server. """
+        return await asyncio.start_unix_server(self.handle, path)
+
+    async def handle(self, reader, writer):
+        """ Runs one session, until BYE, end of input or a timeout. """
+        if len(self.sessions) >= self.max_connections:
+            writer.write(b'? too many connections\n')
+            await self._close(writer)
+            return
+
+        writer.transport.set_write_buffer_limits(high=self.write_buffer_limit)
+        machine = self.machine_factory()
+        if self.quotas is not None:
+            machine.quotas = self.quotas
+        self.sessions.add(machine)
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    writer.write(b'? idle timeout\n')
+                    break
+                except ValueError:
+                    writer.write(b'? line too long\n')
+                    break
+
+                text = line.decode('utf-8', 'replace')
+                if not text or text.strip().upper() == 'BYE':
+                    break
+                if not await self._run(machine, text, writer):
+                    break
+        finally:
+            self.sessions.discard(machine)
+            # A closed session's data space is gone; the rest still counts.
+            metrics = machine.metrics.snapshot()
+            metrics.data_space_bytes = 0
+            self.closed.add(metrics)
+            await self._close(writer)
+
+    def metrics(self):
+        """ The metrics of all sessions, open and closed, added up. """
+        total = Metrics.total(machine.metrics for machine in self.sessions)
+        total.add(self.closed)
+        return total
+
+    async def start_metrics(self, host='127.0.0.1', port=0):
+        """
+        Starts serving the metrics, for Prometheus to scrape, over HTTP on a
+        TCP port; returns the asyncio server.
+        """
+        return await asyncio.start_server(self.handle_metrics, host, port)
+
+    async def handle_metrics(self, reader, writer):
+        """ Answers one HTTP request for /metrics. """
+        try:
+            request = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+            while (await asyncio.wait_for(reader.readline(), self.idle_timeout)).strip():
+                pass  # the headers don't matter.
+        except (asyncio.TimeoutError, ValueError, ConnectionError):
+            writer.close()
+            return
+
+        parts = request.decode('latin-1').split()
+        if parts[:2] == ['GET', '/metrics']:
+            status = '200 OK'
+            body = self.metrics().prometheus(gauges={'sessions': len(self.sessions)})
+        else:
+            status, body = '404 Not Found', 'not found\n'
+        body = body.encode('utf-8')
+        writer.write(('HTTP/1.0 %s\r\n'
+                      'Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                      'Content-Length: %d\r\n\r\n' % (status, len(body))).encode('latin-1'))
+        writer.write(body)
+        await self._close(writer)
+
+    async def _run(self, machine, text, writer):
+        """
+        Runs a line of input to the end, a slice at a time. Returns False if
+        the client stopped reading the output. An exception other than a
+        :exc:`ForthError` is a bug, but only ends the line it happened on.
+        """
+        cont = text
+        while True:
+            try:
+                cont = machine.run(cont, budget=self.budget)
+            except Exception as e:
+                log.exception('error running %r', text)
+                machine._abort()
+                writer.write((' ? internal error: %s: %s\n' % (type(e).__name__, e))
+                             .encode('utf-8'))
+                return await self._drain(writer)
+
+            if cont.output:
+                writer.write(cont.output.encode('utf-8'))
+                if not await self._drain(writer):
+                    machine.cancel(cont)
+                    return False
+            if cont.done:
+                break
+            # Let the other sessions have a go before carrying on (and, in
+            # MS, wait without holding them up).
+            await asyncio.sleep(cont.sleep_time())
+
+        writer.write(b'\n')
+        return await self._drain(writer)
+
+    async def _drain(self, writer):
+        try:
+            await asyncio.wait_for(writer.drain(), self.idle_timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            return False
+        return True
+
+    async def _close(self, writer):
+        try:
+            await self._drain(writer)
+            writer.close()
+        except ConnectionError:
+            pass
+
+
+def _quota(text):
+    name, sep, limit = text.partition('=')
+    if name not in QUOTAS or not sep:
+        raise argparse.ArgumentTypeError('expected one of %s=LIMIT' % ', '.join(QUOTAS))
+    return name, float(limit) if name == 'seconds' else int(limit)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m forth.server',
+                                     description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=4242)
+    parser.add_argument('--unix', metavar='PATH',
+                        help='listen on a Unix socket instead of TCP')
+    parser.add_argument('--max-connections', type=int, default=1000)
+    parser.add_argument('--idle-timeout', type=float, default=300.0)
+    parser.add_argument('--budget', type=int, default=1000,
+                        help='instructions per slice of execution')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='serve Prometheus metrics over HTTP on PORT')
+    parser.add_argument('--quota', type=_quota, action='append', default=[],
+                        metavar='NAME=LIMIT',
+                        help='limit what each session may use, e.g. '
+                             'data_stack=10000 or seconds=5 (repeatable)')
+    args = parser.parse_args(argv)
+
+    server = Server(max_connections=args.max_connections,
+                    idle_timeout=args.idle_timeout,
+                    budget=args.budget,
+                    quotas=Quotas(**dict(args.quota)) if args.quota else None)
+
+    loop = asyncio.get_event_loop()
+    if args.unix:
+        listener = loop.run_until_complete(server.start_unix(args.unix))
+    else:
+        listener = loop.run_until_complete(server.start_tcp(args.host, args.port))
+    listeners = [listener]
+    if args.metrics_port is not None:
+        listeners.append(loop.run_until_complete(
+            server.start_metrics(args.host, args.metrics_port)))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for listener in listeners:
+            listener.close()
+
+
+if __name__ == '__main__':
+    main()
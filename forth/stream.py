@@ -0,0 +1,133 @@
+# coding= utf-8
+"""
+Record-at-a-time processing of a byte stream, as used by `python -m forth
+--each WORD`, awk-style.
+
+The stream is read in big chunks straight into a buffer in the machine's data
+space (with `readinto`, so nothing is copied on the way in), and each record
+-- by default, each line, without its newline -- is handed out as the
+address and length of its bytes in that buffer. Only the tail of a chunk
+that holds the start of the next record is ever moved.
+
+While a record is current, the words RECORD, FIELD and #FIELDS (see
+:class:`Records`) give access to it and to its fields, which are split out
+lazily -- on whitespace, or on a given separator -- the first time they're
+asked for.
+"""
+from __future__ import unicode_literals
+
+import re
+
+from forth.errors import ForthError
+from forth.native import native_word
+
+CHUNK_SIZE = 1 << 20
+
+_FIELD = re.compile(b'[^ \t\r\n]+')
+
+
+class Records(object):
+    """
+    Reads records separated by `delimiter` into `machine`'s data space: see
+    :meth:`read`. Its words are added to the machine with
+    `machine.add_vocabulary(records)`.
+    """
+    def __init__(self, machine, delimiter=b'\n', field_separator=None,
+                 chunk_size=CHUNK_SIZE):
+        if not delimiter:
+            raise ForthError('empty record delimiter')
+        self.machine = machine
+        self.delimiter = delimiter
+        self.field_separator = field_separator or None
+        self.size = chunk_size
+        self.buffer = self._allot(chunk_size)
+        self.current = (self.buffer, 0)
+        self.fields = None
+
+    def _allot(self, size):
+        address = self.machine.here
+        self.machine._push(size)
+        self.machine._allot()
+        return address
+
+    def read(self, stream):
+        """
+        Reads the binary `stream` to the end, yielding the (address, length)
+        of each record. Each record is only valid until the next is read.
+        """
+        memory = self.machine.memory
+        delimiter = self.delimiter
+        start = pos = filled = self.buffer
+        eof = False
+        while True:
+            end = memory.find(delimiter, pos, filled)
+            if end >= 0:
+                self.current = (pos, end - pos)
+                self.fields = None
+                yield self.current
+                pos = end + len(delimiter)
+                continue
+
+            if eof:
+                if pos < filled:
+                    self.current = (pos, filled - pos)
+                    self.fields = None
+                    yield self.current
+                return
+
+            # Keep the start of the next record, and read more after it,
+            # into a bigger buffer if the record fills the one there is.
+            remainder = filled - pos
+            if remainder == self.size:
+                self.size *= 2
+                self.buffer = self._allot(self.size)
+            start = self.buffer
+            memory[start:start + remainder] = memory[pos:filled]
+            pos, filled = start, start + remainder
+
+            view = memoryview(memory)[filled:start + self.size]
+            read = stream.readinto(view)
+            del view  # so that the data space can be resized again
+            if read:
+                filled += read
+            else:
+                eof = True
+
+    def _split(self):
+        """ Returns the (start, end) of each field of the current record. """
+        if self.fields is None:
+            address, length = self.current
+            end = address + length
+            memory = self.machine.memory
+            if self.field_separator is None:
+                self.fields = [match.span()
+                               for match in _FIELD.finditer(memory, address, end)]
+            else:
+                self.fields = []
+                separator = self.field_separator
+                while True:
+                    found = memory.find(separator, address, end)
+                    if found < 0:
+                        self.fields.append((address, end))
+                        break
+                    self.fields.append((address, found))
+                    address = found + len(separator)
+        return self.fields
+
+    @native_word('( -- addr len )', name='RECORD')
+    def record(self):
+        return self.current
+
+    @native_word('( n -- addr len )', name='FIELD')
+    def field(self, n):
+        """ The n-th field of the record, counting from 1; empty if none. """
+        fields = self._split()
+        if 1 <= n <= len(fields):
+            start, end = fields[n - 1]
+            return start, end - start
+        address, length = self.current
+        return address + length, 0
+
+    @native_word('( -- n )', name='#FIELDS')
+    def field_count(self):
+        return len(self._split())
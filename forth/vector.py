@@ -0,0 +1,209 @@
+# coding= utf-8
+"""
+Batched execution of Forth words over NumPy arrays, as used by
+:meth:`forth.Machine.map_word`.
+
+Rather than dispatching a word once per input row, the vectorized path carries
+a whole column (a NumPy array) in each stack slot and runs the word's tokens
+once: numbers broadcast, stack-methods with a vector form are applied
+elementwise, and an IF/ELSE/THEN runs both of its branches before merging them
+with a masked :func:`numpy.where`. Words that use anything else (loops, the
+return stack, output, ...) fall back to the plain scalar path, one row at a
+time, and so does a word whose integer results may have overflowed int64:
+cells are unbounded on the scalar path, as everywhere else. So does a word
+that divides by zero in a row that takes the division, for the scalar path
+to report it.
+"""
+from __future__ import unicode_literals
+
+import numbers
+
+import numpy
+
+from forth.machine import ForthError
+
+
+# Integer results at least this big may have wrapped around, as int64
+# arithmetic does silently; anything under it is exact.
+INT_LIMIT = 2.0 ** 62
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+class Unvectorizable(Exception): pass
+
+
+def map_word(machine, name, columns):
+    method = machine.find(name)
+    if method is None:
+        raise ForthError('undefined word: %s' % name)
+
+    columns = [numpy.asarray(column) for column in columns]
+    sizes = set(len(column) for column in columns)
+    if len(sizes) > 1:
+        raise ForthError('columns differ in length')
+    size = sizes.pop() if sizes else 0
+
+    try:
+        stack = list(columns)
+        # Both sides of a branch are worked out for every row, so the rows
+        # that don't take a side may divide by zero, harmlessly.
+        with numpy.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            run_vectorized(method, stack)
+        return [numpy.broadcast_to(cell, (size,)).copy() for cell in stack]
+    except Unvectorizable:
+        return run_scalar(machine, method, columns, size)
+
+
+def run_scalar(machine, method, columns, size):
+    """
+    The fallback: runs `method` on the machine's own stack once per row,
+    returning the results as columns again.
+    """
+    rows = list(zip(*[column.tolist() for column in columns]))
+    if not columns:
+        rows = [()] * size
+
+    saved_stack = machine.data_stack
+    results = []
+    try:
+        for row in rows:
+            machine.data_stack = list(row)
+            method()
+            if results and len(machine.data_stack) != len(results[0]):
+                raise ForthError('stack depth differs between rows')
+            results.append(machine.data_stack)
+    finally:
+        machine.data_stack = saved_stack
+
+    if not results:
+        return []
+    return [_column(cells) for cells in zip(*results)]
+
+
+def _column(cells):
+    """
+    Makes an array of a column of results: of Python ints, so as to keep
+    them exact, if any are too big for int64.
+    """
+    if any(isinstance(cell, numbers.Integral) and not INT64_MIN <= cell <= INT64_MAX
+           for cell in cells):
+        return numpy.array(cells, dtype=object)
+    return numpy.array(cells)
+
+
+def run_vectorized(method, stack, live=None):
+    """
+    Runs a single word over `stack`, whose cells may be arrays or plain
+    numbers. Raises :exc:`Unvectorizable` if the word can't be run this way.
+    `live` masks the rows whose results count, inside a branch (None for
+    all of them).
+    """
+    tokens = getattr(method, 'tokens', None)
+    if tokens is not None:
+        interpret(tokens, stack, live)
+        return
+
+    func = getattr(method, 'vector', None)
+    if func is None:
+        raise Unvectorizable(method)
+
+    effect = getattr(method, 'stack_effect', None)
+    if effect is not None:
+        # A native word: arguments in stack order, and a known result count.
+        num_args, num_results = len(effect[0]), len(effect[1])
+        if len(stack) < num_args:
+            raise ForthError('stack underflow')
+        args = stack[len(stack) - num_args:]
+        del stack[len(stack) - num_args:]
+        ret = _apply(func, args, live)
+        if num_results == 1:
+            stack.append(ret)
+        elif num_results:
+            stack.extend(ret)
+        return
+
+    num_args = func.__code__.co_argcount
+    if len(stack) < num_args:
+        raise ForthError('stack underflow')
+    ret = _apply(func, [stack.pop() for x in range(num_args)], live)
+    if ret is None:
+        return
+    if isinstance(ret, numpy.ndarray) or numpy.isscalar(ret):
+        stack.append(ret)
+    else:
+        stack.extend(ret)
+
+
+def _apply(func, args, live=None):
+    """
+    Applies a vector function, raising :exc:`Unvectorizable` if any of its
+    integer results may have overflowed: worked out again in floating point,
+    a (finite) result is too big for int64 to be sure of. So it does, too,
+    if a function that divides would divide by zero in a `live` row.
+    """
+    if getattr(func, 'divides', False):
+        zero = numpy.asarray(args[-1]) == 0
+        if live is not None:
+            zero = zero & live
+        if zero.any():
+            raise Unvectorizable(func)
+
+    try:
+        ret = func(*args)
+    except OverflowError:  # a number too big for int64 to start with
+        raise Unvectorizable(func)
+
+    results = ret if isinstance(ret, tuple) else (ret,)
+    if not any(_new_integers(result, args) for result in results):
+        return ret
+    floats = func(*[numpy.asarray(arg, dtype=float) for arg in args])
+    for result, approximate in zip(results, floats if isinstance(ret, tuple) else (floats,)):
+        if _new_integers(result, args):
+            approximate = numpy.abs(approximate)
+            if (numpy.isfinite(approximate) & (approximate >= INT_LIMIT)).any():
+                raise Unvectorizable(func)
+    return ret
+
+
+def _new_integers(result, args):
+    """ Whether `result` is a fixed-size integer array worked out from `args`. """
+    return (isinstance(result, numpy.ndarray) and result.dtype.kind in 'iu' and
+            not any(result is arg for arg in args))
+
+
+def interpret(tokens, stack, live=None):
+    for kind, token in tokens:
+        if kind == 'NUMBER':
+            stack.append(token)
+        elif kind == 'CALL':
+            run_vectorized(token, stack, live)
+        elif kind == 'BRANCH':
+            interpret_branch(token, stack, live)
+        else:
+            raise Unvectorizable(kind)
+
+
+def interpret_branch(token, stack, live=None):
+    true_tokens, false_tokens = token
+    if not stack:
+        raise ForthError('stack underflow')
+    mask = numpy.asarray(stack.pop()) != 0
+
+    # A uniform condition needs only one of the branches.
+    if mask.all():
+        interpret(true_tokens, stack, live)
+        return
+    if not mask.any():
+        interpret(false_tokens, stack, live)
+        return
+
+    true_stack = list(stack)
+    false_stack = list(stack)
+    interpret(true_tokens, true_stack, mask if live is None else live & mask)
+    interpret(false_tokens, false_stack, ~mask if live is None else live & ~mask)
+    if len(true_stack) != len(false_stack):
+        raise Unvectorizable('unbalanced branch')
+
+    stack[:] = [t if t is f else numpy.where(mask, t, f)
+                for t, f in zip(true_stack, false_stack)]
@@ -0,0 +1,53 @@
+# coding= utf-8
+"""
+Optional wordsets: groups of built-in words that a :class:`forth.Machine`
+only binds -- and Python only imports -- the first time one of their words
+is looked up (see :meth:`Machine.find`), so that `import forth` and making a
+new machine don't pay for words that are never used.
+
+Each wordset is a module here, with its words as functions of the machine
+marked with `@_word`, as on the machine itself, and/or a list of NATIVES.
+So that they can be looked for without importing anything, the names of a
+wordset's words are also listed in :data:`WORDSETS`.
+"""
+from __future__ import unicode_literals
+
+import importlib
+
+WORDSETS = {
+    'doubles': 'D+ D- DNEGATE M* UM* UM/MOD SM/REM FM/MOD */ */MOD',
+    'floating': 'F+ F- F* F/ FSQRT FDUP FDROP FSWAP FOVER FDEPTH F. S>F F>S '
+                'FLOATS FLOAT+ F@ F! F, FVARIABLE FSUM FDOT FSCALE',
+    'search': 'FORTH-WORDLIST WORDLIST VOCABULARY FORTH ALSO PREVIOUS ONLY '
+              'DEFINITIONS GET-CURRENT SET-CURRENT GET-ORDER SET-ORDER FIND '
+              'SEARCH-WORDLIST',
+    'strings': 'FILL ERASE MOVE CMOVE CMOVE> COMPARE SEARCH',
+}
+
+# The wordset each of those words is in.
+LAZY_WORDS = dict((word, wordset) for wordset, words in WORDSETS.items()
+                  for word in words.split())
+
+_loaded = {}
+
+
+def words_of(wordset):
+    """
+    Returns the words of a wordset as a {word: function} dict, importing its
+    module the first time.
+    """
+    try:
+        return _loaded[wordset]
+    except KeyError:
+        pass
+
+    from forth import native
+    module = importlib.import_module('forth.wordsets.' + wordset)
+    words = {}
+    for member in vars(module).values():
+        for word in getattr(member, 'words', ()):
+            words[word] = member
+    for word, effect, func in getattr(module, 'NATIVES', ()):
+        words[word] = native.make_word(func, effect, name=word)
+    _loaded[wordset] = words
+    return words
@@ -0,0 +1,35 @@
+# coding= utf-8
+"""
+The double-cell and mixed-precision arithmetic wordset. With 64-bit cells, a
+double is two cells on the stack, its high cell on top.
+"""
+from __future__ import unicode_literals
+
+from forth.machine import (CELL_MODULUS, _double, _split_double, _floored_divmod,
+                           _symmetric_divmod, _unsigned_divmod)
+
+# The words, as (name, stack effect, function of the inputs): see
+# :func:`forth.native.make_word`.
+NATIVES = [
+    ('D+', '( d1.lo d1.hi d2.lo d2.hi -- d3.lo d3.hi )',
+     lambda a, b, c, d: _split_double(_double(a, b) + _double(c, d))),
+    ('D-', '( d1.lo d1.hi d2.lo d2.hi -- d3.lo d3.hi )',
+     lambda a, b, c, d: _split_double(_double(a, b) - _double(c, d))),
+    ('DNEGATE', '( d1.lo d1.hi -- d2.lo d2.hi )',
+     lambda a, b: _split_double(-_double(a, b))),
+    ('M*', '( n1 n2 -- d.lo d.hi )',
+     lambda a, b: _split_double(a * b)),
+    ('UM*', '( u1 u2 -- ud.lo ud.hi )',
+     lambda a, b: _split_double((a % CELL_MODULUS) * (b % CELL_MODULUS))),
+    ('UM/MOD', '( ud.lo ud.hi u1 -- u2 u3 )',
+     lambda a, b, c: _unsigned_divmod(_double(a, b) % CELL_MODULUS ** 2,
+                                      c % CELL_MODULUS)),
+    ('SM/REM', '( d.lo d.hi n1 -- n2 n3 )',
+     lambda a, b, c: _symmetric_divmod(_double(a, b), c)),
+    ('FM/MOD', '( d.lo d.hi n1 -- n2 n3 )',
+     lambda a, b, c: _floored_divmod(_double(a, b), c)),
+    ('*/', '( n1 n2 n3 -- n4 )',
+     lambda a, b, c: _floored_divmod(a * b, c)[1]),
+    ('*/MOD', '( n1 n2 n3 -- n4 n5 )',
+     lambda a, b, c: _floored_divmod(a * b, c)),
+]
@@ -0,0 +1,191 @@
+# coding= utf-8
+"""
+The floating-point wordset: arithmetic on the float stack, float cells in
+the data space (F@ F! F, FVARIABLE), and the bulk words FSUM, FDOT and
+FSCALE, which work on whole arrays of float cells at once.
+
+Floats are IEEE doubles, on a stack of their own (`machine.float_stack`);
+a float cell is the same size as a cell. Float literals, such as 1.5E0, are
+read by the machine itself.
+"""
+from __future__ import unicode_literals
+
+import math
+import operator
+import struct
+
+from forth.errors import ForthError
+from forth.machine import _word, FLOAT, FLOAT_SIZE
+
+
+def _float_pop(self):
+    if self.float_stack:
+        return self.float_stack.pop()
+    else:
+        raise ForthError('float stack underflow')
+
+
+def _float_pop_two(self):
+    stack = self.float_stack
+    if len(stack) < 2:
+        raise ForthError('float stack underflow')
+    b = stack.pop()
+    return stack.pop(), b
+
+
+@_word('F+')
+def _float_add(self):
+    a, b = _float_pop_two(self)
+    self.float_stack.append(a + b)
+
+
+@_word('F-')
+def _float_subtract(self):
+    a, b = _float_pop_two(self)
+    self.float_stack.append(a - b)
+
+
+@_word('F*')
+def _float_multiply(self):
+    a, b = _float_pop_two(self)
+    self.float_stack.append(a * b)
+
+
+@_word('F/')
+def _float_divide(self):
+    a, b = _float_pop_two(self)
+    if not b:
+        raise ForthError('division by zero')
+    self.float_stack.append(a / b)
+
+
+@_word('FSQRT')
+def _float_sqrt(self):
+    value = _float_pop(self)
+    if value < 0:
+        raise ForthError('invalid float operation')
+    self.float_stack.append(math.sqrt(value))
+
+
+@_word('FDUP')
+def _float_dup(self):
+    value = _float_pop(self)
+    self.float_stack.extend((value, value))
+
+
+@_word('FDROP')
+def _float_drop(self):
+    _float_pop(self)
+
+
+@_word('FSWAP')
+def _float_swap(self):
+    a, b = _float_pop_two(self)
+    self.float_stack.extend((b, a))
+
+
+@_word('FOVER')
+def _float_over(self):
+    a, b = _float_pop_two(self)
+    self.float_stack.extend((a, b, a))
+
+
+@_word('FDEPTH')
+def _float_depth(self):
+    self._push(len(self.float_stack))
+
+
+@_word('F.')
+def _float_print(self):
+    return repr(_float_pop(self)) + ' '
+
+
+@_word('S>F')
+def _int_to_float(self):
+    self.float_stack.append(self._pop())
+
+
+@_word('F>S')
+def _float_to_int(self):
+    value = _float_pop(self)
+    if math.isinf(value) or math.isnan(value):
+        raise ForthError('invalid float operation')
+    self._push(int(value))
+
+
+@_word('FLOATS')
+def _floats(self):
+    self._push(self._pop() * FLOAT_SIZE)
+
+
+@_word('FLOAT+')
+def _float_plus(self):
+    self._push(self._pop() + FLOAT_SIZE)
+
+
+@_word('F@')
+def _float_fetch(self):
+    address = self._pop()
+    self._check_memory(address, FLOAT_SIZE)
+    self.float_stack.append(FLOAT.unpack_from(self.memory, address)[0])
+
+
+@_word('F!')
+def _float_store(self):
+    address = self._pop()
+    self._check_memory(address, FLOAT_SIZE)
+    FLOAT.pack_into(self.memory, address, _float_pop(self))
+
+
+@_word('F,')
+def _float_comma(self):
+    self._push(self.here)
+    self._push(FLOAT_SIZE)
+    self._allot()
+    _float_store(self)
+
+
+@_word('FVARIABLE')
+def _float_variable(self):
+    self._create()
+    self._push(FLOAT_SIZE)
+    self._allot()
+
+
+def _floats_at(self, address, count):
+    """
+    Unpacks the `count` float cells from `address` in one go, straight
+    from the data space.
+    """
+    if count <= 0:
+        return ()
+    self._check_memory(address, count * FLOAT_SIZE)
+    return struct.unpack_from('<%dd' % count, self.memory, address)
+
+
+@_word('FSUM')
+def _float_sum(self):
+    """ ( addr n -- ) ( F: -- r ) Sums the n float cells from addr. """
+    count = self._pop()
+    self.float_stack.append(math.fsum(_floats_at(self, self._pop(), count)))
+
+
+@_word('FDOT')
+def _float_dot(self):
+    """ ( addr1 addr2 n -- ) ( F: -- r ) The dot product of two float arrays. """
+    count = self._pop()
+    b = _floats_at(self, self._pop(), count)
+    a = _floats_at(self, self._pop(), count)
+    self.float_stack.append(math.fsum(map(operator.mul, a, b)))
+
+
+@_word('FSCALE')
+def _float_scale(self):
+    """ ( addr n -- ) ( F: r -- ) Multiplies the n float cells from addr by r. """
+    count = self._pop()
+    address = self._pop()
+    factor = _float_pop(self)
+    values = _floats_at(self, address, count)
+    if values:
+        struct.pack_into('<%dd' % count, self.memory, address,
+                         *[value * factor for value in values])
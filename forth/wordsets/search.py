@@ -0,0 +1,139 @@
+# coding= utf-8
+"""
+The search-order wordset: wordlists, and the order they're searched in,
+so that libraries can each have words of the same names (see
+:meth:`Machine.set_order`). Wordlists are known by their ids, FORTH-WORDLIST
+(0, with the built-in words in it) being the first.
+"""
+from __future__ import unicode_literals
+
+from forth.errors import ForthError
+from forth.machine import _word, FORTH_WORDLIST
+
+
+def _found(self, word):
+    """ Pushes what FIND and SEARCH-WORDLIST give for `word`. """
+    if word is None:
+        self._push(0)
+    else:
+        self._push_all((word, 1 if getattr(word, 'is_compile_word', False) else -1))
+
+
+def _replace_first(self, wordlist):
+    order = list(self.search_order) or [wordlist]
+    order[0] = wordlist
+    self.set_order(order)
+
+
+@_word('FORTH-WORDLIST')
+def _forth_wordlist(self):
+    self._push(FORTH_WORDLIST)
+
+
+@_word('WORDLIST')
+def _wordlist(self):
+    """ ( -- wid ) Makes a new, empty wordlist. """
+    self._push(self.wordlist())
+
+
+@_word('VOCABULARY')
+def _vocabulary(self):
+    """
+    ( "name" -- ) Makes a new wordlist, and a word that puts it first in
+    the search order, in place of whatever was.
+    """
+    name = self._parse_name()
+    wordlist = self.wordlist()
+    self._define(name, lambda self: _replace_first(self, wordlist))
+
+
+@_word('FORTH')
+def _forth(self):
+    _replace_first(self, FORTH_WORDLIST)
+
+
+@_word('ALSO')
+def _also(self):
+    """ ( -- ) Duplicates the first wordlist of the search order. """
+    if not self.search_order:
+        raise ForthError('search order underflow')
+    self.set_order(self.search_order[:1] + self.search_order)
+
+
+@_word('PREVIOUS')
+def _previous(self):
+    """ ( -- ) Takes the first wordlist off the search order. """
+    if len(self.search_order) < 2:
+        raise ForthError('search order underflow')
+    self.set_order(self.search_order[1:])
+
+
+@_word('ONLY')
+def _only(self):
+    """ ( -- ) Searches FORTH-WORDLIST only. """
+    self.set_order([FORTH_WORDLIST])
+
+
+@_word('DEFINITIONS')
+def _definitions(self):
+    """ ( -- ) Makes new definitions go into the first wordlist searched. """
+    if not self.search_order:
+        raise ForthError('search order underflow')
+    self.set_current(self.search_order[0])
+
+
+@_word('GET-CURRENT')
+def _get_current(self):
+    self._push(self.current)
+
+
+@_word('SET-CURRENT')
+def _set_current(self):
+    self.set_current(self._pop())
+
+
+@_word('GET-ORDER')
+def _get_order(self):
+    """ ( -- widn ... wid1 n ) The search order, first searched on top. """
+    self._push_all(reversed(self.search_order))
+    self._push(len(self.search_order))
+
+
+@_word('SET-ORDER')
+def _set_order(self):
+    """ ( widn ... wid1 n -- ) Sets the search order; -1 for ONLY's. """
+    count = self._pop()
+    if count == -1:
+        return _only(self)
+    if count < 0:
+        raise ForthError('invalid search order')
+    self.set_order([self._pop() for x in range(count)])
+
+
+@_word('FIND')
+def _find(self):
+    """
+    ( c-addr -- c-addr 0 | xt 1 | xt -1 ) Looks up the word named by a
+    counted string in the search order: 1 if it's immediate, -1 if not.
+    """
+    address = self._pop()
+    self._check_memory(address, 1)
+    length = self.memory[address]
+    self._check_memory(address + 1, length)
+    name = self.memory[address + 1:address + 1 + length].decode('utf-8', 'replace')
+    word = self.find(name)
+    if word is None:
+        self._push_all((address, 0))
+    else:
+        _found(self, word)
+
+
+@_word('SEARCH-WORDLIST')
+def _search_wordlist(self):
+    """ ( c-addr u wid -- 0 | xt 1 | xt -1 ) Looks up a word in one wordlist. """
+    wordlist = self._pop()
+    length = self._pop()
+    address = self._pop()
+    self._check_memory(address, length)
+    name = self.memory[address:address + length].decode('utf-8', 'replace')
+    _found(self, self.search_wordlist(name, wordlist))
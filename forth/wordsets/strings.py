@@ -0,0 +1,107 @@
+# coding= utf-8
+"""
+The string wordset: filling, moving, comparing and searching blocks of the
+data space, a whole block at a time.
+"""
+from __future__ import unicode_literals
+
+from forth.machine import _word
+
+
+@_word('FILL')
+def _fill(self):
+    char = self._pop()
+    length = self._pop()
+    address = self._pop()
+    self._check_memory(address, length)
+    self.memory[address:address + length] = bytearray((char & 0xFF,)) * length
+
+
+@_word('ERASE')
+def _erase(self):
+    self._push(0)
+    _fill(self)
+
+
+@_word('MOVE')
+def _move(self):
+    length = self._pop()
+    destination = self._pop()
+    source = self._pop()
+    self._check_memory(source, length)
+    self._check_memory(destination, length)
+    # memoryview slice assignment is a memmove: no intermediate copy, and
+    # overlapping ranges come out right.
+    view = memoryview(self.memory)
+    view[destination:destination + length] = view[source:source + length]
+
+
+@_word('CMOVE')
+def _cmove(self):
+    length = self._pop()
+    destination = self._pop()
+    source = self._pop()
+    self._check_memory(source, length)
+    self._check_memory(destination, length)
+
+    if not source < destination < source + length:
+        view = memoryview(self.memory)
+        view[destination:destination + length] = view[source:source + length]
+        return
+
+    # CMOVE copies a character at a time from low addresses up, so an
+    # overlapping copy upwards smears the leading bytes along the range.
+    pattern = self.memory[source:destination]
+    repeats = length // len(pattern) + 1
+    self.memory[destination:destination + length] = (pattern * repeats)[:length]
+
+
+@_word('CMOVE>')
+def _cmove_up(self):
+    length = self._pop()
+    destination = self._pop()
+    source = self._pop()
+    self._check_memory(source, length)
+    self._check_memory(destination, length)
+
+    if not destination < source < destination + length:
+        view = memoryview(self.memory)
+        view[destination:destination + length] = view[source:source + length]
+        return
+
+    # ...and CMOVE> copies from high addresses down, smearing the trailing
+    # bytes instead.
+    pattern = self.memory[destination + length:source + length]
+    repeats = length // len(pattern) + 1
+    self.memory[destination:destination + length] = (pattern * repeats)[-length:]
+
+
+@_word('COMPARE')
+def _compare(self):
+    length2 = self._pop()
+    address2 = self._pop()
+    length1 = self._pop()
+    address1 = self._pop()
+    self._check_memory(address1, length1)
+    self._check_memory(address2, length2)
+
+    first = self.memory[address1:address1 + length1]
+    second = self.memory[address2:address2 + length2]
+    self._push((first > second) - (first < second))
+
+
+@_word('SEARCH')
+def _search(self):
+    length2 = self._pop()
+    address2 = self._pop()
+    length1 = self._pop()
+    address1 = self._pop()
+    self._check_memory(address1, length1)
+    self._check_memory(address2, length2)
+
+    needle = memoryview(self.memory)[address2:address2 + length2]
+    found = self.memory.find(needle, address1, address1 + length1)
+    if found < 0:
+        self._push_all((address1, length1, 0))
+    else:
+        self._push_all((found, length1 - (found - address1), -1))
@@ -1,22 +1,41 @@
 from __future__ import unicode_literals, print_function
+import argparse
 import forth
 import readline
 
+from forth.recording import Recorder
+
+try:
+    input = raw_input
+except NameError:  # Python 3
+    pass
+
 PROMPT = ''
 
-def forth_repl():
+def forth_repl(record=None):
     print('Type "BYE" or input an end of file (Ctrl+D) to quit.')
 
     m = forth.Machine()
+    if record:
+        m.recorder = Recorder(record)
 
-    cmd = raw_input(PROMPT)
-    while cmd.upper() != 'BYE':
-        print(m.eval(cmd))
-        cmd = raw_input(PROMPT)
+    try:
+        cmd = input(PROMPT)
+        while cmd.upper() != 'BYE':
+            print(m.eval(cmd))
+            cmd = input(PROMPT)
+    finally:
+        if m.recorder is not None:
+            m.recorder.close()
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--record', metavar='FILE',
+                        help='log each input, with its timing, to FILE '
+                             '(see forth.recording)')
+    args = parser.parse_args()
     try:
-        forth_repl()
+        forth_repl(args.record)
     except EOFError:
         pass  # perfectly acceptable
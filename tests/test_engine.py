@@ -0,0 +1,212 @@
+# coding= utf-8
+"""
+Tests the flat, resumable execution engine behind Machine.run.
+"""
+from __future__ import unicode_literals
+
+import time
+
+import forth
+from forth import engine
+
+
+PROGRAMS = [
+    '1 2 + .',
+    '. 43',
+    ': STAR 42 EMIT ; STAR STAR',
+    ': STARS 0 DO 42 EMIT LOOP ; 5 STARS',
+    ': JUMP-TWO DO 42 EMIT 2 +LOOP ; 4 0 JUMP-TWO',
+    ': TEST IF 42 ELSE 33 THEN . ; 1 TEST 0 TEST TEST',
+    ': TEST 10 5 2 0 DO DUP 7 > IF LEAVE THEN . LOOP ; TEST',
+    ': TEST 0 BEGIN DUP . 1 + DUP 4 > UNTIL ; TEST',
+    ': TEST 0 BEGIN DUP 4 < WHILE DUP . 1 + REPEAT ; TEST',
+    ': TEST 12 10 DO 22 20 DO 42 EMIT J . I . LOOP LOOP ; TEST',
+    ': TEST 5 0 DO R> . 5 >R LOOP ; TEST',
+    ': CR 10 EMIT ; : STARS 0 DO 42 EMIT LOOP ; : LINES 0 DO 3 STARS CR LOOP ; 2 LINES',
+    ': TEST LEAVE ; TEST',
+    ': UNFINISHED 1 2',
+    'LATE-BINDING : B A 2 ; : A 1 ; B . . : A 3 ; B . .',
+    ': FACT DUP 1 > IF DUP 1 - RECURSE * THEN ; 10 FACT .',
+    ': HALF 2E0 F/ ; : AREA 1.5E0 3E0 F* HALF ; AREA F. 7 S>F F.',
+    ': TEST 42 EMIT DROP ; TEST',
+    ': TEST 3 0 DO 42 EMIT LEAVE LOOP ; TEST',
+    ': TEST 3 0 DO I . 0 IF ELSE 43 EMIT LEAVE THEN LOOP ; TEST',
+    ': TEST 2 0 DO I . LOOP 1 . QUIT 2 . ; TEST 3 .',
+    '4 QUIT 5',
+    'NO-SUCH-WORD',
+]
+
+
+class TestEngine():
+    def test_matches_eval(self):
+        for program in PROGRAMS:
+            reference = forth.Machine()
+            expected = reference.eval(program)
+
+            m = forth.Machine()
+            cont = m.run(program)
+
+            assert cont.done
+            assert cont.output == expected, program
+            assert m.data_stack == reference.data_stack, program
+            assert m.return_stack == reference.return_stack, program
+            assert m.mode is reference.mode
+
+    def test_single_steps_match_eval(self):
+        for program in PROGRAMS:
+            expected = forth.Machine().eval(program)
+
+            m = forth.Machine()
+            cont = m.run(program, budget=1)
+            output = cont.output
+            while not cont.done:
+                output += m.run(cont, budget=1).output
+
+            assert output == expected, program
+
+    def test_budget(self):
+        m = forth.Machine()
+        cont = m.run(': SPIN 0 BEGIN 1 + 0 UNTIL ; SPIN', budget=1000)
+
+        assert not cont.done
+        assert cont.output == ''
+        assert m.data_stack
+
+        counter = m.data_stack[0]
+        m.run(cont, budget=1000)
+        assert not cont.done
+        assert m.data_stack[0] > counter
+
+    def test_execute_within_budget(self):
+        m = forth.Machine()
+        m.eval(': SPIN 0 BEGIN 1 + 0 UNTIL ;')
+        cont = m.run("' SPIN EXECUTE", budget=100)
+
+        assert not cont.done
+        assert cont.steps == 100
+        m.cancel(cont)
+        assert m.run("3 ' DUP EXECUTE * .").output == '9  ok'
+
+    def test_ms(self):
+        m = forth.Machine()
+        started = time.time()
+        cont = m.run('50 MS 42 EMIT', budget=100)
+        assert not cont.done
+        assert 0 < cont.sleep_time() <= 0.05
+        assert m.run(cont).output == '* ok'
+        assert time.time() - started >= 0.05
+
+    def test_zero_budget(self):
+        m = forth.Machine()
+        cont = m.run('1 2 +', budget=0)
+
+        assert not cont.done
+        assert not m.data_stack
+
+        assert m.run(cont).output == ' ok'
+        assert m.data_stack == [3]
+
+    def test_cancel(self):
+        m = forth.Machine()
+        cont = m.run(': SPIN 0 BEGIN 1 + 0 UNTIL ; 42 SPIN', budget=50)
+        m.cancel(cont)
+
+        assert cont.done
+        assert cont.cancelled
+        assert not m.data_stack
+        assert not m.return_stack
+        assert m.run(cont).output == ''
+
+        # The machine itself carries on as normal.
+        assert m.eval('1 2 + .') == '3  ok'
+        assert m.run('SPIN', budget=10).output == ''
+
+    def test_cancel_while_compiling(self):
+        m = forth.Machine()
+        cont = m.run(': HALF 1 2 3', budget=3)
+        m.cancel(cont)
+
+        assert m.mode is forth.IMMEDIATE_MODE
+        assert 'HALF' not in m.words
+
+    def test_error_is_recorded(self):
+        m = forth.Machine()
+        cont = m.run('1 2 NOPE 3')
+
+        assert cont.done
+        assert cont.output == ' ? undefined word: NOPE'
+        assert isinstance(cont.error, forth.ForthError)
+        assert not m.data_stack
+
+    def test_not_interactive(self):
+        m = forth.Machine()
+        assert m.run('1 2 + .', interactive=False).output == '3 '
+
+        cont = m.run('1 NOPE', interactive=False)
+        assert cont.output == ''
+        assert str(cont.error) == 'undefined word: NOPE'
+
+    def test_steps(self):
+        m = forth.Machine()
+        cont = m.run(': SPIN 0 BEGIN 1 + 0 UNTIL ; SPIN', budget=100)
+        assert cont.steps == 100
+        m.run(cont, budget=50)
+        assert cont.steps == 150
+
+    def test_leave_from_called_word(self):
+        m = forth.Machine()
+        cont = m.run(': OUT LEAVE ; : TEST 5 0 DO I . I 2 == IF OUT THEN LOOP ; TEST')
+        assert cont.output == '0 1 2  ok'
+
+    def test_deep_recursion(self):
+        m = forth.Machine()
+        m.eval(': DOWN DUP IF 1 - RECURSE THEN ;')
+        assert m.run('5000 DOWN .').output == '0  ok'
+
+    def test_pure(self):
+        m = forth.Machine()
+        m.eval(': FIB ( n -- fib ) DUP 2 < IF ELSE DUP 1 - RECURSE SWAP 2 - RECURSE + THEN ; PURE')
+        assert m.run('400 FIB 1000000 MOD .').output == '19675  ok'
+        assert m.metrics.memo_misses == 401
+        assert m.run(': TWICE 30 FIB 30 FIB + ; TWICE .').output == '1664080  ok'
+        assert m.metrics.memo_hits == 400
+        assert m.run(": LIAR ( -- n ) 1 2 ; PURE ' LIAR EXECUTE").output == \
+            ' ? stack effect broken: LIAR'
+
+        # A PURE word runs within the budget like any other.
+        m.eval(': SPIN ( -- ) BEGIN 0 UNTIL ; PURE')
+        cont = m.run('SPIN', budget=100)
+        assert not cont.done
+        assert cont.steps == 100
+        m.cancel(cont)
+
+    def test_flatten(self):
+        m = forth.Machine()
+        m.eval(': TEST IF 1 ELSE 2 THEN ;')
+        code = engine.flatten(m.words['TEST'].tokens)
+
+        assert code == [('JUMP_IF_ZERO', 3),
+                        ('NUMBER', 1),
+                        ('JUMP', 4),
+                        ('NUMBER', 2)]
+
+        m.eval(': LOOPY 0 DO I . LOOP ;')
+        code = engine.code_for(m.words['LOOPY'])
+
+        assert code[1] == ('DO', 6)
+        assert code[5] == ('LOOP', 2)
+        assert engine.code_for(m.words['LOOPY']) is code
+
+    def test_flatten_loops(self):
+        m = forth.Machine()
+        m.eval(': UNTILY BEGIN 1 UNTIL ;')
+
+        assert engine.code_for(m.words['UNTILY']) == [('NUMBER', 1),
+                                                      ('JUMP_IF_ZERO', 0)]
+
+        m.eval(': WHILEY BEGIN 1 WHILE 2 REPEAT ;')
+
+        assert engine.code_for(m.words['WHILEY']) == [('JUMP', 2),
+                                                      ('NUMBER', 2),
+                                                      ('NUMBER', 1),
+                                                      ('JUMP_IF_NONZERO', 1)]
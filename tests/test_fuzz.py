@@ -0,0 +1,52 @@
+# coding= utf-8
+"""
+Tests the differential fuzzing harness, and runs it for a while.
+"""
+from __future__ import unicode_literals
+
+import random
+
+from forth import fuzz
+
+
+def broken(machine, program):
+    """ An engine that gets every program with a SWAP in it wrong. """
+    if 'SWAP' in program.split():
+        return ('broken',)
+    return fuzz.flat(machine, program)
+
+
+class TestFuzz():
+    def test_engines_agree(self):
+        assert list(fuzz.fuzz(300, seed=0)) == []
+
+    def test_generator(self):
+        programs = [fuzz.Generator(random.Random(5)).program() for x in range(2)]
+        assert programs[0] == programs[1]
+        assert programs[0].startswith(': W0 ')
+
+        words = fuzz.vocabulary()
+        assert '+' in words and 'F+' in words
+        assert ':' not in words and 'IF' not in words
+
+    def test_compare(self):
+        assert fuzz.compare(': TEST 3 0 DO I . LOOP ; TEST') == []
+        assert fuzz.compare(': TEST BEGIN 0 UNTIL ; TEST') is None
+
+        [(name, expected, got)] = fuzz.compare('1 2 SWAP', [('broken', broken, {})])
+        assert name == 'broken'
+        assert expected == (' ok', (2, 1), (), ())
+        assert got == ('broken',)
+
+    def test_minimize(self):
+        assert fuzz.minimize('1 2 3 FOO 4 5', lambda text: 'FOO' in text) == 'FOO'
+        program = ': W0 1 IF 2 3 0 DO 4 LOOP THEN 5 ; W0 SWAP W0'
+        assert fuzz.minimize(program, lambda text: bool(fuzz.compare(
+            text, [('broken', broken, {})]))) == 'SWAP'
+
+    def test_finds_broken_engine(self):
+        found = list(fuzz.fuzz(100, seed=0, engines=[('broken', broken, {})]))
+        assert found
+        for program, small, failures in found:
+            assert small == 'SWAP'
+            assert failures[0][0] == 'broken'
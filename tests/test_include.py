@@ -0,0 +1,121 @@
+# coding= utf-8
+"""
+Tests INCLUDE, REQUIRE and the cache of compiled source files behind them.
+"""
+from __future__ import unicode_literals
+
+import os
+
+import pytest
+
+import forth
+
+
+def include_cached(path):
+    """ Includes `path` on a new machine, failing if it compiles anything. """
+    def tokenize_one(word):
+        raise AssertionError('compiled %s' % word)
+    m = forth.Machine()
+    m.tokenize_one = tokenize_one
+    m.include(str(path))
+    del m.tokenize_one
+    return m
+
+
+class TestInclude():
+    def test_include(self, tmpdir):
+        lib = tmpdir.join('lib.fs')
+        lib.write(': SQUARE ( n -- n*n ) DUP * ;\n: CUBE DUP SQUARE * ;\n')
+
+        m = forth.Machine()
+        assert m.eval('INCLUDE %s 3 CUBE .' % lib) == '27  ok'
+        assert m.words['SQUARE'].stack_effect == (('n',), ('n*n',))
+        assert tmpdir.join('__forthcache__').listdir()
+
+    def test_cache(self, tmpdir):
+        lib = tmpdir.join('lib.fs')
+        lib.write(': SQUARE DUP * ; : CUBE DUP SQUARE * ; : HALF 0.5E0 F* ;\n'
+                  ': FIB ( n -- fib ) DUP 2 < IF ELSE DUP 1 - RECURSE SWAP 2 - RECURSE + THEN ;\n'
+                  'PURE LATE-BINDING : SUMS 0 SWAP 0 DO I + LOOP ;')
+        forth.Machine().include(str(lib))
+
+        m = include_cached(lib)
+        assert m.run('3 CUBE . 30 FIB . 4 SUMS .').output == '27 832040 6  ok'
+        assert m.eval('3E0 HALF F.') == '1.5  ok'
+        assert m.metrics.memo_misses == 31
+        assert m.late_binding
+
+    def test_changed_file(self, tmpdir):
+        lib = tmpdir.join('lib.fs')
+        lib.write(': ANSWER 42 ;')
+        forth.Machine().include(str(lib))
+
+        lib.write(': ANSWER 43 ;')
+        assert forth.Machine().eval('INCLUDE %s ANSWER .' % lib) == '43  ok'
+
+    def test_changed_dependency(self, tmpdir):
+        base = tmpdir.join('base.fs')
+        base.write(': BASE 1 ;')
+        top = tmpdir.join('top.fs')
+        top.write('REQUIRE base.fs : TOP BASE 10 * ;')
+        forth.Machine().include(str(top))
+
+        m = include_cached(top)
+        assert m.eval('TOP .') == '10  ok'
+
+        base.write(': BASE 2 ;')
+        assert forth.Machine().eval('INCLUDE %s TOP .' % top) == '20  ok'
+
+        # TOP was compiled against a BASE this machine doesn't have.
+        m = forth.Machine()
+        m.eval(': BASE 3 ;')
+        m.included.add(str(base))
+        assert m.eval('INCLUDE %s TOP .' % top) == '30  ok'
+
+    def test_require(self, tmpdir):
+        lib = tmpdir.join('lib.fs')
+        lib.write('42 EMIT')
+
+        m = forth.Machine()
+        assert m.eval('REQUIRE %s REQUIRE %s' % (lib, lib)) == '* ok'
+        assert m.eval('INCLUDE %s' % lib) == '* ok'
+
+    def test_uncacheable(self, tmpdir):
+        lib = tmpdir.join('lib.fs')
+        lib.write('VARIABLE COUNTER : BUMP 1 COUNTER +! ;')
+
+        m = forth.Machine()
+        m.include(str(lib))
+        assert not tmpdir.join('__forthcache__').check()
+        assert m.eval('BUMP BUMP COUNTER @ .') == '2  ok'
+
+    def test_cache_dir(self, tmpdir):
+        lib = tmpdir.join('lib.fs')
+        lib.write(': ANSWER 42 ;')
+
+        m = forth.Machine()
+        m.cache_dir = str(tmpdir.join('elsewhere'))
+        m.include(str(lib))
+        assert tmpdir.join('elsewhere').listdir()
+
+        m = forth.Machine()
+        m.cache_dir = False
+        m.include(str(tmpdir.join('lib.fs')))
+        assert not tmpdir.join('__forthcache__').check()
+
+    def test_missing_file(self, tmpdir):
+        m = forth.Machine()
+        assert 'cannot open file' in m.eval('INCLUDE %s' % tmpdir.join('nope.fs'))
+        with pytest.raises(forth.ForthError):
+            m.include(os.path.join(str(tmpdir), 'nope.fs'))
+
+        # Nor does it count as included for REQUIRE, once the file is there.
+        tmpdir.join('nope.fs').write('42 EMIT')
+        assert m.eval('REQUIRE %s' % tmpdir.join('nope.fs')) == '* ok'
+
+        # And nor does one that fails to load.
+        broken = tmpdir.join('broken.fs')
+        broken.write('NOPE : HALF 2 / ;')
+        assert 'undefined word: NOPE' in m.eval('REQUIRE %s' % broken)
+        broken.write(': HALF 2 / ;')
+        assert m.eval('REQUIRE %s 8 HALF .' % broken) == '4  ok'
@@ -0,0 +1,94 @@
+# coding= utf-8
+"""
+Tests the `python -m forth` script runner.
+"""
+from __future__ import unicode_literals
+
+import os
+import subprocess
+import sys
+
+import forth
+from forth.__main__ import Runner, SLICE
+
+
+def run_forth(args, stdin=''):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.path.dirname(os.path.dirname(os.path.abspath(forth.__file__)))
+    process = subprocess.Popen([sys.executable, '-m', 'forth'] + args, env=env,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    out, err = process.communicate(stdin.encode('utf-8'))
+    return process.returncode, out.decode('utf-8'), err.decode('utf-8')
+
+
+class TestMain():
+    def test_stdin(self):
+        assert run_forth([], ': SQ DUP * ;\n5 SQ .\n6 SQ .') == (0, '25 36 ', '')
+
+    def test_files(self, tmpdir):
+        lib = tmpdir.join('lib.fs')
+        lib.write(': SQ ( n -- n*n )\n  DUP * ;\n')
+        main = tmpdir.join('main.fs')
+        main.write('7 SQ .')
+
+        assert run_forth([str(lib), str(main)]) == (0, '49 ', '')
+        assert run_forth(['-p', str(lib), '-e', '3 SQ .']) == (0, '9 ', '')
+
+    def test_output_per_slice(self):
+        writes = []
+
+        class Out(object):
+            def write(self, data):
+                writes.append(data)
+
+            def flush(self):
+                pass
+
+        m = forth.Machine()
+        m.eval(': WAIT 0 DO LOOP ;')
+        Runner(m, Out()).feed('42 EMIT %d WAIT 43 EMIT' % SLICE)
+        assert writes == [b'*', b'+']
+
+    def test_error(self):
+        status, out, err = run_forth([], '1 .\n2 NOPE .\n3 .')
+        assert status == 1
+        assert out == '1 '
+        assert err == '-:2: undefined word: NOPE\n'
+
+        status, out, err = run_forth([], ': UNFINISHED 1')
+        assert status == 1
+        assert 'unfinished definition' in err
+
+    def test_budget(self):
+        status, out, err = run_forth(['--budget', '1000'],
+                                     '42 EMIT : SPIN BEGIN 0 UNTIL ; SPIN')
+        assert status == 3
+        assert out == '*'
+        assert 'budget' in err
+
+        assert run_forth(['--budget', '1000', '-e', '1 .'])[0] == 0
+
+    def test_each(self):
+        data = 'alpha beta\ngamma\n\ndelta epsilon zeta'
+        status, out, err = run_forth(['-e', '0 : COUNT-FIELDS DROP DROP #FIELDS + ;',
+                                      '--each', 'COUNT-FIELDS', '--end', '.'], data)
+        assert (status, out, err) == (0, '6 ', '')
+
+        status, out, err = run_forth(['-F', ':', '-e', ': LEN 2 FIELD . DROP DROP DROP ;',
+                                      '--each', 'LEN'], 'a:bb:c\nd:eee')
+        assert (status, out) == (0, '2 3 ')
+
+    def test_each_error(self):
+        status, out, err = run_forth(['-e', ': FIRST DROP C@ 120 == IF DROP THEN ;',
+                                      '--each', 'FIRST'], 'a\nb\nx\n')
+        assert status == 1
+        assert err == '-:3: stack underflow\n'
+
+        status, out, err = run_forth(['--each', 'NOPE'], 'a')
+        assert 'undefined word: NOPE' in err
+
+    def test_profile(self):
+        status, out, err = run_forth(['--profile', '-e', '1 .'])
+        assert (status, out) == (0, '1 ')
+        assert 'function calls' in err
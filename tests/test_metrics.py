@@ -0,0 +1,99 @@
+# coding= utf-8
+"""
+Tests the metrics kept on each machine.
+"""
+from __future__ import unicode_literals
+
+import pytest
+
+import forth
+from forth.metrics import Metrics
+
+
+class TestMetrics():
+    def test_counters(self):
+        m = forth.Machine()
+        m.eval(': SQUARE DUP * ;')
+        assert m.run('7 SQUARE .').output == '49  ok'
+
+        metrics = m.metrics.snapshot()
+        assert metrics.evals == 2
+        assert metrics.compiles == 1
+        assert metrics.instructions > 0
+        assert metrics.calls >= 2
+        assert metrics.latency.count == 2
+        assert metrics.data_space_bytes == len(m.memory)
+
+    def test_sliced_run_is_one_eval(self):
+        m = forth.Machine()
+        cont = m.run(': SPIN 100 0 DO LOOP ; SPIN', budget=10)
+        while not cont.done:
+            cont.resume(10)
+        metrics = m.metrics.snapshot()
+        assert metrics.evals == 1
+        assert metrics.instructions == cont.steps
+
+    def test_high_water_marks(self):
+        m = forth.Machine()
+        # Straight-line code is sampled where a slice ends.
+        cont = m.run(': DEEP 1 2 3 4 5 >R >R ; DEEP R> R> 2DROP 2DROP DROP', budget=1)
+        while not cont.done:
+            cont.resume(1)
+        metrics = m.metrics.snapshot()
+        assert metrics.data_stack_max == 5
+        assert metrics.return_stack_max == 2
+        assert m.data_stack == []
+
+        m.eval('1 2 3 4 5 6 7 8')
+        assert m.metrics.snapshot().data_stack_max == 8
+
+    @pytest.mark.parametrize('engine', ['eval', 'run'])
+    def test_high_water_marks_in_loops(self, engine):
+        # Loops are sampled each time around, even if the stacks drain again.
+        m = forth.Machine()
+        m.eval(': P 0 DO I LOOP ; : D 0 DO DROP LOOP ;')
+        m.eval(': RS 0 BEGIN 1 >R 1 + DUP 50 == UNTIL DROP '
+               '50 BEGIN DUP WHILE R> DROP 1 - REPEAT DROP ;')
+        getattr(m, engine)('1000 P 1000 D RS')
+        metrics = m.metrics.snapshot()
+        assert metrics.data_stack_max >= 999
+        assert metrics.return_stack_max >= 49
+        assert m.data_stack == []
+
+    def test_cache_hits(self, tmpdir):
+        m = forth.Machine()
+        m.eval(': SQUARE ( n -- n*n ) DUP * ; PURE 3 SQUARE 3 SQUARE 4 SQUARE')
+        metrics = m.metrics.snapshot()
+        assert (metrics.memo_hits, metrics.memo_misses) == (1, 2)
+
+        lib = tmpdir.join('lib.fs')
+        lib.write(': ANSWER 42 ;')
+        m.include(str(lib))
+        m = forth.Machine()
+        m.include(str(lib))
+        metrics = m.metrics.snapshot()
+        assert (metrics.include_hits, metrics.include_misses) == (1, 0)
+        assert metrics.compiles == 1
+
+    def test_total(self):
+        machines = [forth.Machine() for x in range(3)]
+        for n, m in enumerate(machines):
+            m.eval(' '.join(['1'] * n) + ' : W ;')
+
+        total = Metrics.total(m.metrics for m in machines)
+        assert total.evals == 3
+        assert total.compiles == 3
+        assert total.data_stack_max == 2
+        assert total.data_space_bytes == sum(len(m.memory) for m in machines)
+
+    def test_prometheus(self):
+        m = forth.Machine()
+        m.eval('1 2 +')
+        text = m.metrics.snapshot().prometheus(gauges={'sessions': 1})
+        lines = text.splitlines()
+        assert '# TYPE forth_evals_total counter' in lines
+        assert 'forth_evals_total 1' in lines
+        assert 'forth_data_stack_max 1' in lines
+        assert 'forth_sessions 1' in lines
+        assert 'forth_eval_seconds_bucket{le="+Inf"} 1' in lines
+        assert 'forth_eval_seconds_count 1' in lines
@@ -0,0 +1,107 @@
+# coding= utf-8
+"""
+Tests native words: Python functions added with a declared stack effect.
+"""
+from __future__ import unicode_literals
+
+import math
+
+import pytest
+
+import forth
+from forth import native
+
+
+@forth.native_word('( a b -- hypotenuse )')
+def hypot(a, b):
+    return int(math.hypot(a, b))
+
+
+@forth.native_word('( addr -- )', name='PEEK', machine=True, output=True)
+def peek_byte(machine, write, address):
+    write('<%d>' % machine.memory[address])
+
+
+class Vocabulary(object):
+    hypot = staticmethod(hypot)
+    peek_byte = staticmethod(peek_byte)
+
+    def not_native(self):
+        pass
+
+
+class TestNative():
+    def test_parse_effect(self):
+        assert native.parse_effect('( n1 n2 -- n3 )') == (('n1', 'n2'), ('n3',))
+        assert native.parse_effect('( -- )') == ((), ())
+        assert native.parse_effect('x --') == (('x',), ())
+
+        with pytest.raises(forth.ForthError):
+            native.parse_effect('( a b )')
+        with pytest.raises(forth.ForthError):
+            native.parse_effect('( a -- b -- c )')
+
+    def test_argument_order(self):
+        m = forth.Machine()
+        m.add_native('PAIR', lambda a, b: a * 10 + b, '( a b -- ab )')
+        assert m.eval('1 2 PAIR .') == '12  ok'
+
+    def test_result_counts(self):
+        m = forth.Machine()
+        m.add_native('NOTHING', lambda a: None, '( a -- )')
+        m.add_native('ONE', lambda: (1, 2), '( -- pair )')
+        m.add_native('THREE', lambda: (1, 2, 3), '( -- a b c )')
+
+        m.eval('5 NOTHING ONE THREE')
+        assert m.data_stack == [(1, 2), 1, 2, 3]
+
+    def test_underflow(self):
+        m = forth.Machine()
+        m.add_native('PAIR', lambda a, b: a * 10 + b, '( a b -- ab )')
+
+        assert m.eval('1 PAIR') == ' ? stack underflow'
+        assert m.data_stack == []
+
+    def test_machine_and_output(self):
+        m = forth.Machine()
+        m.add_native('PEEK', peek_byte)
+        assert m.eval('HERE 42 C, PEEK') == '<42> ok'
+
+    def test_float_results(self):
+        m = forth.Machine()
+        m.add_native('HALF', lambda n: n / 2.0, '( n -- half )')
+        assert m.eval('11 HALF .') == '5  ok'
+
+        m.add_native('FHALF', lambda machine, n: machine.float_stack.append(n / 2.0),
+                     '( n -- )', machine=True)
+        assert m.eval('11 FHALF F.') == '5.5  ok'
+
+    def test_add_vocabulary(self):
+        m = forth.Machine()
+        m.add_vocabulary(Vocabulary)
+
+        assert 'HYPOT' in m.words
+        assert 'PEEK' in m.words
+        assert 'NOT-NATIVE' not in m.words
+        assert m.eval('3 4 HYPOT .') == '5  ok'
+
+        m.add_vocabulary({'peek_byte': peek_byte}, prefix='MY-')
+        assert m.eval('HERE 7 C, MY-PEEK') == '<7> ok'
+
+    def test_add_module(self):
+        m = forth.Machine()
+        m.add_vocabulary(math, {'factorial': '( n -- n! )', 'gcd': '( a b -- n )'},
+                         prefix='M-')
+
+        assert m.eval('5 M-FACTORIAL .') == '120  ok'
+        assert 'M-SQRT' not in m.words
+
+    def test_runs_on_engine(self):
+        m = forth.Machine()
+        m.add_vocabulary(Vocabulary)
+        assert m.run(': TEST 6 8 HYPOT . ; TEST').output == '10  ok'
+
+    def test_core_words_are_native(self):
+        m = forth.Machine()
+        assert m.words['-'].stack_effect == (('n1', 'n2'), ('n3',))
+        assert m.eval('10 3 /MOD . .') == '3 1  ok'
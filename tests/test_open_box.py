@@ -74,7 +74,7 @@ class TestOpenBoxForth():
         assert not m.data_stack
 
     def test_simple_math(self):
-        for oper, expected in { '+': 24, '-': 16, '*': 80, '/': 5, 'MOD': 0 }.iteritems():
+        for oper, expected in { '+': 24, '-': 16, '*': 80, '/': 5, 'MOD': 0 }.items():
             m = forth.Machine()
             ret = m.eval('20 4 ' + oper)
 
@@ -277,8 +277,9 @@ class TestOpenBoxForth():
         ret = m.eval('42 EMIT')
 
         assert ret == ' compiled'
-        assert ':' in m.data_stack
-        assert m.return_stack == [':']
+        assert not m.data_stack
+        assert not m.return_stack
+        assert [marker for marker, code in m.control_stack] == [':']
         assert m.mode is forth.COMPILE_MODE
         assert 'STAR' not in m.words
 
@@ -286,6 +287,7 @@ class TestOpenBoxForth():
         assert ret == ' ok'
         assert m.data_stack == []
         assert not m.return_stack
+        assert not m.control_stack
         assert m.mode is forth.IMMEDIATE_MODE
         assert 'STAR' in m.words
 
@@ -356,7 +358,7 @@ class TestOpenBoxForth():
         m = forth.Machine()
         ret = m.eval(': BLAH')
 
-        m.return_stack.append('OOPSIE')
+        m.control_stack.append(('OOPSIE', []))
         ret = m.eval('LOOP')
 
         assert 'unclosed OOPSIE' in ret
@@ -408,10 +410,37 @@ class TestOpenBoxForth():
         ret = m.eval(': TEST IF ELSE')
 
         assert 'compiled' in ret
-        assert 'IF' in m.return_stack
-        assert 'ELSE' in m.return_stack
-        assert 'IF' in m.data_stack
-        assert 'ELSE' in m.data_stack
+        assert [entry[0] for entry in m.control_stack] == [':', 'ELSE']
+        assert not m.data_stack
+        assert not m.return_stack
+
+    def test_compile_keeps_data_stack(self):
+        m = forth.Machine()
+        ret = m.eval('1 2 : TEST 3 IF 4 ELSE 5 THEN BEGIN 6 WHILE 7 REPEAT')
+
+        assert ret == ' compiled'
+        assert m.data_stack == [1, 2]
+        assert not m.return_stack
+
+        assert m.eval(';') == ' ok'
+        assert m.data_stack == [1, 2]
+        assert not m.control_stack
+
+    def test_error_clears_control_stack(self):
+        m = forth.Machine()
+        assert 'unclosed IF' in m.eval(': TEST IF ;')
+
+        assert not m.control_stack
+        assert m.now_compiling is None
+        assert m.eval('1 2 + .') == '3  ok'
+
+    def test_deep_nesting(self):
+        depth = 200
+        m = forth.Machine()
+        ret = m.eval(': DEEP ' + 'DUP IF ' * depth + '1 +' + ' THEN' * depth + ' ;')
+
+        assert ret == ' ok'
+        assert m.run('0 DEEP . 1 DEEP .').output == '0 2  ok'
 
     def test_if(self):
         m = forth.Machine()
@@ -511,6 +540,17 @@ class TestOpenBoxForth():
 
         assert ret == '0 1 2 3 4  ok'
 
+    def test_until_compiles_natively(self):
+        m = forth.Machine()
+        ret = m.eval(': A BEGIN 1 - DUP 0 <= UNTIL ; : B 2 ; 5 A B . .')
+
+        assert ret == '2 0  ok'
+        assert m.words['A'].tokens == [('UNTIL', [('NUMBER', 1),
+                                                  ('CALL', m.words['-']),
+                                                  ('CALL', m.words['DUP']),
+                                                  ('NUMBER', 0),
+                                                  ('CALL', m.words['<='])])]
+
     def test_invert(self):
         m = forth.Machine()
         ret = m.eval('0 INVERT . 1 INVERT . -1 INVERT .')
@@ -556,3 +596,442 @@ class TestOpenBoxForth():
         ret = m.eval(': TEST 12 10 DO 22 20 DO 42 EMIT J . I . LOOP LOOP ; TEST')
         assert ret == '*10 20 *10 21 *11 20 *11 21  ok'
 
+
+    def test_data_space(self):
+        m = forth.Machine()
+        d = forth.DATA_START
+        assert m.eval('HERE .') == '%d  ok' % d
+        assert m.eval('3 CELLS ALLOT HERE .') == '%d  ok' % (d + 24)
+        assert len(m.memory) == d + 24
+
+        assert m.eval('42 %d ! %d @ .' % (d + 8, d + 8)) == '42  ok'
+        assert m.eval('-5 %d +! %d @ .' % (d + 8, d + 8)) == '37  ok'
+        assert m.eval('300 %d C! %d C@ .' % (d, d)) == '44  ok'
+        assert m.eval('1 CELL+ .') == '9  ok'
+
+        assert 'invalid memory address' in m.eval('%d @' % (d + 24))
+        assert 'invalid memory address' in m.eval('%d @' % (d + 17))
+        assert 'invalid memory address' in m.eval('-1 C@')
+        assert 'invalid memory address' in m.eval('-1000 ALLOT')
+
+    def test_cells_wrap_around(self):
+        m = forth.Machine()
+        m.eval('VARIABLE X')
+
+        assert m.eval('%d X ! X @ .' % (2 ** 63)) == '%d  ok' % -(2 ** 63)
+        assert m.eval('-1 X ! X @ .') == '-1  ok'
+
+    def test_create_variable_comma(self):
+        m = forth.Machine()
+        ret = m.eval('CREATE TABLE 10 , 20 , 7 C, VARIABLE COUNTER')
+
+        assert ret == ' ok'
+        assert m.eval('TABLE @ TABLE CELL+ @ TABLE 2 CELLS + C@ . . .') == '7 20 10  ok'
+        assert m.eval('COUNTER @ . 5 COUNTER ! COUNTER @ .') == '0 5  ok'
+        assert m.eval(': BUMP 1 COUNTER +! ; BUMP BUMP COUNTER @ .') == '7  ok'
+        assert 'no name given' in m.eval('CREATE')
+
+    def test_fill_erase(self):
+        m = forth.Machine()
+        d = forth.DATA_START
+        m.eval('8 ALLOT %d 8 65 FILL' % d)
+
+        assert m.memory[d:] == bytearray(b'AAAAAAAA')
+
+        m.eval('%d 3 ERASE' % (d + 2))
+        assert m.memory[d:] == bytearray(b'AA\0\0\0AAA')
+
+        assert 'invalid memory address' in m.eval('%d 5 0 FILL' % (d + 4))
+        assert m.memory[d:] == bytearray(b'AA\0\0\0AAA')
+
+    def test_move(self):
+        m = forth.Machine()
+        d = forth.DATA_START
+        m.eval('10 ALLOT')
+        m.memory[d:] = b'abcdefghij'
+
+        m.eval('%d %d 6 MOVE' % (d, d + 2))
+        assert m.memory[d:] == bytearray(b'ababcdefij')
+
+        m.memory[d:] = b'abcdefghij'
+        m.eval('%d %d 6 MOVE' % (d + 2, d))
+        assert m.memory[d:] == bytearray(b'cdefghghij')
+
+        assert 'invalid memory address' in m.eval('%d %d 6 MOVE' % (d, d + 5))
+
+    def test_cmove(self):
+        m = forth.Machine()
+        d = forth.DATA_START
+        m.eval('10 ALLOT')
+        m.memory[d:] = b'abcdefghij'
+
+        # The classic overlapping CMOVE fill:
+        m.eval('%d %d 9 CMOVE' % (d, d + 1))
+        assert m.memory[d:] == bytearray(b'aaaaaaaaaa')
+
+        m.memory[d:] = b'abcdefghij'
+        m.eval('%d %d 5 CMOVE' % (d, d + 3))
+        assert m.memory[d:] == bytearray(b'abcabcabij')
+
+        m.memory[d:] = b'abcdefghij'
+        m.eval('%d %d 6 CMOVE' % (d + 2, d))
+        assert m.memory[d:] == bytearray(b'cdefghghij')
+
+    def test_cmove_up(self):
+        m = forth.Machine()
+        d = forth.DATA_START
+        m.eval('10 ALLOT')
+        m.memory[d:] = b'abcdefghij'
+
+        m.eval('%d %d 9 CMOVE>' % (d + 1, d))
+        assert m.memory[d:] == bytearray(b'jjjjjjjjjj')
+
+        m.memory[d:] = b'abcdefghij'
+        m.eval('%d %d 5 CMOVE>' % (d + 3, d))
+        assert m.memory[d:] == bytearray(b'ghfghfghij')
+
+        m.memory[d:] = b'abcdefghij'
+        m.eval('%d %d 6 CMOVE>' % (d, d + 2))
+        assert m.memory[d:] == bytearray(b'ababcdefij')
+
+    def test_compare(self):
+        m = forth.Machine()
+        d = forth.DATA_START
+        m.eval('10 ALLOT')
+        m.memory[d:] = b'abcabdabab'
+
+        assert m.eval('%d 3 %d 3 COMPARE .' % (d, d)) == '0  ok'
+        assert m.eval('%d 3 %d 3 COMPARE .' % (d, d + 3)) == '-1  ok'
+        assert m.eval('%d 3 %d 3 COMPARE .' % (d + 3, d)) == '1  ok'
+        assert m.eval('%d 2 %d 4 COMPARE .' % (d + 6, d + 6)) == '-1  ok'
+        assert m.eval('%d 0 %d 0 COMPARE .' % (d, d)) == '0  ok'
+        assert 'invalid memory address' in m.eval('%d 3 %d 3 COMPARE' % (d + 8, d))
+
+    def test_search(self):
+        m = forth.Machine()
+        d = forth.DATA_START
+        m.eval('10 ALLOT')
+        m.memory[d:] = b'abcabdabab'
+
+        assert m.eval('%d 10 %d 3 SEARCH . . .' % (d, d + 3)) == '-1 7 %d  ok' % (d + 3)
+        assert m.eval('%d 6 %d 2 SEARCH . . .' % (d + 4, d + 6)) == '-1 4 %d  ok' % (d + 6)
+        assert m.eval('%d 5 %d 3 SEARCH . . .' % (d, d + 5)) == '0 5 %d  ok' % d
+        assert m.eval('%d 10 %d 0 SEARCH . . .' % (d, d)) == '-1 10 %d  ok' % d
+
+    def test_tick_execute(self):
+        m = forth.Machine()
+        m.eval(': STAR 42 EMIT ;')
+
+        assert m.eval("' STAR EXECUTE") == '* ok'
+        assert m.eval("' STAR : RUN EXECUTE EXECUTE ; ' STAR RUN") == '** ok'
+        assert m.eval('3 4 \' + EXECUTE .') == '7  ok'
+        assert 'undefined word: NOPE' in m.eval("' NOPE")
+        assert 'not a word' in m.eval('5 EXECUTE')
+
+    def test_tasks(self):
+        m = forth.Machine()
+        m.eval('TASK T1 TASK T2 99\n'
+               ': COUNTER 3 0 DO I . PAUSE LOOP ;\n'
+               ': LETTERS 3 0 DO 65 I + EMIT PAUSE LOOP ;\n'
+               "' COUNTER T1 ACTIVATE ' LETTERS T2 ACTIVATE")
+
+        assert len(m.ready) == 2
+        assert m.eval('PAUSE PAUSE') == '0 A1 B ok'
+        assert m.data_stack == [99]
+        assert m.eval('PAUSE PAUSE PAUSE') == '2 C ok'
+        assert not m.ready
+        assert m.data_stack == [99]
+
+        # A finished task can be set off again.
+        assert m.eval("' LETTERS T1 ACTIVATE PAUSE PAUSE") == 'AB ok'
+
+    def test_task_floats(self):
+        m = forth.Machine()
+        m.eval('TASK T1 TASK T2 0.5E0\n'
+               ': ADD 1E0 PAUSE 2E0 PAUSE F+ F. ;\n'
+               ': MULTIPLY 10E0 PAUSE 3E0 PAUSE F* F. ;\n'
+               "' ADD T1 ACTIVATE ' MULTIPLY T2 ACTIVATE")
+
+        assert m.eval('PAUSE PAUSE PAUSE') == '3.0 30.0  ok'
+        assert list(m.float_stack) == [0.5]
+
+    def test_task_errors(self):
+        m = forth.Machine()
+        m.eval("TASK WORKER : BAD 1 . DROP DROP ; 7 ' BAD WORKER ACTIVATE")
+
+        assert m.eval('PAUSE') == '1  ? stack underflow ok'
+        assert m.data_stack == [7]
+        assert not m.ready
+
+        assert 'no such task' in m.eval("' BAD 5 ACTIVATE")
+
+    def test_task_sleep(self):
+        m = forth.Machine()
+        m.eval("TASK SLEEPER : NAP 20 MS 42 EMIT ; ' NAP SLEEPER ACTIVATE")
+
+        assert m.eval('PAUSE PAUSE') == ' ok'
+        assert m.eval('50 MS') == '* ok'
+        assert not m.ready
+
+    def test_tasks_on_engine(self):
+        m = forth.Machine()
+        m.eval("TASK T1 : TICKS 3 0 DO 46 EMIT PAUSE LOOP ; ' TICKS T1 ACTIVATE")
+
+        assert m.run(': DRIVE 4 0 DO PAUSE 124 EMIT LOOP ; DRIVE').output == '.|.|.|| ok'
+
+    def test_tasks_within_budget(self):
+        m = forth.Machine()
+        m.eval('TASK T1 TASK T2\n'
+               ': TICKS 3 0 DO 46 EMIT PAUSE LOOP ;\n'
+               ': STARS 2 0 DO 42 EMIT PAUSE LOOP ;\n'
+               ": DRIVE 4 0 DO PAUSE 124 EMIT LOOP ;\n"
+               "' TICKS T1 ACTIVATE ' STARS T2 ACTIVATE")
+        cont = m.run('DRIVE', budget=1)
+        output = cont.output
+        while not cont.done:
+            output += m.run(cont, budget=1).output
+        assert output == '.*|.*|.|| ok'
+
+        # The tasks' instructions come out of the caller's budget.
+        m.eval(": SPIN 0 BEGIN 1 + 0 UNTIL ; ' SPIN T1 ACTIVATE")
+        cont = m.run('PAUSE 42 EMIT', budget=10)
+        assert not cont.done
+        assert cont.steps == 10
+        m.run(cont, budget=100)
+        assert cont.steps == 110
+        m.cancel(cont)
+
+    def test_comment(self):
+        m = forth.Machine()
+        assert m.eval('1 ( two ) 3 .S') == '[1, 3]  ok'
+
+        m.eval(': SQUARE ( n -- n*n ) DUP * ( not an effect -- ) ;')
+        assert m.words['SQUARE'].stack_effect == (('n',), ('n*n',))
+        assert m.eval('4 SQUARE .') == '16  ok'
+
+    def test_recurse(self):
+        m = forth.Machine()
+        m.eval(': FACT DUP 1 > IF DUP 1 - RECURSE * THEN ;')
+        assert m.eval('5 FACT .') == '120  ok'
+        assert m.run('6 FACT .').output == '720  ok'
+
+    def test_pure(self):
+        m = forth.Machine()
+        m.eval(': FIB ( n -- fib ) DUP 2 < IF ELSE DUP 1 - RECURSE SWAP 2 - RECURSE + THEN ; PURE')
+
+        assert m.eval('40 FIB .') == '102334155  ok'
+        assert m.metrics.memo_misses == 41
+        assert m.eval('40 FIB .') == '102334155  ok'
+        assert m.metrics.memo_misses == 41
+
+        assert m.eval(': NO-EFFECT 1 ; PURE') == ' ? no stack effect: NO-EFFECT'
+        assert m.eval(': LIAR ( -- n ) 1 2 ; PURE LIAR') == ' ? stack effect broken: LIAR'
+
+    def test_pure_native(self):
+        m = forth.Machine()
+        calls = []
+        m.add_native('SLOW', lambda a, b: calls.append(a) or a * b, '( a b -- c )')
+        m.memoize('SLOW', maxsize=2)
+
+        assert m.eval('2 3 SLOW 2 3 SLOW 4 5 SLOW .S') == '[6, 6, 20]  ok'
+        assert calls == [2, 4]
+
+        # The oldest inputs drop out of the cache.
+        m.eval('6 7 SLOW 2 3 SLOW')
+        assert calls == [2, 4, 6, 2]
+        assert m.metrics.memo_hits == 1
+
+    def test_pure_invalidation(self):
+        m = forth.Machine()
+        m.eval(': INC ( n -- n+1 ) 1 + ; : TWICE ( n -- m ) INC INC ; PURE 1 TWICE DROP')
+        cache = lambda: m.memo_caches.get(m.words['TWICE'].__func__, {})
+        assert len(cache()) == 1
+
+        m.eval('VARIABLE UNRELATED')
+        assert len(cache()) == 1
+        m.eval(': INC 2 + ;')
+        assert not cache()
+
+        # Including what late-bound calls come to reach, once defined.
+        m = forth.Machine()
+        m.eval('LATE-BINDING : B ( n -- n ) C ; PURE : C D ; : D 1 + ;')
+        assert m.eval('5 B .') == '6  ok'
+        m.eval(': D 100 + ;')
+        assert m.eval('5 B .') == '105  ok'
+
+    def test_early_binding(self):
+        m = forth.Machine()
+        m.eval(': GREET 72 EMIT ; : HELLO GREET ;')
+        m.eval(': GREET 74 EMIT ;')
+
+        assert m.eval('HELLO') == 'H ok'
+        assert m.eval(': LATER NOT-YET ;') == ' ? undefined word: NOT-YET'
+
+    def test_late_binding(self):
+        m = forth.Machine()
+        m.eval('LATE-BINDING : HELLO GREET ; : GREET 72 EMIT ;')
+        assert m.eval('HELLO') == 'H ok'
+
+        m.eval(': GREET 74 EMIT ;')
+        assert m.eval('HELLO') == 'J ok'
+        assert m.run('HELLO').output == 'J ok'
+
+        # Compile words still run as they're compiled.
+        m.eval(': TEST IF GREET THEN ;')
+        assert m.eval('1 TEST 0 TEST') == 'J ok'
+
+        m.eval(': GONE NOWHERE ;')
+        assert m.eval('GONE') == ' ? undefined word: NOWHERE'
+
+    def test_call_site_cache(self):
+        m = forth.Machine()
+        m.eval('LATE-BINDING : INC 1 + ; : TEST INC ; EARLY-BINDING')
+        site = m.words['TEST'].tokens[0][1]
+
+        assert m.eval('1 TEST TEST .') == '3  ok'
+        generation = m.generation
+        assert site.generation == generation
+        assert site.target is m.words['INC']
+
+        m.eval(': INC 2 + ;')
+        assert m.generation == generation + 1
+        assert m.eval('1 TEST .') == '3  ok'
+        assert site.generation == m.generation
+
+    def test_late_binding_invalidates_pure(self):
+        m = forth.Machine()
+        m.eval('LATE-BINDING : INC ( n -- n+1 ) 1 + ; : TWICE ( n -- m ) INC INC ; PURE')
+        assert m.eval('1 TWICE .') == '3  ok'
+
+        m.eval(': INC 2 + ;')
+        assert m.eval('1 TWICE .') == '5  ok'
+
+    def test_strings(self):
+        m = forth.Machine()
+        assert m.eval('S" hello world" TYPE') == 'hello world ok'
+        assert m.eval('S" héllo" .S') == '[%d, 6]  ok' % (forth.DATA_START - 256)
+
+        m.eval(': GREET ." Hi, " TYPE ." !" ;')
+        assert m.eval('S" Bob" GREET S" Al" GREET') == 'Hi, Bob!Hi, Al! ok'
+        assert m.run('S" Eve" GREET').output == 'Hi, Eve! ok'
+
+        assert m.eval('." straight out"') == 'straight out ok'
+        assert m.eval('S" " TYPE') == ' ok'
+
+        m = forth.Machine()
+        assert m.eval(': EMPTY S" " ; EMPTY .S') == '[%d, 0]  ok' % forth.DATA_START
+
+        # Interpreted, they take turns in transient buffers, without using
+        # up the data space.
+        here = m.here
+        assert m.eval('S" one" S" two" TYPE TYPE') == 'twoone ok'
+        for x in range(1000):
+            m.eval('S" x" DROP DROP')
+        assert m.eval('S" %s"' % ('x' * 257)) == ' ? string too long'
+        assert m.here == here
+
+    def test_counted_strings(self):
+        m = forth.Machine()
+        assert m.eval(': NAME C" forth" ; NAME COUNT TYPE NAME C@ .') == 'forth5  ok'
+        assert m.eval('C" %s"' % ('x' * 256)) == ' ? string too long'
+
+    def test_base(self):
+        m = forth.Machine()
+        assert m.eval('BASE @ .') == '10  ok'
+        assert m.eval('255 HEX . DECIMAL') == 'FF  ok'
+        assert m.eval('HEX FF 10 + DECIMAL .') == '271  ok'
+        assert m.eval('-5 2 BASE ! . DECIMAL') == '-101  ok'
+        assert m.eval('36 BASE ! ZZ DECIMAL .') == '1295  ok'
+        assert m.eval('-1 U.') == '18446744073709551615  ok'
+        assert m.eval('42 5 .R -1 2 U.R') == '   4218446744073709551615 ok'
+
+        # Words win over numbers: in HEX, ADD is only a number if undefined.
+        m.eval(': ADD + ;')
+        assert m.eval('HEX 1 2 ADD . DECIMAL') == '3  ok'
+        assert m.eval('5 1 BASE ! .') == ' ? invalid base: 1'
+
+    def test_pictured_output(self):
+        m = forth.Machine()
+        m.eval(': DOLLARS ( u -- ) 0 <# # # 46 HOLD #S 36 HOLD #> TYPE ;')
+        assert m.eval('12345 DOLLARS') == '$123.45 ok'
+        assert m.eval('7 DOLLARS') == '$0.07 ok'
+        assert m.eval('-5 DUP 0 SWAP - 0 <# #S ROT SIGN #> TYPE') == '-5 ok'
+        assert m.eval('HEX 0 0 <# #S #> TYPE DECIMAL') == '0 ok'
+        assert m.eval('1 0 <# #S S" x" HOLDS #> TYPE') == 'x1 ok'
+
+        m.eval(': STARS <# 0 DO 42 HOLD LOOP ;')
+        assert m.eval('300 STARS') == ' ? pictured numeric output overflow'
+
+    def test_print_cells(self):
+        m = forth.Machine()
+        m.eval('CREATE TABLE 1 , -2 , 255 ,')
+        assert m.eval('TABLE 3 .CELLS') == '1 -2 255  ok'
+        assert m.eval('HEX TABLE 3 .CELLS DECIMAL') == '1 -2 FF  ok'
+        assert m.eval('TABLE 0 .CELLS') == ' ok'
+        assert 'invalid memory address' in m.eval('TABLE 4 .CELLS')
+
+    def test_floats(self):
+        m = forth.Machine()
+        assert m.eval('1.5E0 2E F* F.') == '3.0  ok'
+        assert m.eval('1E1 4E0 F- 3E0 F/ F.') == '2.0  ok'
+        assert m.eval('2E0 FSQRT FDUP F* F>S .') == '2  ok'
+        assert m.eval('7 S>F -2.5E+1 FSWAP FOVER F+ F. F. FDEPTH .') == '-18.0 -25.0 0  ok'
+        assert not m.data_stack
+
+        # Floats never land on the data stack; 1.5 (with no exponent) isn't one.
+        assert m.eval('1E0 DEPTH') == ' ? undefined word: DEPTH'
+        assert m.eval('1.5') == ' ? undefined word: 1.5'
+        assert m.eval('HEX 1E0 DECIMAL .') == '480  ok'
+
+        assert m.eval('F.') == ' ? float stack underflow'
+        assert m.eval('1E0 0E0 F/') == ' ? division by zero'
+        assert m.eval('-1E0 FSQRT') == ' ? invalid float operation'
+        assert not m.float_stack
+
+    def test_float_memory(self):
+        m = forth.Machine()
+        m.eval('FVARIABLE X 2.5E0 X F! CREATE V 1E0 F, 2E0 F, 3E0 F,')
+        assert m.eval('X F@ F.') == '2.5  ok'
+        assert m.eval('V 2 FLOATS + F@ F. V FLOAT+ F@ F.') == '3.0 2.0  ok'
+
+        assert m.eval('V 3 FSUM F.') == '6.0  ok'
+        assert m.eval('V V 3 FDOT F.') == '14.0  ok'
+        assert m.eval('0.5E0 V 3 FSCALE V 3 FSUM F.') == '3.0  ok'
+        assert m.eval('V 0 FSUM F.') == '0.0  ok'
+        assert 'invalid memory address' in m.eval('V 4 FSUM')
+
+    def test_double_cells(self):
+        m = forth.Machine()
+        big = 2 ** 63 - 1
+
+        assert m.eval('-1 0 1 0 D+ . .') == '1 0  ok'
+        assert m.eval('0 1 1 0 D- . .') == '0 -1  ok'
+        assert m.eval('5 0 DNEGATE . .') == '-1 -5  ok'
+        assert m.eval('%d 2 M* . .' % big) == '0 -2  ok'
+        assert m.eval('-3 4 M* . .') == '-1 -12  ok'
+        assert m.eval('-1 -1 UM* . .') == '-2 1  ok'
+
+        assert m.eval('%d 2 M* 3 FM/MOD . .' % big) == '%d %d  ok' % ((big * 2) // 3, (big * 2) % 3)
+        assert m.eval('-7 -1 2 FM/MOD . .') == '-4 1  ok'
+        assert m.eval('-7 -1 2 SM/REM . .') == '-3 -1  ok'
+        assert m.eval('-1 -1 UM* -1 UM/MOD U. U.') == '%d 0  ok' % (2 ** 64 - 1)
+
+        assert m.eval('0 4 2 UM/MOD') == ' ? division overflow'
+        assert m.eval('1 0 0 FM/MOD') == ' ? division by zero'
+
+    def test_scaling(self):
+        m = forth.Machine()
+        big = 2 ** 62
+        # The intermediate product doesn't fit in a cell, the result does.
+        assert m.eval('%d 6 4 */ .' % big) == '%d  ok' % (big * 6 // 4)
+        assert m.eval('-7 3 2 */MOD . .') == '-11 1  ok'
+        assert m.eval('-7 1 2 */ .') == '-4  ok'
+        assert m.eval('%d 8 2 */' % big) == ' ? division overflow'
+        assert m.eval('1 1 0 */') == ' ? division by zero'
+
+    def test_division_by_zero(self):
+        m = forth.Machine()
+        for word in ('/', 'MOD', '/MOD'):
+            assert m.eval('1 0 %s' % word) == ' ? division by zero'
+            assert m.run('1 0 %s' % word).output == ' ? division by zero'
+        assert m.eval('7 2 /MOD . .') == '3 1  ok'
@@ -0,0 +1,101 @@
+# coding= utf-8
+"""
+Tests running jobs on a thread pool over a shared dictionary. Needs Python 3.
+"""
+from __future__ import unicode_literals
+
+import pytest
+
+pytest.importorskip('concurrent.futures')
+import forth
+from forth.pool import Dictionary, Pool
+
+
+def template(source):
+    m = forth.Machine()
+    assert m.eval(source).endswith(' ok')
+    return Dictionary(m)
+
+
+class TestPool():
+    def test_jobs(self):
+        dictionary = template(': SQUARE DUP * ; : SUM 0 SWAP 0 DO I + LOOP ;')
+        with Pool(dictionary, max_workers=4) as pool:
+            futures = [pool.submit('SQUARE', n) for n in range(50)]
+            assert [future.result().stack for future in futures] == \
+                [[n * n] for n in range(50)]
+            assert list(pool.map(['10 SUM .', '3 SQUARE 1 .'])) == \
+                [('45 ', []), ('1 ', [9])]
+            assert pool.metrics().evals == 52
+
+    def test_jobs_are_isolated(self):
+        dictionary = template('VARIABLE X 5 X ! : ANSWER 42 ;')
+        with Pool(dictionary, max_workers=1) as pool:
+            assert pool.submit('X @ 1 + DUP X ! : ANSWER 43 ; ANSWER HEX').result() \
+                == ('', [6, 43])
+            assert pool.submit('X @ ANSWER 10').result() == ('', [5, 42, 10])
+            assert pool.submit(': UNFINISHED 1').result() == ('', [])
+            assert pool.submit('1 UNFINISHED').exception() is not None
+
+    def test_search_order(self):
+        dictionary = template('VOCABULARY LIB  ALSO LIB DEFINITIONS : NAME 1 ; '
+                              'PREVIOUS DEFINITIONS : NAME 0 ;')
+        with Pool(dictionary, max_workers=1) as pool:
+            assert pool.submit('NAME ALSO LIB NAME : NAME 2 ; NAME').result() \
+                == ('', [0, 1, 1])
+            assert pool.submit('NAME ONLY FORTH DEFINITIONS : NAME 3 ;').result() \
+                == ('', [0])
+            assert pool.submit('NAME ALSO LIB NAME').result() == ('', [0, 1])
+
+    def test_errors(self):
+        with Pool(forth.Machine(), max_workers=2) as pool:
+            error = pool.submit('1 NOPE').exception()
+            assert isinstance(error, forth.ForthError)
+            assert str(error) == 'undefined word: NOPE'
+            assert pool.submit('1 2 +').result().stack == [3]
+
+    def test_shared_call_sites(self):
+        # Jobs that redefine a late-bound word only change it for themselves,
+        # even while others run the same shared code at the same time.
+        dictionary = template('LATE-BINDING : INC 1 + ; : TWICE INC INC ;')
+        with Pool(dictionary, max_workers=8) as pool:
+            futures = []
+            for n in range(200):
+                if n % 2:
+                    futures.append((pool.submit(': INC 10 + ; 0 TWICE'), 20))
+                else:
+                    futures.append((pool.submit('0 TWICE'), 2))
+            for future, expected in futures:
+                assert future.result().stack == [expected]
+
+    def test_pure(self):
+        dictionary = template(': SQUARE ( n -- n*n ) DUP * ; PURE')
+        with Pool(dictionary, max_workers=4) as pool:
+            futures = [pool.submit('SQUARE', n % 5) for n in range(100)]
+            assert [future.result().stack[0] for future in futures] == \
+                [(n % 5) ** 2 for n in range(100)]
+            metrics = pool.metrics()
+            assert metrics.memo_hits + metrics.memo_misses == 100
+
+    def test_pure_redefined(self):
+        # A job that redefines what a PURE word calls doesn't leave its
+        # results in the cache for the others, or for the template.
+        m = forth.Machine()
+        m.eval('LATE-BINDING : K 10 ; : F ( n -- n ) K * ; PURE')
+        with Pool(Dictionary(m), max_workers=1) as pool:
+            assert pool.submit('5 F').result().stack == [50]
+            assert pool.submit(': K 1000 ; 5 F').result().stack == [5000]
+            assert pool.submit('5 F').result().stack == [50]
+            assert pool.submit('ALSO FORTH 5 F').result().stack == [50]
+        assert m.eval('5 F .') == '50  ok'
+
+    def test_floats(self):
+        dictionary = template(': HALF 0.5E0 F* ;')
+        with Pool(dictionary) as pool:
+            assert pool.submit('3E0 HALF F.').result().output == '1.5 '
+
+    def test_dictionary_machine(self):
+        dictionary = template(': ANSWER 42 ;')
+        m = dictionary.machine()
+        assert m.eval('ANSWER .') == '42  ok'
+        assert m.words['ANSWER'].__self__ is m
@@ -0,0 +1,123 @@
+# coding= utf-8
+"""
+Tests the quotas on what a machine may use.
+"""
+from __future__ import unicode_literals
+
+import time
+
+import pytest
+
+import forth
+from forth.quotas import Quotas, SAFEPOINT
+
+
+def machine(**quotas):
+    m = forth.Machine()
+    m.quotas = Quotas(**quotas)
+    return m
+
+
+class TestQuotas():
+    def test_data_stack(self):
+        m = machine(data_stack=100)
+        m.eval(': FLOOD BEGIN 1 0 UNTIL ;')
+        cont = m.run('FLOOD')
+        assert cont.output == ' ? quota exceeded: data stack'
+        assert isinstance(cont.error, forth.QuotaExceeded)
+        assert cont.error.quota == 'data_stack'
+        assert m.metrics.snapshot().data_stack_max <= 100 + SAFEPOINT
+
+        # The machine is still good for the next input.
+        assert m.run('1 2 + .').output == '3  ok'
+        assert m.data_stack == []
+
+    def test_tree_walker(self):
+        m = machine(data_stack=100)
+        assert m.eval(': FLOOD BEGIN 1 0 UNTIL ; FLOOD') == ' ? quota exceeded: data stack'
+        assert m.eval('FLOOD') == ' ? quota exceeded: data stack'
+        m.eval(': PUSHES 0 DO I LOOP ;')
+        assert m.eval('1000 PUSHES') == ' ? quota exceeded: data stack'
+        assert m.eval('50 PUSHES .') == '49  ok'
+
+        m = machine(seconds=0.01)
+        assert m.eval(': SPIN BEGIN 1 WHILE REPEAT ; SPIN') == ' ? quota exceeded: seconds'
+
+    def test_return_stack(self):
+        m = machine(return_stack=50)
+        assert m.run(': DEEP RECURSE ; DEEP').output == ' ? quota exceeded: return stack'
+        assert m.run(': NESTED 100 0 DO 1 >R LOOP ; NESTED').output \
+            == ' ? quota exceeded: return stack'
+        assert m.eval('DEEP') == ' ? quota exceeded: return stack'
+        assert m.eval(': SHALLOW DUP IF 1 - RECURSE THEN ; 40 SHALLOW .') == '0  ok'
+
+        # Without a quota, the tree-walker still stops with a Forth error.
+        m = forth.Machine()
+        assert m.eval(': DEEP RECURSE ; DEEP') == ' ? return stack overflow'
+        assert m.eval('1 2 + .') == '3  ok'
+
+    def test_memory(self):
+        m = machine(memory=4096)
+        here = m.here
+        assert m.eval('4096 ALLOT') == ' ? quota exceeded: memory'
+        assert m.here == here
+        assert m.eval('100 ALLOT HERE .') == '%d  ok' % (here + 100)
+
+    def test_output(self):
+        m = machine(output=1000)
+        cont = m.run(': SPAM BEGIN 42 EMIT 0 UNTIL ; SPAM')
+        assert cont.output.endswith(' ? quota exceeded: output')
+        assert 1000 < cont.output.count('*') <= 1000 + SAFEPOINT
+
+        m = machine(output=1000)
+        output = m.eval(': SPAM BEGIN 42 EMIT 0 UNTIL ; SPAM')
+        assert output.endswith(' ? quota exceeded: output')
+        assert 1000 < output.count('*') <= 1001
+        m.eval(': STAR 42 EMIT ; : STARS 0 DO STAR LOOP ;')
+        assert m.eval('999 STARS') == '*' * 999 + ' ok'
+        assert m.eval('1001 STARS').endswith(' ? quota exceeded: output')
+
+    def test_instructions(self):
+        m = machine(instructions=10000)
+        m.eval(': SPIN BEGIN 0 UNTIL ;')
+        cont = m.run('SPIN', budget=100)
+        while not cont.done:
+            assert cont.steps <= 10000 + SAFEPOINT
+            cont.resume(100)
+        assert cont.error.quota == 'instructions'
+
+        # Quotas are per input.
+        m.eval(': COUNT 0 DO LOOP ;')
+        assert m.run('3000 COUNT').output == ' ok'
+        assert m.run('3000 COUNT').output == ' ok'
+
+    def test_seconds(self):
+        m = machine(seconds=0.01)
+        assert m.run(': SPIN BEGIN 0 UNTIL ; SPIN').output == ' ? quota exceeded: seconds'
+
+        # Waiting counts too, without sleeping past the quota.
+        m = machine(seconds=0.1)
+        started = time.time()
+        cont = m.run('3000 MS', budget=100)
+        assert cont.sleep_time() <= 0.1
+        assert m.run(cont).output == ' ? quota exceeded: seconds'
+        assert m.eval('3000 MS') == ' ? quota exceeded: seconds'
+        assert time.time() - started < 1
+
+    def test_budget(self):
+        m = machine(data_stack=10 ** 6)
+        m.eval(': SPIN BEGIN 0 UNTIL ;')
+        cont = m.run('SPIN', budget=SAFEPOINT * 3 + 5)
+        assert not cont.done
+        assert cont.steps == SAFEPOINT * 3 + 5
+
+    def test_pause(self):
+        m = machine(data_stack=100)
+        m.eval("TASK T : TWICE 2 0 DO I . PAUSE LOOP ; ' TWICE T ACTIVATE")
+        assert m.run('PAUSE 5 . PAUSE').output == '0 5 1  ok'
+
+    @pytest.mark.parametrize('quota', ['instructions', 'seconds', 'output'])
+    def test_without_quota(self, quota):
+        m = machine(**{quota: None})
+        assert m.run(': PUSHES 0 DO I LOOP ; 100 PUSHES .').output == '99  ok'
+        assert len(m.data_stack) == 99
@@ -0,0 +1,78 @@
+# coding= utf-8
+"""
+Tests recording the inputs a machine evaluates, and replaying them.
+"""
+from __future__ import unicode_literals
+
+import pytest
+
+import forth
+from forth import recording
+
+
+def record(path, inputs):
+    m = forth.Machine()
+    with recording.Recorder(str(path)) as m.recorder:
+        return [m.eval(text) for text in inputs]
+
+
+INPUTS = [': SQUARE DUP * ;', '7 SQUARE .', ': HALF', '2 / ;', 'NOPE', 'QUIT']
+
+
+class TestRecording():
+    @pytest.mark.parametrize('name', ['session.rec', 'session.rec.gz'])
+    def test_record(self, tmpdir, name):
+        path = tmpdir.join(name)
+        assert record(path, INPUTS)[1] == '49  ok'
+
+        entries = recording.read(str(path))
+        assert [text for offset, seconds, status, text in entries] == INPUTS
+        assert [status for offset, seconds, status, text in entries] == \
+            ['ok', 'ok', 'compiled', 'ok', 'error', 'quit']
+        offsets = [offset for offset, seconds, status, text in entries]
+        assert offsets == sorted(offsets)
+        assert all(seconds >= 0 for offset, seconds, status, text in entries)
+
+    def test_not_a_recording(self, tmpdir):
+        path = tmpdir.join('nope.rec')
+        path.write('1 2 +\n')
+        with pytest.raises(forth.ForthError):
+            recording.read(str(path))
+
+    @pytest.mark.parametrize('engine', ['eval', 'run'])
+    def test_replay(self, tmpdir, engine):
+        path = tmpdir.join('session.rec')
+        record(path, INPUTS)
+
+        report = recording.replay(recording.read(str(path)), engine)
+        assert len(report.latencies) == len(INPUTS)
+        assert report.mismatches == 0
+        assert report.throughput() > 0
+        assert 'inputs/s' in str(report)
+
+        # Replayed where SQUARE isn't defined, the second input fails.
+        report = recording.replay(recording.read(str(path))[1:], engine)
+        assert report.mismatches == 1
+
+    def test_pace(self):
+        entries = [(0.0, 0.0, 'ok', '1'), (10.0, 0.0, 'ok', '2'),
+                   (30.0, 0.0, 'ok', '3')]
+        # Sleeping takes no time here, so each wait is the whole way there.
+        waits = []
+        recording.replay(entries, pace=10, sleep=waits.append)
+        assert len(waits) == 2
+        assert 0.9 < waits[0] <= 1 and 2.9 < waits[1] <= 3
+
+    def test_percentiles(self):
+        report = recording.Report([n / 1000.0 for n in range(1, 101)], 1.0, 0)
+        assert report.percentile(50) == 0.05
+        assert report.percentile(99) == 0.099
+        assert report.percentile(100) == 0.1
+        assert report.throughput() == 100
+
+    def test_main(self, tmpdir, capsys):
+        path = tmpdir.join('session.rec')
+        record(path, INPUTS)
+        assert recording.main([str(path), '--engine', 'run', '--repeat', '2']) == 0
+        out = capsys.readouterr()[0]
+        assert out.count('6 inputs in') == 2
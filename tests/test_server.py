@@ -0,0 +1,208 @@
+# coding= utf-8
+"""
+Tests the asyncio multi-session server. Needs Python 3.
+"""
+from __future__ import unicode_literals
+
+import pytest
+
+asyncio = pytest.importorskip('asyncio')
+from forth import server
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+
+    # Wind down whatever sessions are still going.
+    tasks = asyncio.all_tasks(loop)
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        loop.run_until_complete(asyncio.wait(tasks))
+    loop.close()
+
+
+class Client(object):
+    def __init__(self, loop, port):
+        self.loop = loop
+        self.reader, self.writer = loop.run_until_complete(
+            asyncio.open_connection('127.0.0.1', port))
+
+    def send(self, text):
+        self.writer.write(text.encode('utf-8') + b'\n')
+
+    def readline(self):
+        line = self.loop.run_until_complete(
+            asyncio.wait_for(self.reader.readline(), 5))
+        return line.decode('utf-8')
+
+    def close(self):
+        self.writer.close()
+
+
+def start(loop, **kwargs):
+    s = server.Server(**kwargs)
+    listener = loop.run_until_complete(s.start_tcp('127.0.0.1', 0))
+    return s, listener, listener.sockets[0].getsockname()[1]
+
+
+class TestServer():
+    def test_session(self, loop):
+        s, listener, port = start(loop)
+        client = Client(loop, port)
+
+        client.send('1 2 + .')
+        assert client.readline() == '3  ok\n'
+
+        client.send(': STAR 42 EMIT ;')
+        client.send('STAR STAR')
+        assert client.readline() == ' ok\n'
+        assert client.readline() == '** ok\n'
+
+        client.send('BYE')
+        assert client.readline() == ''
+        listener.close()
+
+    def test_sessions_are_separate(self, loop):
+        s, listener, port = start(loop)
+        first = Client(loop, port)
+        second = Client(loop, port)
+
+        first.send('42 : SECRET 7 ;')
+        assert first.readline() == ' ok\n'
+
+        second.send('.S SECRET')
+        assert second.readline() == '[]  ? undefined word: SECRET\n'
+
+        first.send('. SECRET .')
+        assert first.readline() == '42 7  ok\n'
+
+        first.close()
+        second.close()
+        listener.close()
+
+    def test_busy_session_does_not_starve_others(self, loop):
+        s, listener, port = start(loop, budget=100)
+        busy = Client(loop, port)
+        other = Client(loop, port)
+
+        busy.send(': SPIN BEGIN 0 UNTIL ; SPIN')
+        for n in range(5):
+            other.send('%d .' % n)
+            assert other.readline() == '%d  ok\n' % n
+
+        busy.close()
+        other.close()
+        listener.close()
+
+    def test_waiting_session_does_not_block_others(self, loop):
+        s, listener, port = start(loop, quotas=server.Quotas(seconds=0.5))
+        sleeper = Client(loop, port)
+        other = Client(loop, port)
+
+        sleeper.send('3000 MS')
+        other.send('1 2 + .')
+        started = loop.time()
+        assert other.readline() == '3  ok\n'
+        assert loop.time() - started < 0.25
+        assert sleeper.readline() == ' ? quota exceeded: seconds\n'
+        assert loop.time() - started < 1.5
+
+        sleeper.close()
+        other.close()
+        listener.close()
+
+    def test_output_is_streamed(self, loop):
+        s, listener, port = start(loop, budget=10)
+        client = Client(loop, port)
+
+        client.send(': TICK 10 EMIT ; : FOREVER BEGIN TICK 0 UNTIL ; FOREVER')
+        for n in range(3):
+            assert client.readline() == '\n'
+
+        client.close()
+        listener.close()
+
+    def test_connection_limit(self, loop):
+        s, listener, port = start(loop, max_connections=1)
+        first = Client(loop, port)
+        first.send('1 .')
+        assert first.readline() == '1  ok\n'
+
+        second = Client(loop, port)
+        assert second.readline() == '? too many connections\n'
+        assert second.readline() == ''
+
+        first.close()
+        listener.close()
+
+    def test_idle_timeout(self, loop):
+        s, listener, port = start(loop, idle_timeout=0.05)
+        client = Client(loop, port)
+
+        assert client.readline() == '? idle timeout\n'
+        assert client.readline() == ''
+        listener.close()
+
+    def test_metrics(self, loop):
+        s, listener, port = start(loop)
+        metrics = loop.run_until_complete(s.start_metrics('127.0.0.1', 0))
+        metrics_port = metrics.sockets[0].getsockname()[1]
+
+        client = Client(loop, port)
+        client.send(': SQUARE DUP * ; 7 SQUARE .')
+        assert client.readline() == '49  ok\n'
+        client.send('BYE')
+        assert client.readline() == ''
+        client = Client(loop, port)
+        client.send('1 .')
+        assert client.readline() == '1  ok\n'
+
+        def get(path):
+            reader, writer = loop.run_until_complete(
+                asyncio.open_connection('127.0.0.1', metrics_port))
+            writer.write(('GET %s HTTP/1.0\r\n\r\n' % path).encode('latin-1'))
+            response = loop.run_until_complete(asyncio.wait_for(reader.read(), 5))
+            writer.close()
+            return response.decode('utf-8')
+
+        response = get('/metrics')
+        assert response.startswith('HTTP/1.0 200 OK\r\n')
+        assert 'forth_compiles_total 1\n' in response
+        assert 'forth_sessions 1\n' in response
+        assert 'forth_eval_seconds_count 2\n' in response
+        assert get('/').startswith('HTTP/1.0 404')
+
+        client.close()
+        metrics.close()
+        listener.close()
+
+    def test_quotas(self, loop):
+        s, listener, port = start(loop, quotas=server.Quotas(data_stack=100))
+        client = Client(loop, port)
+
+        client.send(': FLOOD BEGIN 1 0 UNTIL ; FLOOD')
+        assert client.readline() == ' ? quota exceeded: data stack\n'
+        client.send('1 .')
+        assert client.readline() == '1  ok\n'
+
+        client.close()
+        listener.close()
+
+    def test_internal_error(self, loop):
+        def factory():
+            m = server.forth.Machine()
+            m.add_native('BOOM', lambda: {}['boom'], '( -- )')
+            return m
+        s, listener, port = start(loop, machine_factory=factory)
+        client = Client(loop, port)
+
+        client.send('1 2 BOOM')
+        assert client.readline() == " ? internal error: KeyError: 'boom'\n"
+        client.send('.S')
+        assert client.readline() == '[]  ok\n'
+
+        client.close()
+        listener.close()
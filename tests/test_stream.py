@@ -0,0 +1,47 @@
+# coding= utf-8
+"""
+Tests reading records into the data space, for `python -m forth --each`.
+"""
+from __future__ import unicode_literals
+
+import io
+
+import forth
+from forth.stream import Records
+
+
+def read_all(records, data):
+    memory = records.machine.memory
+    return [bytes(memory[address:address + length])
+            for address, length in records.read(io.BytesIO(data))]
+
+
+class TestRecords():
+    def test_lines(self):
+        records = Records(forth.Machine())
+        assert read_all(records, b'one\ntwo\n\nthree') == [b'one', b'two', b'', b'three']
+        assert read_all(records, b'') == []
+
+    def test_small_chunks(self):
+        m = forth.Machine()
+        records = Records(m, delimiter=b'--', chunk_size=4)
+        data = b'ab--cdefghij--k----lmn'
+
+        assert read_all(records, data) == [b'ab', b'cdefghij', b'k', b'', b'lmn']
+        assert records.size == 16
+
+    def test_fields(self):
+        m = forth.Machine()
+        records = Records(m)
+        m.add_vocabulary(records)
+        m.eval(': SHOW DROP DROP #FIELDS 0 DO I 1 + FIELD . DROP LOOP 3 FIELD . DROP ;')
+
+        output = ''
+        for record in records.read(io.BytesIO(b' a  bb\tccc\nd\n')):
+            m.data_stack.extend(record)
+            output += m.eval('SHOW')
+        assert output == '1 2 3 3  ok1 0  ok'
+
+        records.field_separator = b','
+        for record in records.read(io.BytesIO(b'x,,yy')):
+            assert m.eval('#FIELDS . 3 FIELD . C@ .') == '3 2 121  ok'
@@ -0,0 +1,133 @@
+# coding= utf-8
+"""
+Tests the batched execution of words over NumPy arrays (Machine.map_word).
+"""
+from __future__ import unicode_literals
+
+import warnings
+
+import forth
+import pytest
+
+numpy = pytest.importorskip('numpy')
+from forth import vector
+
+
+class TestMapWord():
+    def test_arithmetic(self):
+        m = forth.Machine()
+        m.eval(': SCORE 2 * + ;')
+        ret = m.map_word('SCORE', [[1, 2, 3], [10, 20, 30]])
+
+        assert len(ret) == 1
+        assert ret[0].tolist() == [21, 42, 63]
+        assert not m.data_stack
+
+    def test_comparisons(self):
+        m = forth.Machine()
+        ret = m.map_word('<', [[1, 5, 3], [2, 2, 3]])
+
+        assert ret[0].tolist() == [-1, 0, 0]
+
+    def test_stack_shuffles(self):
+        m = forth.Machine()
+        m.eval(': SHUFFLE SWAP OVER 7 ;')
+        ret = m.map_word('SHUFFLE', [[1, 2], [3, 4]])
+
+        assert [cell.tolist() for cell in ret] == [[3, 4], [1, 2], [3, 4], [7, 7]]
+
+    def test_branch_is_masked(self):
+        m = forth.Machine()
+        m.eval(': CLAMP DUP 10 > IF DROP 10 ELSE 1 + THEN ;')
+        ret = m.map_word('CLAMP', [[1, 50, 10, 11]])
+
+        assert ret[0].tolist() == [2, 10, 11, 10]
+
+    def test_branch_matches_scalar_path(self):
+        m = forth.Machine()
+        m.eval(': ODD? 2 MOD IF 42 ELSE 33 THEN ;')
+        values = list(range(-5, 6))
+        ret = m.map_word('ODD?', [values])
+
+        expected = []
+        for value in values:
+            m.eval('%d ODD?' % value)
+            expected.append(m.data_stack.pop())
+
+        assert ret[0].tolist() == expected
+
+    def test_overflow_falls_back(self):
+        m = forth.Machine()
+        m.eval(': BIG 4611686018427387904 * ;')
+        ret = m.map_word('BIG', [[4, 1, 0]])
+        assert ret[0].tolist() == [2 ** 64, 2 ** 62, 0]
+
+        m.eval(': SQUARE DUP * ;')
+        ret = m.map_word('SQUARE', [[3037000500, 2]])
+        assert ret[0].tolist() == [3037000500 ** 2, 4]
+
+        m.eval(': SMALL 1000 * 1 + ;')
+        ret = m.map_word('SMALL', [numpy.arange(3)])
+        assert ret[0].dtype.kind == 'i'
+        assert ret[0].tolist() == [1, 1001, 2001]
+
+    def test_untaken_division_by_zero(self):
+        m = forth.Machine()
+        m.eval(': SAFE-DIV DUP IF / ELSE DROP DROP 0 THEN ;')
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            ret = m.map_word('SAFE-DIV', [[10, 7, 9], [2, 0, 3]])
+        assert ret[0].tolist() == [5, 0, 3]
+
+        # Taken, it's an error, as on the scalar path.
+        m.eval(': HALVES IF 2 / ELSE 0 / THEN ;')
+        assert m.map_word('HALVES', [[4, 6], [1, 1]])[0].tolist() == [2, 3]
+        with pytest.raises(forth.ForthError) as error:
+            m.map_word('HALVES', [[4, 6], [1, 0]])
+        assert str(error.value) == 'division by zero'
+        with pytest.raises(forth.ForthError):
+            m.map_word('MOD', [[4, 6], [2, 0]])
+
+    def test_fallback_to_scalar(self):
+        m = forth.Machine()
+        m.eval(': SUM-TO 0 SWAP 0 DO I + LOOP ;')
+
+        with pytest.raises(vector.Unvectorizable):
+            vector.run_vectorized(m.words['SUM-TO'], [numpy.array([3, 4])])
+
+        ret = m.map_word('SUM-TO', [[3, 4, 5]])
+        assert ret[0].tolist() == [3, 6, 10]
+
+    def test_fallback_keeps_stack(self):
+        m = forth.Machine()
+        m.eval('99 : NOISY DUP . ;')
+        ret = m.map_word('NOISY', [[1, 2]])
+
+        assert ret[0].tolist() == [1, 2]
+        assert m.data_stack == [99]
+
+    def test_unbalanced_branch_falls_back(self):
+        m = forth.Machine()
+        m.eval(': MAYBE-DUP IF DUP THEN ;')
+        ret = m.map_word('MAYBE-DUP', [[5, 6], [1, 1]])
+
+        assert [cell.tolist() for cell in ret] == [[5, 6], [5, 6]]
+
+        with pytest.raises(forth.ForthError) as excinfo:
+            m.map_word('MAYBE-DUP', [[5, 6], [1, 0]])
+        assert 'stack depth' in str(excinfo.value)
+
+    def test_errors(self):
+        m = forth.Machine()
+
+        with pytest.raises(forth.ForthError) as excinfo:
+            m.map_word('NO-SUCH-WORD', [[1]])
+        assert 'undefined word' in str(excinfo.value)
+
+        with pytest.raises(forth.ForthError) as excinfo:
+            m.map_word('+', [[1, 2], [3]])
+        assert 'length' in str(excinfo.value)
+
+        with pytest.raises(forth.ForthError) as excinfo:
+            m.map_word('+', [[1, 2]])
+        assert 'underflow' in str(excinfo.value)
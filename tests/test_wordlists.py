@@ -0,0 +1,95 @@
+# coding= utf-8
+"""
+Tests wordlists and the search order.
+"""
+from __future__ import unicode_literals
+
+import pytest
+
+import forth
+
+
+class TestWordlists():
+    def test_vocabularies(self):
+        m = forth.Machine()
+        m.eval('VOCABULARY A VOCABULARY B')
+        m.eval('ALSO A DEFINITIONS : NAME 1 ; : ONE NAME ;')
+        m.eval('PREVIOUS ALSO B DEFINITIONS : NAME 2 ;')
+        assert m.eval('NAME .') == '2  ok'
+        assert m.eval('ALSO A NAME . ONE .') == '1 1  ok'
+        assert m.eval('PREVIOUS PREVIOUS') == ' ok'
+        assert 'undefined word' in m.eval('NAME')
+        assert m.run('ONLY ALSO B NAME .').output == '2  ok'
+
+    def test_definitions(self):
+        m = forth.Machine()
+        m.eval('WORDLIST SET-CURRENT : SECRET 42 ; FORTH-WORDLIST SET-CURRENT')
+        assert 'undefined word' in m.eval('SECRET')
+        m.eval('1 GET-ORDER 1 + SET-ORDER')
+        assert m.eval('SECRET .') == '42  ok'
+        assert m.search_order == [0, 1]
+
+        m = forth.Machine()
+        wordlist = m.wordlist()
+        m.set_current(wordlist)
+        m.eval(': SECRET 42 ;')
+        m.set_order([wordlist, forth.FORTH_WORDLIST])
+        assert m.eval('SECRET . GET-CURRENT .') == '42 %d  ok' % wordlist
+        assert m.eval('GET-ORDER . . .') == '2 %d 0  ok' % wordlist
+
+    def test_flattened(self):
+        m = forth.Machine()
+        assert m.words is m.wordlists[forth.FORTH_WORDLIST]
+        first, second = m.wordlist(), m.wordlist()
+        m.set_order([first, second, forth.FORTH_WORDLIST])
+        flattened = m.words
+
+        # Definitions show through where nothing ahead hides them.
+        m.set_current(second)
+        m.eval(': X 2 ; : Y 2 ;')
+        m.set_current(first)
+        m.eval(': X 1 ;')
+        m.set_current(second)
+        m.eval(': X 3 ;')
+        assert m.eval('X . Y .') == '1 2  ok'
+
+        m.set_order([second])
+        assert m.find('X').__func__ is m.wordlists[second]['X'].__func__
+        assert m.find('DUP') is None
+        m.set_order([first, second, forth.FORTH_WORDLIST])
+        assert m.words is flattened
+
+    def test_late_binding(self):
+        m = forth.Machine()
+        m.eval('VOCABULARY A  ALSO A DEFINITIONS : NAME 1 ; PREVIOUS DEFINITIONS')
+        m.eval(': NAME 0 ; LATE-BINDING : SHOW NAME . ;')
+        assert m.run('SHOW ALSO A SHOW PREVIOUS SHOW').output == '0 1 0  ok'
+
+    def test_find(self):
+        m = forth.Machine()
+        assert m.eval('5 C" DUP" FIND . EXECUTE . .') == '-1 5 5  ok'
+        assert m.eval('C" IF" FIND . DROP') == '1  ok'
+        assert m.eval('C" NOPE" FIND . COUNT TYPE') == '0 NOPE ok'
+        assert m.eval('S" F+" FORTH-WORDLIST SEARCH-WORDLIST .') == '-1  ok'
+        assert m.eval('WORDLIST S" DUP" ROT SEARCH-WORDLIST .') == '0  ok'
+
+        # Names that aren't UTF-8 aren't found, rather than an error.
+        assert m.eval('HERE 1 C, 255 C, FIND . DROP') == '0  ok'
+        assert m.eval('HERE 255 C, 1 FORTH-WORDLIST SEARCH-WORDLIST .') == '0  ok'
+
+    def test_errors(self):
+        m = forth.Machine()
+        assert 'search order underflow' in m.eval('PREVIOUS')
+        assert 'no such wordlist' in m.eval('7 SET-CURRENT')
+        assert 'no such wordlist' in m.eval('-1 1 SET-ORDER')
+        with pytest.raises(forth.ForthError):
+            m.set_order([1])
+
+    def test_include(self, tmpdir):
+        lib = tmpdir.join('lib.fs')
+        lib.write('VOCABULARY LIB  ALSO LIB DEFINITIONS : SQUARE DUP * ; '
+                  'PREVIOUS DEFINITIONS')
+        m = forth.Machine()
+        m.include(str(lib))
+        assert not tmpdir.join('__forthcache__').check()
+        assert m.eval('ALSO LIB 3 SQUARE .') == '9  ok'
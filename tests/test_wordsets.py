@@ -0,0 +1,62 @@
+# coding= utf-8
+"""
+Tests the optional wordsets, loaded the first time one of their words is
+looked up.
+"""
+from __future__ import unicode_literals
+
+import subprocess
+import sys
+
+import forth
+from forth import wordsets
+
+
+class TestWordsets():
+    def test_registry(self):
+        # The names listed for each wordset are the words its module has.
+        for wordset, words in wordsets.WORDSETS.items():
+            assert sorted(wordsets.words_of(wordset)) == sorted(words.split())
+            assert not set(words.split()) & set(forth.Machine._core_words())
+
+    def test_lazy_loading(self):
+        m = forth.Machine()
+        assert 'F+' not in m.words
+        assert m.eval('1.5E0 2E0 F+ F.') == '3.5  ok'
+        assert m.wordsets == set(['floating'])
+        assert 'FSQRT' in m.words
+        assert 'CMOVE' not in m.words
+
+        m = forth.Machine()
+        assert m.run(': SCALE 3 2 */ ; 10 SCALE .').output == '15  ok'
+        assert m.wordsets == set(['doubles'])
+        assert 'FILL' in m.eval('WORDS')
+
+    def test_late_binding(self):
+        m = forth.Machine()
+        m.eval('LATE-BINDING : HALVE 1 2 */ ;')
+        assert m.run('10 HALVE .').output == '5  ok'
+        assert m.eval('10 HALVE .') == '5  ok'
+
+    def test_tick(self):
+        m = forth.Machine()
+        assert m.eval("' FDUP 2E0 EXECUTE F* F.") == '4.0  ok'
+
+    def test_redefined_first(self):
+        m = forth.Machine()
+        m.eval(': FILL 42 EMIT ;')
+        assert m.eval('CREATE B 4 ALLOT B 4 ERASE B C@ .') == '0  ok'
+        assert m.eval('FILL') == '* ok'
+
+    def test_hex_names(self):
+        # FDUP would be a number in base 36, but words come first.
+        m = forth.Machine()
+        assert m.eval('3 S>F 36 BASE ! FDUP F* DECIMAL F.') == '9.0  ok'
+
+    def test_import(self):
+        code = ('import sys, forth; forth.Machine().eval("1 2 + .");'
+                'print(" ".join(sorted(sys.modules)))')
+        modules = subprocess.check_output([sys.executable, '-c', code]).decode().split()
+        for heavy in ('forth.wordsets.floating', 'forth.engine', 'forth.include',
+                      'forth.server', 'asyncio', 'numpy', 'inspect'):
+            assert heavy not in modules